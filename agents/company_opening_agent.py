@@ -1,13 +1,18 @@
 # agents/company_opening_agent.py  – atualizado: mantém next_agent para tela de upload
-from typing import Dict, Any
-import os
+from typing import Callable, Dict, Any, Optional
 import logging
+import threading
 
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
+
+from utils.chat_memory import history_digest, to_messages
+from utils.context_packer import count_tokens
+from utils.llm_factory import get_llm
+from utils.metrics import cache_result, llm_span
+from utils.response_cache import get_response_cache, make_key, model_name, prompt_version
+from utils.single_flight import get_flight_group
 
 # --------------------------------------------------------------------------- #
 #                                LOGGING                                      #
@@ -26,6 +31,12 @@ DOCS_LIST = (
     "- Registro em conselho profissional (se exigido pela atividade)"
 )
 
+# resposta fixa quando a LLM devolve texto vazio: o fluxo de abertura nunca responde em branco
+EMPTY_RESPONSE_FALLBACK = (
+    "A Contabilizei abre sua empresa gratuitamente. Para começar, separe estes documentos:\n"
+    f"{DOCS_LIST}"
+)
+
 
 class CompanyOpeningAgent:
     """Especialista em abertura gratuita de empresa/CNPJ pela Contabilizei."""
@@ -33,35 +44,17 @@ class CompanyOpeningAgent:
     # --------------------------------------------------------------------- #
     #                                INIT                                   #
     # --------------------------------------------------------------------- #
-    def __init__(self, llm_provider: str = "openai"):
+    def __init__(self, llm_provider: str = "openai", llm=None):
         self.llm_provider = llm_provider.lower()
         logger.info(f"Initializing CompanyOpeningAgent with {self.llm_provider} provider")
-        self.llm = self._initialize_llm()
+        # cliente compartilhado com o WelcomeAgent e com as outras sessões
+        self.llm = llm if llm is not None else get_llm(self.llm_provider)
         self.prompt = self._create_prompt()
-
-    # --------------------------------------------------------------------- #
-    #                           LLM INITIALIZER                             #
-    # --------------------------------------------------------------------- #
-    def _initialize_llm(self):
-        try:
-            if self.llm_provider == "openai":
-                logger.debug("Loading OpenAI model: gpt‑4o‑mini")
-                return ChatOpenAI(
-                    model="gpt-4o-mini",
-                    temperature=0,
-                    api_key=os.getenv("OPENAI_API_KEY"),
-                )
-            if self.llm_provider == "groq":
-                logger.debug("Loading Groq model: llama3-70b-8192")
-                return ChatGroq(
-                    model="llama3-70b-8192",
-                    temperature=0,
-                    api_key=os.getenv("GROQ_API_KEY"),
-                )
-            raise ValueError(f"Unsupported LLM provider: {self.llm_provider}")
-        except Exception:
-            logger.error("Error initializing LLM", exc_info=True)
-            raise
+        # prompt fixo + temperature=0: respostas iguais para mensagens equivalentes
+        self.cache = get_response_cache()
+        self.prompt_version = prompt_version(self.prompt)
+        # mensagens idênticas em voo ao mesmo tempo (várias sessões) fazem uma chamada só
+        self.flight = get_flight_group("llm")
 
     # --------------------------------------------------------------------- #
     #                              PROMPT                                   #
@@ -79,7 +72,8 @@ class CompanyOpeningAgent:
                 f"{DOCS_LIST}"
                                                 
                 ),
-                
+                # resumo + últimas mensagens da conversa (utils/chat_memory.py)
+                MessagesPlaceholder("history", optional=True),
                 ("human", "{message}"),
             ]
         )
@@ -87,7 +81,84 @@ class CompanyOpeningAgent:
     # --------------------------------------------------------------------- #
     #                              PROCESS                                  #
     # --------------------------------------------------------------------- #
-    def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def _cache_key(self, state: Dict[str, Any]) -> str:
+        return make_key(
+            "company_opening_agent", self.llm_provider, model_name(self.llm),
+            self.prompt_version, state["message"],
+            history=history_digest(state.get("history") or [], state.get("summary") or ""),
+        )
+
+    @staticmethod
+    def _prompt_tokens(variables: Dict[str, Any]) -> int:
+        texts = [variables["message"], *(str(m.content) for m in variables["history"])]
+        return sum(count_tokens(text) for text in texts)
+
+    @staticmethod
+    def _variables(state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "message": state["message"],
+            "history": to_messages(state.get("history") or [], state.get("summary") or ""),
+        }
+
+    def _generate(
+        self,
+        key: str,
+        variables: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> str:
+        """Chama a LLM e guarda a resposta completa no cache."""
+        chain = self.prompt | self.llm | StrOutputParser()
+        cancelled = False
+        with llm_span("company_opening", self._prompt_tokens(variables)) as call:
+            if on_token is None and cancel is None:
+                response = chain.invoke(variables)
+            else:
+                # stream também quando cancelável: fechar o iterador aborta a requisição
+                response = ""
+                for token in chain.stream(variables):
+                    if cancel is not None and cancel.is_set():
+                        cancelled = True
+                        logger.info("Company opening generation cancelled")
+                        break
+                    call.token(token)
+                    response += token
+                    if on_token is not None:
+                        on_token(token)
+            call.output = response
+        if self.cache is not None and response and not cancelled:
+            self.cache.put(key, {"response": response})
+        return response
+
+    async def _agenerate(
+        self, key: str, variables: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        chain = self.prompt | self.llm | StrOutputParser()
+        with llm_span("company_opening", self._prompt_tokens(variables)) as call:
+            if on_token is None:
+                response = await chain.ainvoke(variables)
+            else:
+                response = ""
+                async for token in chain.astream(variables):
+                    call.token(token)
+                    response += token
+                    on_token(token)
+            call.output = response
+        if self.cache is not None and response:
+            self.cache.put(key, {"response": response})
+        return response
+
+    def process(
+        self,
+        state: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        """Com ``on_token`` a resposta é gerada via ``chain.stream`` e repassada token a token.
+
+        ``cancel`` (execução especulativa) interrompe a geração entre dois
+        tokens; a resposta parcial não vai para o cache.
+        """
         try:
             logger.info(f"Processing company opening message: {state.get('message', '')[:60]}...")
             if "message" not in state:
@@ -97,8 +168,30 @@ class CompanyOpeningAgent:
                     "next_agent": "company_opening_agent",  # mantém tela de upload
                 }
 
-            chain = self.prompt | self.llm | StrOutputParser()
-            response = chain.invoke({"message": state["message"]})
+            key = self._cache_key(state)
+            cached = self.cache.get(key) if self.cache is not None else None
+            if self.cache is not None:
+                cache_result("response", cached is not None)
+            if cached is not None:
+                logger.info("Response cache hit")
+                response = cached["response"]
+                if on_token is not None:
+                    on_token(response)
+            elif cancel is not None:
+                # execução especulativa: não compartilha uma resposta que pode ser cortada
+                response = self._generate(key, self._variables(state), on_token, cancel)
+            else:
+                # mesma chave em voo em outra sessão: recebe os tokens dela à medida que saem
+                response, coalesced = self.flight.do_stream(
+                    key, lambda emit: self._generate(key, self._variables(state), emit), on_token
+                )
+                if coalesced:
+                    logger.info("Shared the answer of an identical in-flight request")
+            if not response.strip():
+                logger.warning("Empty LLM response, answering with the documents list")
+                response = EMPTY_RESPONSE_FALLBACK
+                if on_token is not None:
+                    on_token(response)
             logger.debug(f"LLM response: {response[:120]}...")
 
             # ❗ Mantém next_agent para que a UI continue exibindo uploads
@@ -112,3 +205,51 @@ class CompanyOpeningAgent:
                 "response": "Desculpe, ocorreu um erro ao processar sua solicitação.",
                 "next_agent": "company_opening_agent",
             }
+
+    async def aprocess(
+        self,
+        state: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Versão assíncrona de ``process``; cancelar a task interrompe a geração."""
+        try:
+            logger.info(f"Processing company opening message (async): {state.get('message', '')[:60]}...")
+            if "message" not in state:
+                logger.warning("No message found in state")
+                return {
+                    "response": "Desculpe, não entendi sua mensagem.",
+                    "next_agent": "company_opening_agent",
+                }
+
+            key = self._cache_key(state)
+            cached = self.cache.get(key) if self.cache is not None else None
+            if self.cache is not None:
+                cache_result("response", cached is not None)
+            if cached is not None:
+                logger.info("Response cache hit")
+                response = cached["response"]
+                if on_token is not None:
+                    on_token(response)
+            else:
+                response, coalesced = await self.flight.ado_stream(
+                    key, lambda emit: self._agenerate(key, self._variables(state), emit), on_token
+                )
+                if coalesced:
+                    logger.info("Shared the answer of an identical in-flight request")
+            if not response.strip():
+                logger.warning("Empty LLM response, answering with the documents list")
+                response = EMPTY_RESPONSE_FALLBACK
+                if on_token is not None:
+                    on_token(response)
+            logger.debug(f"LLM response: {response[:120]}...")
+
+            return {
+                "response": response,
+                "next_agent": "company_opening_agent",
+            }
+        except Exception:
+            logger.error("Error in CompanyOpeningAgent", exc_info=True)
+            return {
+                "response": "Desculpe, ocorreu um erro ao processar sua solicitação.",
+                "next_agent": "company_opening_agent",
+            }
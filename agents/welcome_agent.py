@@ -1,19 +1,26 @@
 # agents/welcome_agent.py  – versão completa, com logging e modelos atualizados
 
 from __future__ import annotations
-from typing import Dict, Any
-import json
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 import os
 import logging
+import threading
 
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
+from langchain_core.runnables import RunnableLambda
 
-from utils.webscraper import ContabilizeiScraper
+from utils.chat_memory import history_digest, to_messages
+from utils.context_packer import count_tokens, pack_context
+from utils.intent_classifier import get_intent_classifier, word_count
+from utils.json_stream import IncrementalJSONParser
+from utils.llm_factory import get_llm
+from utils.metrics import LLMCall, cache_result, llm_span, span
+from utils.response_cache import get_response_cache, make_key, model_name, prompt_version
+from utils.single_flight import get_flight_group
+from utils.webscraper import ContabilizeiScraper, get_shared_scraper
 
 # --------------------------------------------------------------------------- #
 #                                LOGGING                                      #
@@ -26,8 +33,8 @@ load_dotenv()
 #                SCHEMA JSON QUE A LLM DEVE DEVOLVER                          #
 # --------------------------------------------------------------------------- #
 class IntentOutput(BaseModel):
-    response: str = Field(..., description="Texto final para o usuário")
     intent: str = Field(..., description="abrir_empresa ou geral")
+    response: str = Field(..., description="Texto final para o usuário")
 
 
 INTENT_TO_AGENT = {
@@ -35,6 +42,79 @@ INTENT_TO_AGENT = {
     "geral": "end_node",
 }
 
+# resposta do turno que passa para o especialista sem texto da LLM (fast path ou JSON vazio);
+# o company_opening_agent responde em seguida, mas o encaminhamento nunca fica em branco
+HANDOFF_RESPONSE = "Ótimo! Vou te ajudar com a abertura da sua empresa."
+
+
+# --------------------------------------------------------------------------- #
+#                    DECODIFICAÇÃO INCREMENTAL DA SAÍDA                       #
+# --------------------------------------------------------------------------- #
+class _IntentStreamDecoder:
+    """Estado de ``WelcomeAgent._json_safe`` compartilhado pelas versões sync e async."""
+
+    def __init__(
+        self,
+        normalize_intent: Callable[[Any], str],
+        on_token: Optional[Callable[[str], None]],
+        on_intent: Optional[Callable[[str], None]],
+    ):
+        self.parser = IncrementalJSONParser()
+        self.normalize_intent = normalize_intent
+        self.on_token = on_token
+        self.on_intent = on_intent
+        self.complete = True
+        self.next_agent: Optional[str] = None
+        self.pending: List[str] = []          # response gerada antes de a intent chegar
+
+    def feed(self, chunk: str) -> None:
+        for kind, key, value in self.parser.feed(chunk):
+            if kind == "field" and key == "intent" and self.next_agent is None:
+                self.next_agent = INTENT_TO_AGENT[self.normalize_intent(value)]
+                logger.debug(f"Intent decoded mid-stream: {value}")
+                if self.on_intent is not None:
+                    self.on_intent(self.next_agent)
+                if self.on_token is not None and self.next_agent == "end_node":
+                    for text in self.pending:
+                        self.on_token(text)
+                self.pending.clear()
+            elif kind == "delta" and key == "response" and self.on_token is not None:
+                if self.next_agent is None:
+                    self.pending.append(value)
+                elif self.next_agent == "end_node":
+                    self.on_token(value)
+
+    def interrupted(self) -> None:
+        """Chamado dentro do ``except`` do stream: re-levanta se nada foi gerado."""
+        if not self.parser.raw:
+            raise
+        self.complete = False
+        logger.error("LLM stream interrupted, keeping partial output", exc_info=True)
+
+    def finish(self) -> Tuple[IntentOutput, bool]:
+        parser = self.parser
+        logger.debug(f"Raw LLM output: {parser.raw[:120]}...")
+        data = parser.close()
+        if "intent" not in data or "response" not in data:
+            self.complete = False
+            logger.warning(f"Incomplete LLM JSON, recovered fields: {sorted(data)}")
+        intent = self.normalize_intent(data.get("intent"))
+        response = data.get("response")
+        if not response and "response" in data and INTENT_TO_AGENT[intent] != "end_node":
+            response = HANDOFF_RESPONSE
+        if not response:
+            # modelo respondeu em texto livre em vez de JSON
+            text = parser.raw.strip()
+            response = text if text and "{" not in text else "Desculpe, não entendi sua solicitação."
+
+        if self.next_agent is None:
+            self.next_agent = INTENT_TO_AGENT[intent]
+            if self.on_intent is not None:
+                self.on_intent(self.next_agent)
+            if self.on_token is not None and self.next_agent == "end_node":
+                self.on_token(response)
+        return IntentOutput(intent=intent, response=str(response)), self.complete
+
 
 # --------------------------------------------------------------------------- #
 #                                 AGENTE                                      #
@@ -42,39 +122,38 @@ INTENT_TO_AGENT = {
 class WelcomeAgent:
     """Primeiro contato – detecta dinamicamente a intenção do usuário."""
 
-    def __init__(self, llm_provider: str = "openai"):
+    def __init__(
+        self,
+        llm_provider: str = "openai",
+        llm=None,
+        scraper: Optional[ContabilizeiScraper] = None,
+    ):
         logger.info(f"Initializing WelcomeAgent with {llm_provider} provider")
-        self.llm = self._init_llm(llm_provider)
-        self.scraper = ContabilizeiScraper()
+        self.llm_provider = llm_provider.lower()
+        # cliente LLM e scraper/índice são compartilhados por todo o processo
+        self.llm = llm if llm is not None else get_llm(self.llm_provider)
+        self.scraper = scraper if scraper is not None else get_shared_scraper()
         self.prompt = self._create_prompt()
+        self.answer_prompt = self._create_answer_prompt()
+        self.cache = get_response_cache()
+        # mensagens idênticas em voo ao mesmo tempo fazem uma chamada só à LLM
+        self.flight = get_flight_group("llm")
+        self.prompt_versions = {
+            "json": prompt_version(self.prompt),
+            "answer": prompt_version(self.answer_prompt),
+        }
+        # classificador local: mensagens óbvias não passam pela LLM de intenção
+        self.classifier = get_intent_classifier()
+        self.fastpath_threshold = float(os.getenv("INTENT_FASTPATH_THRESHOLD", "0.9"))
+        # uma palavra solta ("empresa", "abrir") sai com confiança alta demais: vai para a LLM
+        self.fastpath_min_words = int(os.getenv("INTENT_FASTPATH_MIN_WORDS", "2"))
+        # agente compartilhado entre as threads das sessões
+        self.intent_stats = {"fast_path": 0, "llm_fallback": 0}
+        self._stats_lock = threading.Lock()
+        # limite de tokens dos trechos do site colados no prompt
+        self.context_token_budget = int(os.getenv("WEBSITE_CONTEXT_TOKEN_BUDGET", "800"))
         logger.debug("WelcomeAgent initialization completed")
 
-    # --------------------------------------------------------------------- #
-    #                           LLM LOADER                                  #
-    # --------------------------------------------------------------------- #
-    @staticmethod
-    def _init_llm(provider: str):
-        try:
-            provider = provider.lower()
-            if provider == "openai":
-                logger.debug("Initializing OpenAI LLM (gpt‑4o-mini)")
-                return ChatOpenAI(
-                    model="gpt-4o-mini",
-                    temperature=0,
-                    api_key=os.getenv("OPENAI_API_KEY"),
-                )
-            if provider == "groq":
-                logger.debug("Initializing Groq LLM (llama3-70b-8192)")
-                return ChatGroq(
-                    model="llama3-70b-8192",          # modelo em produção no Groq
-                    temperature=0,
-                    api_key=os.getenv("GROQ_API_KEY"),
-                )
-            raise ValueError(f"Unsupported provider: {provider}")
-        except Exception as e:
-            logger.error("Error initializing LLM", exc_info=True)
-            raise
-
     # --------------------------------------------------------------------- #
     #                              PROMPT                                   #
     # --------------------------------------------------------------------- #
@@ -89,56 +168,482 @@ class WelcomeAgent:
                     "Classifique a intenção do usuário:\n"
                     " • abrir empresa/CNPJ  -> intent = abrir_empresa\n"
                     " • outro assunto       -> intent = geral\n\n"
-                    "Responda em JSON puro compatível com:\n"
-                    '{{"response": <texto>, "intent": <string>}}'
+                    "Responda em JSON puro compatível com o formato abaixo, "
+                    "sempre com o campo intent primeiro:\n"
+                    '{{"intent": <string>, "response": <texto>}}'
+                ),
+                ("system", "Trechos do site:\n{website_content}"),
+                # resumo + últimas mensagens da conversa (utils/chat_memory.py)
+                MessagesPlaceholder("history", optional=True),
+                ("human", "{message}"),
+            ]
+        )
+
+    @staticmethod
+    def _create_answer_prompt() -> ChatPromptTemplate:
+        """Prompt sem classificação, usado quando a intent já veio do fast path."""
+        return ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    "Você é um assistente da Contabilizei.\n"
+                    "Responda à pergunta do usuário de forma objetiva, "
+                    "usando os trechos do site quando forem relevantes."
                 ),
                 ("system", "Trechos do site:\n{website_content}"),
+                # resumo + últimas mensagens da conversa (utils/chat_memory.py)
+                MessagesPlaceholder("history", optional=True),
                 ("human", "{message}"),
             ]
         )
 
+    # --------------------------------------------------------------------- #
+    #                        LOCAL INTENT FAST PATH                         #
+    # --------------------------------------------------------------------- #
+    def _classify_locally(self, message: str) -> Optional[str]:
+        """Intent do classificador local se a confiança passar do limiar; senão None."""
+        if self.classifier is None:
+            return None
+        if word_count(message) < self.fastpath_min_words:
+            self._count_intent("llm_fallback")
+            logger.debug("Message too short for the local classifier, falling back to LLM")
+            return None
+        intent, confidence = self.classifier.predict(message)
+        if confidence >= self.fastpath_threshold:
+            self._count_intent("fast_path")
+            logger.info(f"Fast-path intent: {intent} (confidence {confidence:.2f})")
+            return intent
+        self._count_intent("llm_fallback")
+        logger.debug(f"Low-confidence intent {intent} ({confidence:.2f}), falling back to LLM")
+        return None
+
+    def _count_intent(self, outcome: str) -> None:
+        with self._stats_lock:
+            self.intent_stats[outcome] += 1
+
+    @property
+    def fallback_rate(self) -> float:
+        """Fração das mensagens que precisaram da LLM para classificar a intenção."""
+        with self._stats_lock:
+            total = self.intent_stats["fast_path"] + self.intent_stats["llm_fallback"]
+            return self.intent_stats["llm_fallback"] / total if total else 0.0
+
     # --------------------------------------------------------------------- #
     #                     PARSE & SAFEGUARD LLM OUTPUT                      #
     # --------------------------------------------------------------------- #
     @staticmethod
-    def _json_safe(chain, vars: dict) -> IntentOutput:
-        raw = chain.invoke(vars)
-        logger.debug(f"Raw LLM output: {raw[:120]}...")
+    def _handoff_response(response: str, next_agent: str) -> str:
+        """Encaminhamento para o especialista com texto vazio vira ``HANDOFF_RESPONSE``."""
+        if next_agent != "end_node" and not response.strip():
+            return HANDOFF_RESPONSE
+        return response
+
+    @staticmethod
+    def _normalize_intent(value: Any) -> str:
+        intent = str(value or "").strip().lower()
+        return intent if intent in INTENT_TO_AGENT else "geral"
+
+    @classmethod
+    def _json_safe(
+        cls,
+        chain,
+        vars: dict,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_intent: Optional[Callable[[str], None]] = None,
+        call: Optional[LLMCall] = None,
+    ) -> Tuple[IntentOutput, bool]:
+        """Decodifica o JSON da LLM à medida que ele é gerado.
+
+        ``on_intent`` é chamado com o próximo agente assim que o campo intent
+        fecha, antes de a resposta terminar. ``on_token`` recebe o texto de
+        response em tempo real, apenas quando ele é a resposta final (geral).
+        JSON truncado ou inválido não descarta o turno: usa-se o que foi lido.
+        Devolve também se a saída veio completa (só então ela pode ir ao cache).
+        ``call`` (``metrics.llm_span``) registra o primeiro token e a saída.
+        """
+        decoder = _IntentStreamDecoder(cls._normalize_intent, on_token, on_intent)
         try:
-            return IntentOutput(**json.loads(raw))
+            for chunk in chain.stream(vars):
+                if call is not None:
+                    call.token(chunk)
+                decoder.feed(chunk)
         except Exception:
-            logger.error("Failed to parse LLM JSON", exc_info=True)
-            return IntentOutput(
-                response="Desculpe, não entendi sua solicitação.",
-                intent="geral",
-            )
+            decoder.interrupted()
+        return decoder.finish()
+
+    @classmethod
+    async def _ajson_safe(
+        cls,
+        chain,
+        vars: dict,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_intent: Optional[Callable[[str], None]] = None,
+        call: Optional[LLMCall] = None,
+    ) -> Tuple[IntentOutput, bool]:
+        """Versão assíncrona de ``_json_safe`` (``chain.astream``)."""
+        decoder = _IntentStreamDecoder(cls._normalize_intent, on_token, on_intent)
+        try:
+            async for chunk in chain.astream(vars):
+                if call is not None:
+                    call.token(chunk)
+                decoder.feed(chunk)
+        except Exception:
+            decoder.interrupted()
+        return decoder.finish()
+
+    def _cache_key(
+        self, mode: str, message: str, context_version: Optional[str] = None, history: str = ""
+    ) -> Optional[str]:
+        """Chave do cache de respostas e do single-flight; None se a versão do site falhar.
+
+        ``history`` é o digest da memória da conversa: a mesma pergunta em
+        conversas diferentes pode ter respostas diferentes.
+        """
+        if context_version is None:
+            try:
+                context_version = self.scraper.corpus_version()
+            except Exception:
+                logger.error("Could not read website corpus version, skipping cache", exc_info=True)
+                return None
+        return make_key(
+            f"welcome_agent:{mode}", self.llm_provider, model_name(self.llm),
+            self.prompt_versions[mode], message, context_version, history,
+        )
+
+    async def _acache_key(self, mode: str, message: str, history: str = "") -> Optional[str]:
+        try:
+            context_version = await self.scraper.acorpus_version()
+        except Exception:
+            logger.error("Could not read website corpus version, skipping cache", exc_info=True)
+            return None
+        return self._cache_key(mode, message, context_version, history)
+
+    def _cached_result(
+        self,
+        key: Optional[str],
+        on_token: Optional[Callable[[str], None]],
+        on_intent: Optional[Callable[[str], None]],
+    ) -> Optional[Dict[str, Any]]:
+        """Resposta do cache (mesma pergunta normalizada, mesmo prompt e mesmo snapshot do site)."""
+        if key is None or self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        cache_result("response", cached is not None)
+        if cached is None:
+            return None
+        logger.info(f"Response cache hit → next agent: {cached['next_agent']}")
+        return self._replay(cached, on_token, on_intent)
+
+    @staticmethod
+    def _replay(
+        result: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]],
+        on_intent: Optional[Callable[[str], None]],
+    ) -> Dict[str, Any]:
+        """Entrega um resultado pronto (cache) pelos callbacks."""
+        if on_intent is not None:
+            on_intent(result["next_agent"])
+        if on_token is not None and result["next_agent"] == "end_node":
+            on_token(result["response"])
+        return {"response": result["response"], "next_agent": result["next_agent"]}
+
+    @staticmethod
+    def _emitters(emit: Callable[[Tuple[str, str]], None]) -> Tuple[Callable[[str], None], Callable[[str], None]]:
+        """(on_token, on_intent) da chamada compartilhada pelo single-flight: viram eventos para todos."""
+        return (lambda token: emit(("token", token))), (lambda next_agent: emit(("intent", next_agent)))
+
+    @staticmethod
+    def _event_sink(
+        on_token: Optional[Callable[[str], None]],
+        on_intent: Optional[Callable[[str], None]],
+    ) -> Callable[[Tuple[str, str]], None]:
+        """Entrega os eventos da chamada compartilhada aos callbacks de quem espera por ela."""
+        def deliver(event: Tuple[str, str]) -> None:
+            kind, value = event
+            if kind == "intent":
+                if on_intent is not None:
+                    on_intent(value)
+            elif on_token is not None:
+                on_token(value)
+        return deliver
 
     # --------------------------------------------------------------------- #
-    #                               MAIN                                    #
+    #                          WEBSITE CONTEXT                              #
     # --------------------------------------------------------------------- #
-    def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        logger.info(f"Processing welcome message: {state.get('message', '')[:60]}...")
+    def _website_context(self, message: str) -> str:
+        """Usa a ferramenta de web‑scraper e empacota os trechos no orçamento de tokens."""
+        try:
+            logger.debug("Fetching website content")
+            return self._pack_passages(self.scraper.search_passages(message, k=20))
+        except Exception:
+            logger.error("Error fetching website content", exc_info=True)
+            return "Conteúdo indisponível."
 
-        # 1) Usa ferramenta de web‑scraper
+    async def _awebsite_context(self, message: str) -> str:
         try:
             logger.debug("Fetching website content")
-            site_excerpt = self.scraper.search_content(state["message"])
-            logger.debug(f"Website excerpt retrieved: {site_excerpt[:120]}...")
+            return self._pack_passages(await self.scraper.asearch_passages(message, k=20))
         except Exception:
             logger.error("Error fetching website content", exc_info=True)
-            site_excerpt = "Conteúdo indisponível."
+            return "Conteúdo indisponível."
 
-        # 2) Chama LLM
-        chain = self.prompt | self.llm | StrOutputParser()
-        result = self._json_safe(
-            chain,
-            {"website_content": site_excerpt, "message": state["message"]},
+    def _pack_passages(self, passages: List[Tuple[str, float]]) -> str:
+        # o agente é compartilhado entre sessões: o resultado do empacotamento é do turno
+        # (vai para o trace), não um atributo do agente
+        with span("welcome.pack_context") as pack_span:
+            packed = pack_context(passages, self.context_token_budget)
+            pack_span.attrs.update(
+                tokens=packed.tokens_used,
+                passages=packed.passages_used,
+                duplicates=packed.duplicates_dropped,
+                over_budget=packed.over_budget_dropped,
+            )
+        site_excerpt = packed.text or "Nenhuma informação relevante encontrada no site."
+        logger.info(
+            f"Website context: {packed.tokens_used}/{self.context_token_budget} tokens, "
+            f"{packed.passages_used} trechos "
+            f"({packed.duplicates_dropped} duplicados, "
+            f"{packed.over_budget_dropped} fora do orçamento)"
         )
+        logger.debug(f"Website excerpt retrieved: {site_excerpt[:120]}...")
+        return site_excerpt
 
-        next_agent = INTENT_TO_AGENT.get(result.intent, "end_node")
-        logger.info(f"Intent detected: {result.intent} → next agent: {next_agent}")
+    # --------------------------------------------------------------------- #
+    #                          CONVERSATION MEMORY                          #
+    # --------------------------------------------------------------------- #
+    @staticmethod
+    def _history_digest(state: Dict[str, Any]) -> str:
+        return history_digest(state.get("history") or [], state.get("summary") or "")
+
+    @staticmethod
+    def _prompt_tokens(variables: Dict[str, Any]) -> int:
+        """Estimativa dos tokens variáveis do prompt (trechos, memória e mensagem)."""
+        texts = [variables["website_content"], variables["message"]]
+        texts.extend(str(m.content) for m in variables["history"])
+        return sum(count_tokens(text) for text in texts)
 
+    @staticmethod
+    def _variables(state: Dict[str, Any], site_excerpt: str) -> Dict[str, Any]:
         return {
-            "response": result.response,
-            "next_agent": next_agent,
+            "website_content": site_excerpt,
+            "message": state["message"],
+            "history": to_messages(state.get("history") or [], state.get("summary") or ""),
         }
+
+    # --------------------------------------------------------------------- #
+    #                               MAIN                                    #
+    # --------------------------------------------------------------------- #
+    def _fast_path(
+        self, message: str, on_intent: Optional[Callable[[str], None]]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """(resultado pronto ou None, intent do classificador local ou None)."""
+        with span("welcome.classify") as classify_span:
+            fast_intent = self._classify_locally(message)
+            classify_span.attrs["intent"] = fast_intent or "llm"
+        if fast_intent == "abrir_empresa":
+            # nem scraper nem LLM: o especialista responde
+            next_agent = INTENT_TO_AGENT[fast_intent]
+            if on_intent is not None:
+                on_intent(next_agent)
+            return {"response": HANDOFF_RESPONSE, "next_agent": next_agent}, fast_intent
+        return None, fast_intent
+
+    def process(
+        self,
+        state: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None,
+        on_intent: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """``on_token`` recebe o texto da resposta quando ela é a final (intent geral);
+        ``on_intent`` recebe o próximo agente assim que a intent é decodificada."""
+        logger.info(f"Processing welcome message: {state.get('message', '')[:60]}...")
+
+        # 0) Fast path: o classificador local decide sem a LLM de intenção
+        result, fast_intent = self._fast_path(state["message"], on_intent)
+        if result is not None:
+            return result
+
+        # 1) Cache de respostas
+        mode = "answer" if fast_intent == "geral" else "json"
+        key = self._cache_key(mode, state["message"], history=self._history_digest(state))
+        cached = self._cached_result(key, on_token, on_intent)
+        if cached is not None:
+            return cached
+
+        if key is None:
+            return self._generate(fast_intent, state, None, on_token, on_intent)
+        # mesma chave em voo em outra sessão: recebe os tokens dela à medida que saem
+        result, coalesced = self.flight.do_stream(
+            key,
+            lambda emit: self._generate(fast_intent, state, key, *self._emitters(emit)),
+            self._event_sink(on_token, on_intent),
+        )
+        if coalesced:
+            logger.info("Shared the answer of an identical in-flight request")
+        return dict(result)
+
+    def _generate(
+        self,
+        fast_intent: Optional[str],
+        state: Dict[str, Any],
+        key: Optional[str],
+        on_token: Optional[Callable[[str], None]],
+        on_intent: Optional[Callable[[str], None]],
+    ) -> Dict[str, Any]:
+        """Contexto do site + LLM; resultados completos vão para o cache."""
+        with span("welcome.context"):
+            variables = self._variables(state, self._website_context(state["message"]))
+
+        if fast_intent == "geral":
+            if on_intent is not None:
+                on_intent("end_node")
+            chain = self.answer_prompt | self.llm | StrOutputParser()
+            with llm_span("welcome", self._prompt_tokens(variables)) as call:
+                if on_token is None:
+                    response = chain.invoke(variables)
+                else:
+                    response = ""
+                    for token in chain.stream(variables):
+                        call.token(token)
+                        response += token
+                        on_token(token)
+                call.output = response
+            result = {"response": response, "next_agent": "end_node"}
+            complete = bool(response)
+        else:
+            # 2) Intenção ambígua: a LLM classifica e responde em JSON
+            chain = self.prompt | self.llm | StrOutputParser()
+            with llm_span("welcome", self._prompt_tokens(variables)) as call:
+                output, complete = self._json_safe(
+                    chain, variables, on_token=on_token, on_intent=on_intent, call=call
+                )
+                call.output = output.response
+            next_agent = INTENT_TO_AGENT[output.intent]
+            logger.info(f"Intent detected: {output.intent} → next agent: {next_agent}")
+            result = {"response": self._handoff_response(output.response, next_agent), "next_agent": next_agent}
+
+        if key is not None and self.cache is not None and complete:
+            self.cache.put(key, result)
+        return result
+
+    async def aprocess(
+        self,
+        state: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None,
+        on_intent: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Versão assíncrona de ``process`` (scraper httpx, ``ainvoke``/``astream``)."""
+        logger.info(f"Processing welcome message (async): {state.get('message', '')[:60]}...")
+
+        result, fast_intent = self._fast_path(state["message"], on_intent)
+        if result is not None:
+            return result
+
+        mode = "answer" if fast_intent == "geral" else "json"
+        key = await self._acache_key(mode, state["message"], self._history_digest(state))
+        cached = self._cached_result(key, on_token, on_intent)
+        if cached is not None:
+            return cached
+
+        if key is None:
+            return await self._agenerate(fast_intent, state, None, on_token, on_intent)
+        result, coalesced = await self.flight.ado_stream(
+            key,
+            lambda emit: self._agenerate(fast_intent, state, key, *self._emitters(emit)),
+            self._event_sink(on_token, on_intent),
+        )
+        if coalesced:
+            logger.info("Shared the answer of an identical in-flight request")
+        return dict(result)
+
+    async def _agenerate(
+        self,
+        fast_intent: Optional[str],
+        state: Dict[str, Any],
+        key: Optional[str],
+        on_token: Optional[Callable[[str], None]],
+        on_intent: Optional[Callable[[str], None]],
+    ) -> Dict[str, Any]:
+        with span("welcome.context"):
+            variables = self._variables(state, await self._awebsite_context(state["message"]))
+
+        if fast_intent == "geral":
+            if on_intent is not None:
+                on_intent("end_node")
+            chain = self.answer_prompt | self.llm | StrOutputParser()
+            with llm_span("welcome", self._prompt_tokens(variables)) as call:
+                if on_token is None:
+                    response = await chain.ainvoke(variables)
+                else:
+                    response = ""
+                    async for token in chain.astream(variables):
+                        call.token(token)
+                        response += token
+                        on_token(token)
+                call.output = response
+            result = {"response": response, "next_agent": "end_node"}
+            complete = bool(response)
+        else:
+            chain = self.prompt | self.llm | StrOutputParser()
+            with llm_span("welcome", self._prompt_tokens(variables)) as call:
+                output, complete = await self._ajson_safe(
+                    chain, variables, on_token=on_token, on_intent=on_intent, call=call
+                )
+                call.output = output.response
+            next_agent = INTENT_TO_AGENT[output.intent]
+            logger.info(f"Intent detected: {output.intent} → next agent: {next_agent}")
+            result = {"response": self._handoff_response(output.response, next_agent), "next_agent": next_agent}
+
+        if key is not None and self.cache is not None and complete:
+            self.cache.put(key, result)
+        return result
+
+    # --------------------------------------------------------------------- #
+    #                        CLASSIFICAÇÃO EM LOTE                          #
+    # --------------------------------------------------------------------- #
+    async def aclassify_batch(
+        self,
+        messages: List[str],
+        max_concurrency: int = 8,
+        before_llm: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> List[Tuple[str, str]]:
+        """(intent, origem) de cada mensagem, sem gerar o turno completo.
+
+        O classificador local decide as mensagens óbvias ("fast_path"); as
+        demais vão num único ``chain.abatch`` com o prompt JSON ("llm").
+        Falhas da LLM viram ("geral", "error"). ``before_llm`` é aguardado
+        antes de cada chamada à LLM (ex.: rate limit), nunca no fast path.
+        """
+        results: List[Optional[Tuple[str, str]]] = [None] * len(messages)
+        pending: List[int] = []
+        for i, message in enumerate(messages):
+            fast_intent = self._classify_locally(message)
+            if fast_intent is not None:
+                results[i] = (fast_intent, "fast_path")
+            else:
+                pending.append(i)
+
+        if pending:
+            variables = [
+                {"website_content": await self._awebsite_context(messages[i]), "message": messages[i]}
+                for i in pending
+            ]
+            chain = self.prompt | self.llm | StrOutputParser()
+            if before_llm is not None:
+                async def wait_turn(variables: Dict[str, Any]) -> Dict[str, Any]:
+                    await before_llm()
+                    return variables
+
+                chain = RunnableLambda(wait_turn) | chain
+            outputs = await chain.abatch(
+                variables, config={"max_concurrency": max_concurrency}, return_exceptions=True
+            )
+            for i, output in zip(pending, outputs):
+                if isinstance(output, Exception):
+                    logger.error(f"Batch classification failed: {output}")
+                    results[i] = ("geral", "error")
+                    continue
+                parser = IncrementalJSONParser()
+                parser.feed(output)
+                results[i] = (self._normalize_intent(parser.close().get("intent")), "llm")
+        return results
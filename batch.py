@@ -0,0 +1,276 @@
+"""Processamento offline de mensagens em JSONL (replay de conversas registradas).
+
+Uso:
+    python batch.py mensagens.jsonl -o resultados.jsonl [--mode full|route]
+                    [--provider openai] [--concurrency 8] [--rate-limit 5]
+
+Cada linha de entrada: ``{"id": ..., "message": ..., "session_id": ...}``
+(``id`` e ``session_id`` opcionais: o padrão é o número da linha / o id).
+Mensagens da mesma sessão rodam em ordem, sessões diferentes em paralelo.
+
+--mode full   executa o workflow completo (``aprocess_message``) e grava a
+              resposta, o próximo agente e o tempo de cada mensagem.
+--mode route  só verifica o roteamento: classificador local + LLM de intenção
+              em lotes (``chain.abatch``), sem gerar as respostas.
+
+Os resultados são gravados (e descarregados) à medida que ficam prontos;
+rodar de novo com o mesmo ``-o`` pula os ids já gravados com sucesso (os
+que terminaram em erro são tirados da saída e refeitos). No modo full, o
+estado das conversas fica em ``<saída>.sessions.sqlite`` (ou em
+``SESSION_DB_PATH``), então uma sessão retomada continua de onde parou.
+No modo route, ``--rate-limit`` limita só as chamadas à LLM.
+
+O site não é rastreado durante o lote: as respostas vêm do snapshot gravado
+(``CONTABILIZEI_SNAPSHOT_PATH``), então repetir o replay dá o mesmo contexto.
+``--crawl`` liga o rastreamento em background.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Set, TextIO
+
+from dotenv import load_dotenv
+
+from manager.agent_manager import AgentManager
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+
+# --------------------------------------------------------------------------- #
+#                                  ENTRADA                                    #
+# --------------------------------------------------------------------------- #
+def read_records(path: str) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            row["id"] = str(row.get("id", line_number))
+            row.setdefault("session_id", row["id"])
+            records.append(row)
+    return records
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids já gravados com sucesso em ``path``.
+
+    Uma última linha truncada (queda no meio da escrita) e as linhas com
+    ``error`` são removidas do arquivo: esses ids rodam de novo e a nova
+    linha fica no lugar da antiga.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb") as f:
+        data = f.read()
+    if data and not data.endswith(b"\n"):
+        keep = data.rfind(b"\n") + 1
+        logger.warning(f"Dropping truncated last line of {path}")
+        with open(path, "r+b") as f:
+            f.truncate(keep)
+        data = data[:keep]
+    done = set()
+    kept: List[str] = []
+    failed = 0
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if row.get("error"):
+            failed += 1
+            continue
+        done.add(str(row["id"]))
+        kept.append(line)
+    if failed:
+        logger.warning(f"Retrying {failed} failed rows of {path}")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in kept)
+        os.replace(tmp_path, path)
+    return done
+
+
+# --------------------------------------------------------------------------- #
+#                               RATE LIMIT                                    #
+# --------------------------------------------------------------------------- #
+class RateLimiter:
+    """Espaça as chamadas para no máximo ``rate`` por segundo (0 = sem limite)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# --------------------------------------------------------------------------- #
+#                                 EXECUÇÃO                                    #
+# --------------------------------------------------------------------------- #
+class BatchRunner:
+    def __init__(
+        self,
+        manager: AgentManager,
+        out: TextIO,
+        concurrency: int = 8,
+        rate_limit: float = 0.0,
+        timeout: float = 120.0,
+    ):
+        self.manager = manager
+        self.out = out
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = RateLimiter(rate_limit)
+        self.timeout = timeout
+        self.latencies: List[float] = []
+        self.counts: Counter = Counter()
+
+    def _write(self, row: Dict[str, Any]) -> None:
+        self.out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.out.flush()
+        self.counts["errors" if row.get("error") else "ok"] += 1
+
+    async def _full_turn(self, record: Dict[str, Any]) -> None:
+        row: Dict[str, Any] = {"id": record["id"], "session_id": record["session_id"], "message": record["message"]}
+        async with self.semaphore:
+            await self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                row["response"] = await asyncio.wait_for(
+                    self.manager.aprocess_message(
+                        record["message"], record.get("chat_history", []), session_id=record["session_id"]
+                    ),
+                    timeout=self.timeout,
+                )
+                row["next_agent"] = await self.manager.aget_next_agent(record["session_id"])
+            except asyncio.TimeoutError:
+                row["error"] = "timeout"
+            elapsed = time.perf_counter() - started
+        row["latency_ms"] = round(elapsed * 1000, 1)
+        self.latencies.append(elapsed)
+        self._write(row)
+
+    async def run_full(self, records: List[Dict[str, Any]]) -> None:
+        sessions: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        for record in records:
+            sessions.setdefault(record["session_id"], []).append(record)
+
+        async def session(turns: List[Dict[str, Any]]) -> None:
+            for record in turns:          # a ordem importa dentro de uma conversa
+                await self._full_turn(record)
+
+        await asyncio.gather(*(session(turns) for turns in sessions.values()))
+
+    async def run_route(self, records: List[Dict[str, Any]], batch_size: int = 32) -> None:
+        agent = self.manager.agents["welcome_agent"]
+        for start in range(0, len(records), batch_size):
+            chunk = records[start:start + batch_size]
+            started = time.perf_counter()
+            try:
+                # o rate limit vale só para as mensagens que chegam à LLM, não para o fast path
+                results = await asyncio.wait_for(
+                    agent.aclassify_batch(
+                        [r["message"] for r in chunk], max_concurrency=self.concurrency,
+                        before_llm=self.limiter.acquire,
+                    ),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                results = [("geral", "timeout")] * len(chunk)
+            elapsed = time.perf_counter() - started
+            for record, (intent, source) in zip(chunk, results):
+                row = {"id": record["id"], "message": record["message"], "intent": intent, "source": source,
+                       "batch_size": len(chunk), "latency_ms": round(elapsed * 1000, 1)}
+                if "intent" in record:           # rótulo esperado, quando o log tem
+                    row["expected"] = record["intent"]
+                    row["correct"] = record["intent"] == intent
+                if source in ("error", "timeout"):
+                    row["error"] = source
+                self.counts[f"intent:{intent}"] += 1
+                self.counts[f"source:{source}"] += 1
+                if "correct" in row:
+                    self.counts["correct" if row["correct"] else "incorrect"] += 1
+                self.latencies.append(elapsed / len(chunk))
+                self._write(row)
+
+
+def _summary(runner: BatchRunner, elapsed: float, skipped: int) -> str:
+    processed = len(runner.latencies)
+    lines = [f"processed {processed} messages in {elapsed:.1f}s "
+             f"({processed / elapsed if elapsed else 0:.1f}/s), skipped {skipped} already done"]
+    if runner.latencies:
+        latencies = sorted(runner.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        lines.append(f"latency p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms")
+    lines.append(", ".join(f"{k}={v}" for k, v in sorted(runner.counts.items())))
+    return "\n".join(lines)
+
+
+def session_state_defaults(output: str) -> None:
+    """Estado das conversas ao lado da saída: numa retomada, os turnos já gravados continuam valendo."""
+    os.environ.setdefault("SESSION_DB_PATH", os.path.splitext(output)[0] + ".sessions.sqlite")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Processa mensagens JSONL pelo workflow de agentes")
+    parser.add_argument("input", help="JSONL com {id, message, session_id}")
+    parser.add_argument("-o", "--output", help="JSONL de saída (padrão: <input>.out.jsonl)")
+    parser.add_argument("--mode", choices=["full", "route"], default="full")
+    parser.add_argument("--provider", default=os.getenv("LLM_PROVIDER", "openai"), choices=["openai", "groq"])
+    parser.add_argument("--concurrency", type=int, default=8, help="chamadas simultâneas no máximo")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="mensagens por segundo (0 = sem limite); no modo route, só as que vão à LLM")
+    parser.add_argument("--batch-size", type=int, default=32, help="tamanho do lote no modo route")
+    parser.add_argument("--timeout", type=float, default=120.0, help="segundos por mensagem (por lote no modo route)")
+    parser.add_argument("--crawl", action="store_true",
+                        help="rastreia o site durante o lote (padrão: só o snapshot gravado)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    output = args.output or os.path.splitext(args.input)[0] + ".out.jsonl"
+    records = read_records(args.input)
+    done = completed_ids(output)
+    todo = [r for r in records if r["id"] not in done]
+    if args.mode == "full":
+        session_state_defaults(output)
+    # sem --crawl, nada de rastrear o site em produção no meio de um replay
+    if args.crawl:
+        os.environ["SITE_CRAWLER_ENABLED"] = "1"
+    elif os.getenv("SITE_CRAWLER_ENABLED", "1") != "0":
+        os.environ["SITE_CRAWLER_ENABLED"] = "snapshot"
+
+    manager = AgentManager(args.provider)
+
+    async def run() -> BatchRunner:
+        with open(output, "a", encoding="utf-8") as out:
+            runner = BatchRunner(manager, out, args.concurrency, args.rate_limit, args.timeout)
+            if args.mode == "route":
+                await runner.run_route(todo, args.batch_size)
+            else:
+                await runner.run_full(todo)
+            await manager.agents["welcome_agent"].scraper.aclose()
+            return runner
+
+    started = time.perf_counter()
+    runner = asyncio.run(run())
+    print(_summary(runner, time.perf_counter() - started, len(records) - len(todo)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
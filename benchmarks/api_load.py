@@ -0,0 +1,178 @@
+"""Load test of the HTTP API (server.py) with several workers and the fake LLM.
+
+Usage:
+    python -m benchmarks.api_load [--workers 1 4] [--sessions 50] [--turns 5]
+                                  [--latency 0.3] [--tokens-per-second 200] [-o results.json]
+
+For each ``--workers`` value the ``server.py`` app is started under uvicorn
+(separate processes, fake LLM registered by ``benchmarks/fake_api.py``) with
+session state and response cache in temporary SQLite files and the site
+crawled from the recorded fixture pages. Then
+``--sessions`` clients run the scripted conversation at once over
+``/chat/stream``, each turn a new HTTP request that may land on any worker.
+
+Reports time to first token and full-turn latency (p50/p95/p99), turns per
+second, errors, and a continuity check: after "quero abrir um cnpj" the next
+turn must still be in the company-opening flow, which only holds if the
+worker serving it sees the state written by another one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.suite import CONVERSATION, summarize
+from utils.testing.fixture_site import start_fixture_site
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPENING_TURN = CONVERSATION.index("quero abrir um cnpj")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    # server.py não oferece o LLM fake; benchmarks.fake_api registra e expõe o mesmo app
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_api:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, workers: int, timeout: float = 90.0) -> List[str]:
+    """Waits until /health answers; returns the worker pids seen on a few probes."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("API did not start")
+        await asyncio.sleep(0.2)
+    pids = set()
+    for _ in range(workers * 20):
+        pids.add((await client.get("/health")).json()["pid"])
+    return sorted(pids)
+
+
+class LoadResult:
+    def __init__(self):
+        self.first_token: List[float] = []
+        self.turn: List[float] = []
+        self.errors = 0
+        self.continuity_failures = 0
+
+
+async def conversation(client: httpx.AsyncClient, turns: List[str], result: LoadResult) -> None:
+    session_id = uuid.uuid4().hex
+    for index, message in enumerate(turns):
+        started = time.perf_counter()
+        first_token: Optional[float] = None
+        next_agent = None
+        try:
+            async with client.stream("POST", "/chat/stream", json={"message": message, "session_id": session_id}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("done"):
+                        next_agent = event["next_agent"]
+                    elif first_token is None:
+                        first_token = time.perf_counter() - started
+        except httpx.HTTPError:
+            result.errors += 1
+            continue
+        result.turn.append(time.perf_counter() - started)
+        if first_token is not None:
+            result.first_token.append(first_token)
+        if index == OPENING_TURN + 1 and next_agent != "company_opening_agent":
+            result.continuity_failures += 1
+
+
+async def run_load(base_url: str, workers: int, args: argparse.Namespace) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        pids = await wait_ready(client, workers)
+        result = LoadResult()
+        turns = CONVERSATION[: args.turns]
+        started = time.perf_counter()
+        await asyncio.gather(*(conversation(client, turns, result) for _ in range(args.sessions)))
+        elapsed = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "workers_seen": len(pids),
+        "sessions": args.sessions,
+        "turn": summarize(result.turn, elapsed),
+        "first_token": summarize(result.first_token, elapsed),
+        "errors": result.errors,
+        "continuity_failures": result.continuity_failures if args.turns > OPENING_TURN + 1 else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5, help=f"turns per session (max {len(CONVERSATION)})")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM first-token latency (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--cache", action="store_true", help="keep the shared response cache on")
+    parser.add_argument("-o", "--output", help="write the JSON results here")
+    args = parser.parse_args(argv)
+
+    results = []
+    with TemporaryDirectory() as site_dir:
+        server = start_fixture_site(site_dir)
+        for workers in args.workers:
+            with TemporaryDirectory() as state_dir:
+                env = {
+                    **os.environ,
+                    "CONTABILIZEI_BASE_URL": f"http://127.0.0.1:{server.server_port}",
+                    "CONTABILIZEI_SNAPSHOT_PATH": os.path.join(state_dir, "snapshot.json"),
+                    "SESSION_DB_PATH": os.path.join(state_dir, "sessions.sqlite"),
+                    "RESPONSE_CACHE_PATH": os.path.join(state_dir, "response_cache.sqlite"),
+                    "RESPONSE_CACHE_ENABLED": "1" if args.cache else "0",
+                    "LLM_PROVIDER": "fake",
+                    "FAKE_LLM_FIRST_TOKEN_LATENCY": str(args.latency),
+                    "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+                }
+                port = free_port()
+                process = start_api(workers, port, env)
+                try:
+                    results.append(asyncio.run(run_load(f"http://127.0.0.1:{port}", workers, args)))
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+        server.shutdown()
+
+    print(f"{'workers':>7} {'turns':>6} {'turns/s':>8} {'ttft p50':>9} {'ttft p95':>9} "
+          f"{'turn p50':>9} {'turn p95':>9} {'turn p99':>9} {'errors':>7} {'continuity':>11}")
+    for r in results:
+        continuity = "-" if r["continuity_failures"] is None else f"{r['continuity_failures']} fail"
+        print(f"{r['workers']:>7} {r['turn']['n']:>6} {r['turn']['throughput_per_s']:>8.1f} "
+              f"{r['first_token']['p50_ms']:>9.0f} {r['first_token']['p95_ms']:>9.0f} "
+              f"{r['turn']['p50_ms']:>9.0f} {r['turn']['p95_ms']:>9.0f} {r['turn']['p99_ms']:>9.0f} "
+              f"{r['errors']:>7} {continuity:>11}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
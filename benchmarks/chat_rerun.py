@@ -0,0 +1,75 @@
+"""Streamlit rerun time vs. conversation length: full history vs. windowed.
+
+Usage:
+    python -m benchmarks.chat_rerun [--lengths 10 50 200 500 1000] [--reruns 5] [--window 20]
+
+Runs ``ui/streamlit_app.py`` with ``streamlit.testing.v1.AppTest`` (the same
+script execution as a browser rerun, without the websocket) on a session that
+already holds N messages, and times each rerun. ``all`` draws every message
+(``visible_messages = 0``, the old behaviour); ``window`` draws only the last
+``--window`` ones, as the app does by default. No message is sent, so no LLM
+is called.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui", "streamlit_app.py")
+
+USER_MESSAGE = "Sou prestador de serviço em Curitiba, quanto custa a contabilidade e o que está incluso?"
+ASSISTANT_MESSAGE = (
+    "Para prestadores de serviço, a Contabilizei tem planos a partir de **R$ 89/mês**:\n\n"
+    "- abertura de empresa grátis;\n"
+    "- emissão de guias e declarações (DAS, DEFIS, DIRF);\n"
+    "- pró-labore e folha de até 1 funcionário;\n"
+    "- atendimento com contador por chat e telefone.\n\n"
+    "Se o faturamento passar de R$ 81 mil no ano, vale avaliar sair do MEI. Quer que eu explique os regimes?"
+)
+
+
+def conversation(length: int):
+    return [
+        {"role": "user", "content": f"{USER_MESSAGE} ({i // 2})"} if i % 2 == 0
+        else {"role": "assistant", "content": ASSISTANT_MESSAGE}
+        for i in range(length)
+    ]
+
+
+def time_reruns(length: int, visible: int, reruns: int) -> float:
+    """Median rerun time (ms) for a session with ``length`` messages."""
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["messages"] = conversation(length)
+    at.session_state["visible_messages"] = visible
+    at.run()                                    # 1ª execução: imports, manager, caches
+    assert not at.exception, at.exception
+    samples = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 200, 500, 1000])
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--window", type=int, default=20)
+    args = parser.parse_args()
+
+    # a app usa OpenAI por padrão; nenhuma chamada é feita, mas o cliente exige uma chave
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.setdefault("SITE_CRAWLER_ENABLED", "0")
+
+    print(f"{'messages':>9} {'all (ms)':>10} {'window (ms)':>12} {'speedup':>8}")
+    for length in args.lengths:
+        full = time_reruns(length, 0, args.reruns)
+        windowed = time_reruns(length, args.window, args.reruns)
+        print(f"{length:>9} {full:>10.1f} {windowed:>12.1f} {full / windowed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
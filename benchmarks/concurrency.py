@@ -0,0 +1,126 @@
+"""Benchmark: N concurrent conversations, async API vs. thread pool.
+
+Usage:
+    python -m benchmarks.concurrency [--conversations 100] [--turns 2] [--latency 0.3]
+
+Runs against local stand-ins only: a fake streaming LLM (``FAKE_LLM_*``)
+and an in-process HTTP server with a fixture page as CONTABILIZEI_BASE_URL.
+The scraper cache TTL defaults to 0, so every turn revalidates the page
+(conditional GET) through the scraper's HTTP client. "async" runs all
+conversations with ``aprocess_message`` on one event loop; "threads" runs
+them with ``process_message`` on a thread pool of ``--threads`` workers.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+from typing import List, Tuple
+
+from utils.testing.fixture_site import start_server
+
+FIXTURE_HTML = """<!doctype html><html lang="pt-br"><head><meta charset="utf-8"><title>Contabilizei</title></head>
+<body><nav>Planos Blog Entrar</nav><main>
+<h1>Contabilidade online para sua empresa</h1>
+<p>Abra sua empresa grátis com a Contabilizei e tenha um contador online para o seu CNPJ.</p>
+<p>Os planos começam em R$ 99 por mês para prestadores de serviço no Simples Nacional.</p>
+<p>Emitimos as guias de impostos, a folha de pagamento e o pró-labore todos os meses.</p>
+<p>MEI que passou do limite de faturamento pode migrar para ME com a Contabilizei.</p>
+</main><footer>Contabilizei - Curitiba</footer></body></html>"""
+
+QUESTIONS = [
+    "quanto custa o plano para prestador de serviço?",
+    "vocês emitem as guias de impostos?",
+    "sou MEI e passei do limite, o que faço?",
+    "como funciona o pró-labore?",
+]
+
+
+def start_fixture_server(directory: str) -> ThreadingHTTPServer:
+    with open(os.path.join(directory, "index.html"), "w", encoding="utf-8") as f:
+        f.write(FIXTURE_HTML)
+    return start_server(directory)
+
+
+def _conversation(i: int, turns: int) -> List[str]:
+    return [QUESTIONS[(i + t) % len(QUESTIONS)] for t in range(turns)]
+
+
+async def run_async(manager, conversations: int, turns: int) -> Tuple[float, List[float]]:
+    latencies: List[float] = []
+
+    async def converse(i: int) -> None:
+        session_id = uuid.uuid4().hex
+        for message in _conversation(i, turns):
+            started = time.perf_counter()
+            await manager.aprocess_message(message, [], session_id=session_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(converse(i) for i in range(conversations)))
+    elapsed = time.perf_counter() - started
+    await manager.agents["welcome_agent"].scraper.aclose()
+    return elapsed, latencies
+
+
+def run_threads(manager, conversations: int, turns: int, threads: int) -> Tuple[float, List[float]]:
+    latencies: List[float] = []
+
+    def converse(i: int) -> None:
+        session_id = uuid.uuid4().hex
+        for message in _conversation(i, turns):
+            started = time.perf_counter()
+            manager.process_message(message, [], session_id=session_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(converse, range(conversations)))
+    return time.perf_counter() - started, latencies
+
+
+def _report(name: str, elapsed: float, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:>8} {elapsed:8.2f}s {len(latencies) / elapsed:10.1f} turns/s "
+          f"p50 {statistics.median(latencies) * 1000:7.0f} ms  p95 {p95 * 1000:7.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16, help="workers of the thread-pool baseline")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM first-token latency (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--scraper-ttl", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        server = start_fixture_server(directory)
+        os.environ.update(
+            CONTABILIZEI_BASE_URL=f"http://127.0.0.1:{server.server_port}",
+            SITE_CRAWLER_ENABLED="0",
+            RESPONSE_CACHE_ENABLED="0",
+            SCRAPER_CACHE_TTL=str(args.scraper_ttl),
+            FAKE_LLM_FIRST_TOKEN_LATENCY=str(args.latency),
+            FAKE_LLM_TOKENS_PER_SECOND=str(args.tokens_per_second),
+        )
+        from manager.agent_manager import AgentManager
+        from utils.testing.fake_llm import register_fake_provider
+
+        register_fake_provider()
+        manager = AgentManager("fake")
+        print(f"{args.conversations} conversations x {args.turns} turns, "
+              f"fake LLM {args.latency * 1000:.0f} ms to first token, {args.tokens_per_second:.0f} tokens/s")
+        _report("async", *asyncio.run(run_async(manager, args.conversations, args.turns)))
+        _report("threads", *run_threads(manager, args.conversations, args.turns, args.threads))
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
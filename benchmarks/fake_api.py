@@ -0,0 +1,11 @@
+"""``server.app`` with the offline fake LLM registered as provider ``fake``.
+
+Only for load tests (``benchmarks/api_load.py``)::
+
+    LLM_PROVIDER=fake uvicorn benchmarks.fake_api:app --workers 4
+"""
+from utils.testing.fake_llm import register_fake_provider
+
+register_fake_provider()
+
+from server import app  # noqa: E402,F401
@@ -0,0 +1,104 @@
+"""Benchmark: tail latency with and without hedged requests between two providers.
+
+Usage:
+    python -m benchmarks.hedging [--requests 200] [--hedge-after 0.5] [--spike-rate 0.1]
+
+Two in-process fake providers stand in for OpenAI and Groq. The primary
+usually answers in ``--base`` seconds but, with probability ``--spike-rate``,
+takes ``--spike`` seconds to its first token; with ``--error-rate`` it fails
+before answering. Reports first-answer latency p50/p95/p99 for the primary
+alone and for ``HedgedChatModel`` (plus its hedge/failover counters).
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from langchain_core.messages import HumanMessage
+
+from utils.provider_router import HedgedChatModel
+from utils.testing.fake_llm import FakeStreamingChatModel
+
+
+class FlakyFakeModel(FakeStreamingChatModel):
+    """Fake provider with latency spikes and injected errors."""
+
+    spike_rate: float = 0.0
+    spike: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    def model_post_init(self, __context) -> None:
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+
+    def _chunks(self, messages):
+        if self._rng.random() < self.error_rate:
+            raise ConnectionError("injected provider error")
+        return super()._chunks(messages)
+
+    def _delay(self, index: int) -> float:
+        if index == 0 and self._rng.random() < self.spike_rate:
+            return self.spike
+        return super()._delay(index)
+
+
+def _percentiles(values: List[float]) -> str:
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return f"p50 {pick(0.5):7.0f} ms  p95 {pick(0.95):7.0f} ms  p99 {pick(0.99):7.0f} ms"
+
+
+async def _measure(llm, requests: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await llm.ainvoke([HumanMessage(content=f"pergunta {i}")])
+            except Exception:
+                pass              # falha conta com o tempo até o erro
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base", type=float, default=0.2, help="usual first-token latency (s)")
+    parser.add_argument("--spike", type=float, default=2.0, help="first-token latency of a spike (s)")
+    parser.add_argument("--spike-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--secondary-latency", type=float, default=0.35)
+    parser.add_argument("--hedge-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    def primary() -> FlakyFakeModel:
+        return FlakyFakeModel(first_token_latency=args.base, tokens_per_second=500, spike=args.spike,
+                              spike_rate=args.spike_rate, error_rate=args.error_rate, seed=1)
+
+    secondary = FakeStreamingChatModel(first_token_latency=args.secondary_latency, tokens_per_second=500)
+    hedged = HedgedChatModel(primary=primary(), secondary=secondary, primary_name="openai",
+                             secondary_name="groq", hedge_after=args.hedge_after)
+
+    print(f"{args.requests} requests, primary {args.base * 1000:.0f} ms (+{args.spike_rate:.0%} spikes of "
+          f"{args.spike * 1000:.0f} ms, {args.error_rate:.0%} errors), secondary {args.secondary_latency * 1000:.0f} ms")
+    print(f"{'primary only':>14}  {_percentiles(asyncio.run(_measure(primary(), args.requests, args.concurrency)))}")
+    print(f"{'hedged':>14}  {_percentiles(asyncio.run(_measure(hedged, args.requests, args.concurrency)))}")
+    stats = hedged.stats()
+    print(f"hedged {stats['hedged']}, failovers {stats['failovers']} of {stats['requests']} requests")
+    for name in ("openai", "groq"):
+        s = stats[name]
+        p50 = f"{s['p50'] * 1000:.0f} ms" if s["p50"] is not None else "-"
+        print(f"  {name:<7} requests {s['requests']:4d} wins {s['wins']:4d} first-token p50 {p50:>7} "
+              f"error rate {s['error_rate']:.1%} circuit {'open' if s['circuit_open'] else 'closed'}")
+
+
+if __name__ == "__main__":
+    main()
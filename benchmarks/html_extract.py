@@ -0,0 +1,100 @@
+"""Benchmark: HTML -> text extractors (throughput and output quality).
+
+Usage:
+    python -m benchmarks.html_extract [--repeat 200] [--fixtures benchmarks/fixtures]
+
+Runs every available backend of ``utils.html_extract`` (``bs4`` is the
+scraper's original extraction) over the saved pages in ``--fixtures``. Each
+``page.html`` may have a ``page.json`` sidecar with ``must_contain`` sentences
+(content) and ``must_not_contain`` strings (navigation, footer, scripts...).
+
+Reported per backend:
+    pages/s, MB/s   extraction throughput over ``--repeat`` rounds
+    found           content sentences present anywhere in the output
+    exact           content sentences that come out of ``split_passages`` as a
+                    passage of their own (sentence boundaries preserved)
+    leaked          boilerplate strings present in the output
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+from utils.html_extract import available_extractors, get_extractor
+from utils.search_index import split_passages
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def load_fixtures(directory: str) -> List[Tuple[str, str, Dict[str, List[str]]]]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        expected: Dict[str, List[str]] = {}
+        sidecar = os.path.splitext(path)[0] + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar, encoding="utf-8") as f:
+                expected = json.load(f)
+        pages.append((os.path.basename(path), html, expected))
+    return pages
+
+
+def quality(text: str, expected: Dict[str, List[str]]) -> Dict[str, int]:
+    flat = _normalize(text)
+    passages = {_normalize(p) for p in split_passages(text)}
+    must = [_normalize(s) for s in expected.get("must_contain", [])]
+    must_not = expected.get("must_not_contain", [])
+    return {
+        "sentences": len(must),
+        "found": sum(s in flat for s in must),
+        "exact": sum(s in passages for s in must),
+        "boilerplate": len(must_not),
+        "leaked": sum(b in text for b in must_not),
+    }
+
+
+def run(directory: str, repeat: int, verbose: bool) -> None:
+    pages = load_fixtures(directory)
+    if not pages:
+        raise SystemExit(f"no *.html fixtures in {directory}")
+    total_bytes = sum(len(html.encode("utf-8")) for _, html, _ in pages)
+    print(f"{len(pages)} pages, {total_bytes / 1024:.1f} KiB, {repeat} rounds")
+    print(f"{'backend':>8} {'pages/s':>9} {'MB/s':>7} {'found':>7} {'exact':>7} {'leaked':>7}")
+
+    for name in available_extractors():
+        extract = get_extractor(name)
+        totals: Dict[str, int] = {}
+        for page, html, expected in pages:
+            text = extract(html)
+            for key, value in quality(text, expected).items():
+                totals[key] = totals.get(key, 0) + value
+            if verbose:
+                print(f"--- {name} {page}\n{text}\n")
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for _, html, _ in pages:
+                extract(html)
+        elapsed = time.perf_counter() - t0
+
+        pages_per_s = repeat * len(pages) / elapsed
+        mb_per_s = repeat * total_bytes / elapsed / 1e6
+        print(f"{name:>8} {pages_per_s:>9.0f} {mb_per_s:>7.2f} "
+              f"{totals['found']:>3}/{totals['sentences']:<3} {totals['exact']:>3}/{totals['sentences']:<3} "
+              f"{totals['leaked']:>3}/{totals['boilerplate']:<3}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory with page.html (+ page.json)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each extracted text")
+    args = parser.parse_args()
+    run(args.fixtures, args.repeat, args.verbose)
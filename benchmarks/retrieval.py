@@ -0,0 +1,89 @@
+"""Benchmark: BM25 index vs. the old linear keyword scan.
+
+Usage:
+    python -m benchmarks.retrieval [--sizes 1000 10000 50000] [--queries 200]
+
+The old ``ContabilizeiScraper._search_keywords`` is reproduced below as
+``linear_scan`` so both strategies run over the same synthetic corpus.
+"""
+import argparse
+import random
+import re
+import time
+from typing import List
+
+from utils.search_index import BM25Index, split_passages
+
+VOCAB = (
+    "abrir empresa cnpj contabilidade online mei simples nacional imposto nota fiscal "
+    "prestador servico medico advogado dentista psicologo engenheiro faturamento limite "
+    "plano mensalidade contador declaracao irpf pro labore folha pagamento certificado "
+    "digital alvara inscricao municipal estadual junta comercial contrato social socio"
+).split()
+FILLER = "de a o que e do da em um para com uma os no se na por mais as dos como".split()
+
+QUERIES = [
+    "como abrir empresa de graça?",
+    "quanto custa o plano de contabilidade online",
+    "qual o limite de faturamento do MEI",
+    "preciso de certificado digital para emitir nota fiscal?",
+    "médico pode ser simples nacional",
+    "o que é pró-labore",
+]
+
+
+def linear_scan(text: str, query: str) -> List[str]:
+    """Old _search_keywords: re-tokenizes every sentence on every query."""
+    query_words = set(word.lower() for word in re.findall(r'\w+', query))
+    sentences = re.split(r'[.!?]+', text)
+
+    relevant_sentences = []
+    for sentence in sentences:
+        sentence_words = set(word.lower() for word in re.findall(r'\w+', sentence))
+        if query_words.intersection(sentence_words):
+            relevant_sentences.append(sentence.strip())
+
+    return relevant_sentences
+
+
+def make_corpus(n_sentences: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(n_sentences):
+        words = [rng.choice(VOCAB if rng.random() < 0.5 else FILLER) for _ in range(rng.randint(8, 20))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def run(sizes: List[int], n_queries: int, k: int) -> None:
+    print(f"{'sentences':>10} {'build_ms':>10} {'bm25_us/q':>10} {'scan_us/q':>10} "
+          f"{'speedup':>8} {'bm25_hits':>9} {'scan_hits':>9}")
+    for size in sizes:
+        text = make_corpus(size)
+        queries = [QUERIES[i % len(QUERIES)] for i in range(n_queries)]
+
+        t0 = time.perf_counter()
+        index = BM25Index(split_passages(text))
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        bm25_hits = sum(len(index.search(q, k)) for q in queries)
+        bm25_us = (time.perf_counter() - t0) / n_queries * 1e6
+
+        scan_queries = queries[: max(1, n_queries // 10)]  # o scan linear é lento demais
+        t0 = time.perf_counter()
+        scan_hits = sum(len(linear_scan(text, q)) for q in scan_queries)
+        scan_us = (time.perf_counter() - t0) / len(scan_queries) * 1e6
+
+        print(f"{size:>10} {build_ms:>10.1f} {bm25_us:>10.1f} {scan_us:>10.1f} "
+              f"{scan_us / bm25_us:>7.1f}x {bm25_hits // n_queries:>9} "
+              f"{scan_hits // len(scan_queries):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.k)
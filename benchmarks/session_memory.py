@@ -0,0 +1,80 @@
+"""Benchmark: memory per Streamlit session, per-session AgentManager vs. shared manager.
+
+Usage:
+    python -m benchmarks.session_memory [--sessions 50] [--provider openai]
+
+"before" rebuilds what ``init_session`` used to create for every session
+(both agents, their LLM clients, a scraper and a compiled graph); "after"
+keeps only what a session now owns: its message list and its checkpointed
+conversation state in the shared manager. Real OpenAI/Groq clients are
+built with a dummy key; no request is sent.
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+import uuid
+
+os.environ.setdefault("SITE_CRAWLER_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("GROQ_API_KEY", "gsk-benchmark")
+
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+
+from manager.agent_manager import AgentManager  # noqa: E402
+from utils import llm_factory, webscraper  # noqa: E402
+
+MESSAGES = [
+    {"role": "user", "content": "quero abrir um CNPJ"},
+    {"role": "assistant", "content": "Claro! Para abrir seu CNPJ você vai precisar de..."},
+]
+
+
+def _measure(build, sessions: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    keep = [build() for _ in range(sessions)]
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return (after - before) / sessions / 1024
+
+
+def per_session_manager(provider: str):
+    # comportamento antigo: nada compartilhado entre sessões
+    llm_factory.clear_shared_llms()
+    webscraper.get_shared_scraper.cache_clear()
+    return {"messages": list(MESSAGES), "agent_manager": AgentManager(provider, checkpointer=MemorySaver())}
+
+
+def shared_manager(provider: str):
+    manager = AgentManager.shared(provider)
+    session_id = uuid.uuid4().hex
+    # estado de conversa que o checkpointer mantém para a sessão
+    manager.workflow.update_state(
+        {"configurable": {"thread_id": session_id}},
+        {"message": MESSAGES[0]["content"], "history": MESSAGES[:2], "active_flow": "company_opening_agent"},
+        as_node="end_node",
+    )
+    return {"messages": list(MESSAGES), "session_id": session_id}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--provider", default="openai", choices=["openai", "groq"])
+    args = parser.parse_args()
+
+    AgentManager.shared(args.provider)            # aquece o manager compartilhado fora da medição
+    before = _measure(lambda: per_session_manager(args.provider), args.sessions)
+    after = _measure(lambda: shared_manager(args.provider), args.sessions)
+    print(f"provider={args.provider} sessions={args.sessions}")
+    print(f"per-session AgentManager: {before:10.1f} KiB/session")
+    print(f"shared AgentManager:      {after:10.1f} KiB/session")
+    print(f"reduction:                {before / after if after else float('inf'):10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark: cold start, from ``import`` to the first answer.
+
+Usage:
+    python -m benchmarks.startup [--provider fake] [--top 10]
+
+1. ``python -X importtime`` in a fresh interpreter: cumulative import time of
+   ``manager.agent_manager`` and the heaviest top-level packages.
+2. In another fresh interpreter: import, ``AgentManager`` construction,
+   ``warm_up()`` and the first/second answer, so the cost moved out of the
+   first turn by the warm-up is visible. The fake provider (``utils/testing/fake_llm.py``,
+   registered only here) keeps it offline;
+   run with a local site (``CONTABILIZEI_BASE_URL``) to include the scraper.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+_TIMELINE_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from manager.agent_manager import AgentManager
+t1 = time.perf_counter()
+if sys.argv[1] == "fake":
+    from utils.testing.fake_llm import register_fake_provider
+    register_fake_provider()
+manager = AgentManager(sys.argv[1])
+t2 = time.perf_counter()
+if sys.argv[2] == "1":
+    manager.warm_up()
+t3 = time.perf_counter()
+manager.process_message("quais os planos da contabilizei?", [], session_id="a")
+t4 = time.perf_counter()
+manager.process_message("e quanto custa o plano para prestadores de servico?", [], session_id="b")
+t5 = time.perf_counter()
+loaded = sorted(m for m in ("langchain_openai", "langchain_groq", "bs4") if m in sys.modules)
+print(json.dumps({"import": t1 - t0, "construct": t2 - t1, "warm_up": t3 - t2,
+                  "first_answer": t4 - t3, "second_answer": t5 - t4, "loaded": loaded}))
+"""
+
+
+def import_times(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """(cumulative seconds for ``module``, [(root package, cumulative seconds)] sorted desc).
+
+    A package imported by another one is counted in both.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    total = 0.0
+    packages: Dict[str, float] = defaultdict(float)
+    stack: List[Tuple[int, str]] = []          # (indentação, pacote raiz) do importador
+    # a saída é pós-ordem (filhos antes do pai); invertida vira pré-ordem
+    for line in reversed(proc.stderr.splitlines()):
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)) / 1e6, len(match.group(3)), match.group(4)
+        root = name.split(".")[0]
+        if name == module:
+            total = cumulative
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        # só conta quando outro pacote importou este: o cumulativo já inclui os submódulos
+        if (not stack or stack[-1][1] != root) and root != module.split(".")[0]:
+            packages[root] += cumulative
+        stack.append((indent, root))
+    heavy = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)
+    return total, heavy
+
+
+def timeline(provider: str, warm_up: bool) -> Dict:
+    env = dict(os.environ)
+    env.setdefault("SITE_CRAWLER_ENABLED", "0")
+    env.setdefault("RESPONSE_CACHE_ENABLED", "0")
+    proc = subprocess.run(
+        [sys.executable, "-c", _TIMELINE_SCRIPT, provider, "1" if warm_up else "0"],
+        capture_output=True, text=True, check=True, env=env,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", default="fake", choices=["openai", "groq", "fake"])
+    parser.add_argument("--module", default="manager.agent_manager")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    total, heavy = import_times(args.module)
+    print(f"import {args.module}: {total * 1000:.0f} ms (python -X importtime, cumulative)")
+    for name, seconds in heavy[:args.top]:
+        print(f"  {name:<28} {seconds * 1000:8.0f} ms")
+
+    print(f"\nprovider={args.provider}")
+    print(f"{'':>10} {'import':>8} {'construct':>10} {'warm-up':>8} {'1st answer':>11} {'2nd answer':>11}")
+    for warm in (False, True):
+        t = timeline(args.provider, warm)
+        print(f"{'warm-up' if warm else 'cold':>10} {t['import'] * 1000:8.0f} {t['construct'] * 1000:10.0f} "
+              f"{t['warm_up'] * 1000:8.0f} {t['first_answer'] * 1000:11.0f} {t['second_answer'] * 1000:11.0f}  (ms)")
+    print(f"provider SDKs loaded: {', '.join(t['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
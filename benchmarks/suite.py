@@ -0,0 +1,332 @@
+"""Benchmark suite: end-to-end latency/throughput against local stand-ins.
+
+Usage:
+    python -m benchmarks.suite [-o results.json] [--compare baseline.json]
+                               [--scenarios scraper single_turn multi_turn concurrent]
+                               [--latency 0.3] [--tokens-per-second 200] [--sessions 20]
+
+Everything runs offline and reproducibly: the recorded pages in
+``benchmarks/fixtures`` are served by a local HTTP server as
+CONTABILIZEI_BASE_URL (with a sitemap, so the crawler indexes them), and
+the LLM is the ``fake`` provider with fixed first-token latency and token
+rate. The response cache is off, so every turn reaches the (fake) LLM.
+
+Scenarios:
+    scraper       cold crawl (fetch + extract + index) and warm passage search
+    single_turn   one ``process_message`` per new session, one after another
+    multi_turn    scripted conversations (welcome -> company opening -> exit)
+    concurrent    ``--sessions`` conversations at once (threads or ``--async``)
+
+Each scenario reports p50/p95/p99/mean/max latency (ms), throughput and
+the per-stage breakdown from the turn traces (``utils/metrics.py``). The
+JSON written to ``-o`` can be passed back as ``--compare`` to print the
+deltas; with ``--max-regression`` the run fails when a p95 got worse by
+more than that percentage.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.testing.fixture_site import start_fixture_site
+
+SINGLE_TURN_MESSAGES = [
+    "quanto custa o plano essencial?",
+    "qual o limite de faturamento do MEI?",
+    "posso trocar de plano depois?",
+    "o que acontece se eu ultrapassar o limite do MEI?",
+    "vocês têm contador dedicado?",
+    "existe fidelidade nos planos mensais?",
+]
+
+CONVERSATION = [
+    "oi, tudo bem?",
+    "quanto custa a contabilidade para prestador de serviço?",
+    "e se eu for MEI e passar do limite de faturamento?",
+    "quero abrir um cnpj",
+    "quais documentos preciso enviar?",
+    "sair",
+    "obrigado pela ajuda",
+]
+
+
+# --------------------------------------------------------------------------- #
+#                                 ESTATÍSTICA                                 #
+# --------------------------------------------------------------------------- #
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (``q`` in 0..100) of ``values``."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, Any]:
+    ms = [value * 1000 for value in latencies]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+        "throughput_per_s": round(len(ms) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+class StageCollector:
+    """Per-stage durations gathered from the turn traces."""
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, trace) -> None:
+        if trace is None:
+            return
+        for span in trace.spans:
+            self.stages.setdefault(span.name, []).append(span.duration * 1000)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {"n": len(values), "p50_ms": round(percentile(values, 50), 2),
+                   "p95_ms": round(percentile(values, 95), 2)}
+            for name, values in sorted(self.stages.items())
+        }
+
+
+# --------------------------------------------------------------------------- #
+#                                  CENÁRIOS                                   #
+# --------------------------------------------------------------------------- #
+def bench_scraper(args: argparse.Namespace, snapshot_dir: str) -> Dict[str, Any]:
+    from utils.webscraper import ContabilizeiScraper
+
+    crawl: List[float] = []
+    started = time.perf_counter()
+    for i in range(args.crawl_repeats):
+        scraper = ContabilizeiScraper(cache_ttl=0)
+        crawler = scraper.enable_crawler(
+            background=False, snapshot_path=os.path.join(snapshot_dir, f"crawl-{i}.json"))
+        t0 = time.perf_counter()
+        crawler.crawl()
+        scraper.corpus_version()              # índice BM25 do corpus rastreado
+        crawl.append(time.perf_counter() - t0)
+    crawl_elapsed = time.perf_counter() - started
+
+    queries = SINGLE_TURN_MESSAGES * max(1, args.search_queries // len(SINGLE_TURN_MESSAGES))
+    search: List[float] = []
+    started = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        scraper.search_passages(query, k=20)
+        search.append(time.perf_counter() - t0)
+    return {
+        "crawl": {**summarize(crawl, crawl_elapsed), "pages": len(crawler.pages)},
+        "search": summarize(search, time.perf_counter() - started),
+    }
+
+
+def _turn(manager, message: str, session_id: str, latencies: List[float], stages: StageCollector) -> None:
+    t0 = time.perf_counter()
+    manager.process_message(message, session_id=session_id)
+    latencies.append(time.perf_counter() - t0)
+    stages.add(manager.last_trace(session_id))
+
+
+def bench_single_turn(manager, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    stages = StageCollector()
+    started = time.perf_counter()
+    for i in range(args.turns):
+        _turn(manager, SINGLE_TURN_MESSAGES[i % len(SINGLE_TURN_MESSAGES)], uuid.uuid4().hex, latencies, stages)
+    return {**summarize(latencies, time.perf_counter() - started), "stages": stages.summary()}
+
+
+def bench_multi_turn(manager, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    by_turn: List[List[float]] = [[] for _ in CONVERSATION]
+    stages = StageCollector()
+    started = time.perf_counter()
+    for _ in range(args.conversations):
+        session_id = uuid.uuid4().hex
+        for index, message in enumerate(CONVERSATION):
+            _turn(manager, message, session_id, latencies, stages)
+            by_turn[index].append(latencies[-1])
+    return {
+        **summarize(latencies, time.perf_counter() - started),
+        # latência por posição na conversa: não deve crescer com o histórico
+        "p50_ms_by_turn": [round(percentile([v * 1000 for v in turn], 50), 2) for turn in by_turn],
+        "stages": stages.summary(),
+    }
+
+
+def bench_concurrent(manager, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    stages = StageCollector()
+    conversation = CONVERSATION[: args.concurrent_turns]
+
+    if args.use_async:
+        async def converse() -> None:
+            session_id = uuid.uuid4().hex
+            for message in conversation:
+                t0 = time.perf_counter()
+                await manager.aprocess_message(message, session_id=session_id)
+                latencies.append(time.perf_counter() - t0)
+                stages.add(manager.last_trace(session_id))
+
+        async def run() -> None:
+            await asyncio.gather(*(converse() for _ in range(args.sessions)))
+            await manager.agents["welcome_agent"].scraper.aclose()
+
+        started = time.perf_counter()
+        asyncio.run(run())
+    else:
+        def converse(_: int) -> None:
+            session_id = uuid.uuid4().hex
+            for message in conversation:
+                _turn(manager, message, session_id, latencies, stages)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(converse, range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    return {**summarize(latencies, elapsed), "sessions": args.sessions,
+            "mode": "async" if args.use_async else "threads", "stages": stages.summary()}
+
+
+# --------------------------------------------------------------------------- #
+#                                 RELATÓRIO                                   #
+# --------------------------------------------------------------------------- #
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _series(results: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Flattens scenarios into name -> summary (``scraper`` has two sub-series)."""
+    flat = {}
+    for name, value in results["scenarios"].items():
+        if "p50_ms" in value:
+            flat[name] = value
+        else:
+            flat.update({f"{name}.{sub}": v for sub, v in value.items()})
+    return flat
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"{'scenario':<18} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}", file=sys.stderr)
+    for name, s in _series(results).items():
+        print(f"{name:<18} {s['n']:>5} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+              f"{s['throughput_per_s']:>8.1f}", file=sys.stderr)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: Optional[float]) -> bool:
+    """Prints deltas against ``baseline``; False when a p95 regressed beyond ``max_regression`` %."""
+    ok = True
+    current, previous = _series(results), _series(baseline)
+    print(f"\nvs. baseline {baseline['meta'].get('git_commit') or '?'}:", file=sys.stderr)
+    for name, s in current.items():
+        if name not in previous:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            before = previous[name][key]
+            change = (s[key] - before) / before * 100 if before else 0.0
+            deltas.append(f"{key[:-3]} {change:+6.1f}%")
+            if key == "p95_ms" and max_regression is not None and change > max_regression:
+                ok = False
+        print(f"  {name:<18} " + "  ".join(deltas), file=sys.stderr)
+    return ok
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "single_turn": bench_single_turn,
+    "multi_turn": bench_multi_turn,
+    "concurrent": bench_concurrent,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--max-regression", type=float, help="fail if a p95 grew more than this %%")
+    parser.add_argument("--scenarios", nargs="+", default=["scraper", *SCENARIOS],
+                        choices=["scraper", *SCENARIOS])
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM first-token latency (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--turns", type=int, default=30, help="single_turn: number of turns")
+    parser.add_argument("--conversations", type=int, default=5, help="multi_turn: scripted conversations")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent: simultaneous sessions")
+    parser.add_argument("--concurrent-turns", type=int, default=3, help="concurrent: turns per session")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="concurrent: use aprocess_message")
+    parser.add_argument("--crawl-repeats", type=int, default=5)
+    parser.add_argument("--search-queries", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    with TemporaryDirectory() as site_dir, TemporaryDirectory() as work_dir:
+        server = start_fixture_site(site_dir)
+        os.environ.update(
+            CONTABILIZEI_BASE_URL=f"http://127.0.0.1:{server.server_port}",
+            CONTABILIZEI_SNAPSHOT_PATH=os.path.join(work_dir, "snapshot.json"),
+            SITE_CRAWLER_ENABLED="0",                # o crawl é feito abaixo, de forma síncrona
+            RESPONSE_CACHE_ENABLED="0",
+            SPECULATIVE_COMPANY_OPENING=os.getenv("SPECULATIVE_COMPANY_OPENING", "0"),
+            FAKE_LLM_FIRST_TOKEN_LATENCY=str(args.latency),
+            FAKE_LLM_TOKENS_PER_SECOND=str(args.tokens_per_second),
+        )
+        results: Dict[str, Any] = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "config": vars(args),
+            },
+            "scenarios": {},
+        }
+        if "scraper" in args.scenarios:
+            results["scenarios"]["scraper"] = bench_scraper(args, work_dir)
+
+        agent_scenarios = [name for name in SCENARIOS if name in args.scenarios]
+        if agent_scenarios:
+            from manager.agent_manager import AgentManager
+            from utils.testing.fake_llm import register_fake_provider
+
+            register_fake_provider()
+            manager = AgentManager("fake")
+            manager.agents["welcome_agent"].scraper.enable_crawler(background=False).crawl()
+            manager.warm_up(open_connections=False)
+            for name in agent_scenarios:
+                results["scenarios"][name] = SCENARIOS[name](manager, args)
+        server.shutdown()
+
+    print_report(results)
+    ok = True
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            ok = compare(results, json.load(f), args.max_regression)
+    payload = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,151 @@
-from typing import List, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END, Graph
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import logging
 from agents.welcome_agent import WelcomeAgent
 from agents.company_opening_agent import CompanyOpeningAgent
+from utils.chat_memory import ChatMemory
+from utils.intent_classifier import word_count
+from utils.context_packer import load_encoding
+from utils.llm_factory import api_key_for, open_connection
+from utils.metrics import TurnTrace, timed_node, turn_trace
+from utils.search_index import fold_accents
+from utils.session_store import get_session_checkpointer
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+_PREFETCH_DONE = object()   # fim da fila de tokens de um agente iniciado antecipadamente
+
+# (future ou asyncio.Task, fila de tokens ou None, evento de cancelamento)
+# de um agente iniciado antecipadamente
+Prefetch = Tuple[Any, Optional[Any], threading.Event]
+
+_SHARED_MANAGERS: Dict[Tuple[str, Optional[str]], "AgentManager"] = {}
+_SHARED_LOCK = threading.Lock()
+
+# mensagens que encerram explicitamente um fluxo ativo (comparadas sem acentos)
+EXIT_PHRASES = {
+    "sair", "cancelar", "voltar", "menu", "inicio", "voltar ao inicio", "menu principal",
+    "outro assunto", "cancelar abertura", "sair da abertura", "nao quero mais abrir empresa",
+}
+# resposta fixa a uma EXIT_PHRASE: o turno termina no router, sem chamar a LLM
+EXIT_RESPONSE = (
+    "Tudo bem, voltamos ao início. Posso ajudar com planos, impostos ou abertura de empresa: "
+    "é só perguntar."
+)
+
+# traces dos últimos turnos guardados (um por sessão) para o painel de debug
+MAX_TRACES = 512
+
+
 class AgentState(BaseModel):
     message: str
-    chat_history: List[Dict[str, str]]
+    # memória limitada da conversa (utils/chat_memory.py), em vez do histórico inteiro
+    history: List[Dict[str, str]] = Field(default_factory=list)
+    summary: str = ""
     response: str | None = None
     next_agent: str = "welcome_agent"          # welcome_agent | company_opening_agent | end_node
+    active_flow: str | None = None             # especialista que continua atendendo nos próximos turnos
 
 
 class AgentManager:
-    """Coordena os nós/agents e guarda a última 'next_agent' para a UI."""
+    """Coordena os nós/agents; o estado de cada conversa fica no checkpointer (por session_id).
 
-    def __init__(self, llm_provider: str = "openai"):
+    Não guarda nada por sessão, então uma instância por provedor atende o
+    processo inteiro: use ``AgentManager.shared(provider)``.
+    """
+
+    def __init__(self, llm_provider: str = "openai", checkpointer: Optional[BaseCheckpointSaver] = None):
         logger.info("Initializing AgentManager")
         self.llm_provider = llm_provider
+        # estado por conversa (thread_id = session_id) persiste entre os turnos; o checkpointer
+        # do processo é compartilhado pelos managers de todos os provedores (trocar de provedor
+        # na sidebar não perde o fluxo ativo) e, com SESSION_DB_PATH, pelos workers da API
+        self.checkpointer = checkpointer if checkpointer is not None else get_session_checkpointer()
         self.workflow: Graph = self._create_workflow()
-        self.last_next_agent: str = "end_node"      # flag lida pela interface
+        # executa o company_opening_agent em paralelo assim que a intent é conhecida
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-prefetch")
         self.agents = {
             "welcome_agent": WelcomeAgent(self.llm_provider),
             "company_opening_agent": CompanyOpeningAgent(self.llm_provider),
         }
+        # janela de mensagens + resumo incremental, atualizados no fim de cada turno
+        self.memory = ChatMemory(llm=self.agents["welcome_agent"].llm)
+        # modo especulativo (opt-in): mensagens que *parecem* abertura de empresa
+        # disparam o especialista junto com a LLM de intenção
+        self.speculative = os.getenv("SPECULATIVE_COMPANY_OPENING", "0") == "1"
+        self.speculative_min_probability = float(os.getenv("SPECULATIVE_MIN_PROBABILITY", "0.35"))
+        self.speculation_stats = {"started": 0, "used": 0, "wasted": 0, "head_start_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        # session_id -> trace do último turno (utils/metrics.py)
+        self._traces: "OrderedDict[str, TurnTrace]" = OrderedDict()
         logger.debug("All agents initialized successfully")
 
+    @classmethod
+    def shared(cls, llm_provider: str = "openai") -> "AgentManager":
+        """Instância do processo para ``llm_provider`` (grafo, agentes e clientes LLM compartilhados).
+
+        A chave inclui a API key atual, para que uma chave digitada na sidebar
+        gere um novo cliente em vez de reaproveitar um criado sem ela.
+        """
+        provider = llm_provider.lower()
+        key = (provider, api_key_for(provider))
+        with _SHARED_LOCK:
+            manager = _SHARED_MANAGERS.get(key)
+            if manager is None:
+                manager = _SHARED_MANAGERS[key] = cls(provider)
+            return manager
+
+    # ------------------------------ warm-up ----------------------------------
+    def warm_up(self, open_connections: bool = True) -> Dict[str, float]:
+        """Paga antes da primeira mensagem o que o primeiro turno pagaria.
+
+        Carrega o snapshot/índice de busca do site, o tokenizer e abre as
+        conexões HTTP dos clientes LLM. Devolve o tempo de cada etapa (s).
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        self.agents["welcome_agent"].scraper.corpus_version()
+        timings["search_index"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        load_encoding()
+        timings["tokenizer"] = time.perf_counter() - started
+
+        if open_connections:
+            started = time.perf_counter()
+            llms = {id(agent.llm): agent.llm for agent in self.agents.values()}
+            for llm in llms.values():
+                open_connection(llm)
+            timings["llm_connections"] = time.perf_counter() - started
+        logger.info("Warm-up finished: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+        return timings
+
+    @classmethod
+    def warm_up_in_background(cls, llm_provider: str = "openai") -> threading.Thread:
+        """Cria o manager compartilhado e o aquece numa thread daemon (ex.: na subida do Streamlit)."""
+        def run() -> None:
+            try:
+                cls.shared(llm_provider).warm_up()
+            except Exception:
+                logger.error("Warm-up failed", exc_info=True)
+
+        thread = threading.Thread(target=run, name=f"warm-up-{llm_provider}", daemon=True)
+        thread.start()
+        return thread
+
     # ------------------------ routing helper ---------------------------------
     @staticmethod
     def _route(state: "AgentState") -> str:
@@ -36,14 +153,34 @@ class AgentManager:
         return state.next_agent or "end_node"
 
     # --------------------------- graph ---------------------------------------
+    @staticmethod
+    def _timed_node(name: str, func: Callable, afunc: Callable) -> RunnableLambda:
+        return RunnableLambda(timed_node(name, func), afunc=timed_node(name, afunc))
+
     def _create_workflow(self) -> Graph:
         logger.debug("Creating workflow graph")
         workflow = StateGraph(AgentState)
 
-        workflow.add_node("welcome_agent",          self._welcome_agent)
-        workflow.add_node("company_opening_agent",  self._company_opening_agent)
-        workflow.add_node("end_node",               self._end_workflow)
+        # cada nó é cronometrado (histograma chatbot_node_seconds + trace do turno);
+        # nós dos agentes com versão sync (invoke/stream) e async (ainvoke/astream)
+        workflow.add_node("router",                 timed_node("router", self._router))
+        workflow.add_node("welcome_agent",          self._timed_node("welcome_agent",
+                                                                     self._welcome_agent, self._awelcome_agent))
+        workflow.add_node("company_opening_agent",  self._timed_node("company_opening_agent",
+                                                                     self._company_opening_agent,
+                                                                     self._acompany_opening_agent))
+        workflow.add_node("end_node",               self._timed_node("end_node",
+                                                                     self._end_workflow, self._aend_workflow))
 
+        workflow.add_conditional_edges(
+            "router",
+            self._route,
+            {
+                "welcome_agent":         "welcome_agent",
+                "company_opening_agent": "company_opening_agent",
+                "end_node":              "end_node",
+            },
+        )
         workflow.add_conditional_edges(
             "welcome_agent",
             self._route,
@@ -55,45 +192,401 @@ class AgentManager:
 
         workflow.add_edge("company_opening_agent", "end_node")
         workflow.add_edge("end_node", END)
-        workflow.set_entry_point("welcome_agent")
+        workflow.set_entry_point("router")
         logger.debug("Workflow graph created successfully")
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
 
     # ---------------------------- nodes --------------------------------------
-    def _welcome_agent(self, state: "AgentState") -> Dict[str, Any]:
+    @staticmethod
+    def _leaves_flow(message: str) -> bool:
+        """Saída explícita do fluxo ativo (EXIT_PHRASES, sem acentos e pontuação final)."""
+        normalized = " ".join(fold_accents(message).strip(" .!?").split())
+        return normalized in EXIT_PHRASES
+
+    def _router(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
+        """Primeiro nó do turno: um fluxo ativo segue direto para o especialista.
+
+        Pedidos de saída (EXIT_PHRASES) encerram o turno aqui, com resposta fixa.
+        """
+        update = self._seed_memory(state, config)
+        refined = self.memory.refined_summary(config.get("configurable", {}).get("thread_id"), state.summary)
+        if refined is not None and "summary" not in update:
+            logger.debug("Applying the LLM summary computed after the previous turn")
+            update["summary"] = refined
+        if self._leaves_flow(state.message):
+            logger.info(f"Exit phrase, leaving active flow {state.active_flow}")
+            return {**update, "response": EXIT_RESPONSE, "next_agent": "end_node", "active_flow": None}
+        if state.active_flow is None:
+            return {**update, "next_agent": "welcome_agent"}
+        logger.debug(f"Continuing active flow {state.active_flow}")
+        return {**update, "next_agent": state.active_flow}
+
+    def _seed_memory(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
+        """Sessão sem memória que recebeu um histórico (ex.: replay de log): monta a janela/resumo."""
+        chat_history = config.get("configurable", {}).get("seed_history")
+        if not chat_history or state.history or state.summary:
+            return {}
+        history, summary = self.memory.seed(chat_history, state.message)
+        logger.debug(f"Chat memory seeded with {len(history)} messages")
+        return {"history": history, "summary": summary}
+
+    @staticmethod
+    def _agent_input(state: "AgentState") -> Dict[str, Any]:
+        """O que os agentes leem do estado, sem copiar a memória (model_dump copiaria)."""
+        return {"message": state.message, "history": state.history, "summary": state.summary}
+
+    @staticmethod
+    def _token_sink(config: RunnableConfig) -> Optional[Callable[[str], None]]:
+        """Callback que publica tokens no stream 'custom' quando o turno é streamed."""
+        if not config.get("configurable", {}).get("stream_tokens"):
+            return None
+        writer = get_stream_writer()
+        return lambda token: writer({"token": token})
+
+    def _start_company_prefetch(self, state: Dict[str, Any], stream: bool, speculative: bool = False) -> Prefetch:
+        """Dispara o company_opening_agent numa thread; tokens vão para uma fila se streamed.
+
+        Só a execução especulativa recebe o evento de cancelamento.
+        """
+        tokens: Optional["queue.Queue[Any]"] = queue.Queue() if stream else None
+        cancel = threading.Event()
+
+        def run() -> Dict[str, Any]:
+            try:
+                return self.agents["company_opening_agent"].process(
+                    state,
+                    on_token=tokens.put if tokens is not None else None,
+                    cancel=cancel if speculative else None,
+                )
+            finally:
+                if tokens is not None:
+                    tokens.put(_PREFETCH_DONE)
+
+        # copy_context: spans do especialista entram no trace do turno
+        return self._executor.submit(contextvars.copy_context().run, run), tokens, cancel
+
+    # ------------------------- speculative mode ------------------------------
+    def _should_speculate(self, message: str) -> bool:
+        """Probabilidade de abrir_empresa na faixa em que a LLM ainda decide.
+
+        Acima do limiar do fast path o WelcomeAgent já encaminha sem LLM, então
+        especular ali não ganha nada (exceto em mensagens curtas demais para o fast path).
+        """
+        welcome = self.agents["welcome_agent"]
+        if not self.speculative or welcome.classifier is None:
+            return False
+        probability = welcome.classifier.predict_proba(message)
+        if probability < self.speculative_min_probability:
+            return False
+        return probability < welcome.fastpath_threshold or word_count(message) < welcome.fastpath_min_words
+
+    def _record_speculation(self, outcome: str, head_start: float = 0.0) -> None:
+        with self._stats_lock:
+            self.speculation_stats[outcome] += 1
+            self.speculation_stats["head_start_seconds"] += head_start
+
+    @property
+    def speculation_waste_rate(self) -> float:
+        """Fração das execuções especulativas descartadas (intent geral)."""
+        with self._stats_lock:
+            started = self.speculation_stats["started"]
+            return self.speculation_stats["wasted"] / started if started else 0.0
+
+    def _astart_company_prefetch(self, state: Dict[str, Any], stream: bool, speculative: bool = False) -> Prefetch:
+        """Como ``_start_company_prefetch``, mas como asyncio.Task no loop do turno."""
+        tokens: Optional["asyncio.Queue[Any]"] = asyncio.Queue() if stream else None
+
+        async def run() -> Dict[str, Any]:
+            try:
+                return await self.agents["company_opening_agent"].aprocess(
+                    state, on_token=tokens.put_nowait if tokens is not None else None
+                )
+            finally:
+                if tokens is not None:
+                    tokens.put_nowait(_PREFETCH_DONE)
+
+        return asyncio.ensure_future(run()), tokens, threading.Event()
+
+    def _begin_welcome(
+        self,
+        state: "AgentState",
+        config: RunnableConfig,
+        start: Callable[[Dict[str, Any], bool, bool], Prefetch],
+    ) -> Tuple[Dict[str, Any], Optional[Prefetch], Callable[[str], None]]:
+        """Prepara o nó welcome: (estado, execução especulativa ou None, on_intent).
+
+        ``start`` dispara o company_opening_agent (thread ou asyncio.Task).
+        """
+        configurable = config.get("configurable", {})
+        prefetch = configurable.get("prefetch")
+        stream = bool(configurable.get("stream_tokens"))
+        state_dict = self._agent_input(state)
+
+        speculation: Optional[Prefetch] = None
+        speculation_started = time.perf_counter()
+        if prefetch is not None and self._should_speculate(state.message):
+            logger.debug("Speculatively starting company_opening_agent")
+            speculation = prefetch["company_opening_agent"] = start(state_dict, stream, True)
+            self._record_speculation("started")
+
+        def on_intent(next_agent: str) -> None:
+            # intent decodificada no meio do stream: não espera o fim da resposta de boas-vindas
+            if next_agent != "company_opening_agent" or prefetch is None:
+                return
+            if speculation is not None:
+                # o especialista já está rodando desde o início do turno
+                self._record_speculation("used", time.perf_counter() - speculation_started)
+                return
+            logger.debug("Starting company_opening_agent before welcome_agent finished")
+            prefetch[next_agent] = start(state_dict, stream, False)
+
+        return state_dict, speculation, on_intent
+
+    def _end_welcome(
+        self, config: RunnableConfig, speculation: Optional[Prefetch], result: Optional[Dict[str, Any]]
+    ) -> None:
+        """Descarta a execução especulativa se o turno não seguiu para o especialista."""
+        if speculation is not None and (result is None or result.get("next_agent") != "company_opening_agent"):
+            self._discard_speculation(config.get("configurable", {}).get("prefetch"), speculation)
+
+    def _welcome_agent(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
         logger.debug("Executing welcome agent")
-        return self.agents["welcome_agent"].process(state.model_dump())
+        state_dict, speculation, on_intent = self._begin_welcome(state, config, self._start_company_prefetch)
+        result = None
+        try:
+            result = self.agents["welcome_agent"].process(
+                state_dict, on_token=self._token_sink(config), on_intent=on_intent
+            )
+            return result
+        finally:
+            self._end_welcome(config, speculation, result)
 
-    def _company_opening_agent(self, state: "AgentState") -> Dict[str, Any]:
+    async def _awelcome_agent(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
+        logger.debug("Executing welcome agent (async)")
+        state_dict, speculation, on_intent = self._begin_welcome(state, config, self._astart_company_prefetch)
+        result = None
+        try:
+            result = await self.agents["welcome_agent"].aprocess(
+                state_dict, on_token=self._token_sink(config), on_intent=on_intent
+            )
+            return result
+        finally:
+            self._end_welcome(config, speculation, result)
+
+    def _discard_speculation(self, prefetch: Dict[str, Any], speculation: Prefetch) -> None:
+        future, _, cancel = speculation
+        prefetch.pop("company_opening_agent", None)
+        cancel.set()
+        future.cancel()               # Task: aborta a requisição; Future na fila: nem chama a LLM
+        self._record_speculation("wasted")
+        logger.debug("Speculative company_opening_agent discarded")
+
+    def _company_opening_agent(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
         logger.debug("Executing company opening agent")
-        return self.agents["company_opening_agent"].process(state.model_dump())
+        sink = self._token_sink(config)
+        started = (config.get("configurable", {}).get("prefetch") or {}).pop("company_opening_agent", None)
+        if started is not None:
+            future, tokens, _ = started
+            if tokens is not None:
+                for token in iter(tokens.get, _PREFETCH_DONE):
+                    if sink is not None:
+                        sink(token)
+            result = future.result()
+        else:
+            result = self.agents["company_opening_agent"].process(self._agent_input(state), on_token=sink)
+        # próximos turnos vão direto para este agente até o usuário sair do fluxo
+        return {**result, "active_flow": "company_opening_agent"}
+
+    async def _acompany_opening_agent(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
+        logger.debug("Executing company opening agent (async)")
+        sink = self._token_sink(config)
+        started = (config.get("configurable", {}).get("prefetch") or {}).pop("company_opening_agent", None)
+        if started is not None:
+            task, tokens, _ = started
+            if tokens is not None:
+                while (token := await tokens.get()) is not _PREFETCH_DONE:
+                    if sink is not None:
+                        sink(token)
+            result = await task
+        else:
+            result = await self.agents["company_opening_agent"].aprocess(self._agent_input(state), on_token=sink)
+        return {**result, "active_flow": "company_opening_agent"}
 
     @staticmethod
-    def _end_workflow(state: "AgentState") -> Dict[str, Any]:
+    def _finished_turn(state: "AgentState") -> List[Dict[str, str]]:
+        return [
+            {"role": "user", "content": state.message},
+            {"role": "assistant", "content": state.response or ""},
+        ]
+
+    def _end_workflow(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
+        """Fim do turno: a mensagem e a resposta entram na memória da conversa.
+
+        Só o resumo extrativo (local) roda aqui; com CHAT_SUMMARY_MODE=llm o
+        resumo da LLM é feito em background e aplicado no router do próximo turno.
+        """
         logger.debug("Ending workflow")
-        return {}
+        history, summary = self.memory.update(
+            state.history, state.summary, self._finished_turn(state),
+            session_id=config.get("configurable", {}).get("thread_id"),
+        )
+        return {"history": history, "summary": summary}
+
+    async def _aend_workflow(self, state: "AgentState", config: RunnableConfig) -> Dict[str, Any]:
+        # nenhuma chamada de rede: a versão sync não bloqueia o event loop
+        return self._end_workflow(state, config)
 
     # -------------------------- public API -----------------------------------
+    @staticmethod
+    def _turn_input(message: str) -> Dict[str, Any]:
+        """Campos reiniciados a cada turno; active_flow e a memória vêm do checkpoint da sessão."""
+        return {
+            "message": message,
+            "response": None,
+            "next_agent": "welcome_agent",
+        }
+
+    @staticmethod
+    def _run_config(
+        session_id: str, chat_history: Optional[List[Dict[str, str]]] = None, **configurable: Any
+    ) -> RunnableConfig:
+        """``chat_history`` só é usado para montar a memória de uma sessão que ainda não tem."""
+        return {"configurable": {"thread_id": session_id, "prefetch": {},
+                                 "seed_history": chat_history, **configurable}}
+
+    def reset_session(self, session_id: str) -> None:
+        """Esquece o estado da conversa (ex.: botão 'Limpar conversa')."""
+        self.memory.forget(session_id)
+        self.checkpointer.delete_thread(session_id)
+
+    async def areset_session(self, session_id: str) -> None:
+        """Versão assíncrona de reset_session."""
+        self.memory.forget(session_id)
+        await self.checkpointer.adelete_thread(session_id)
+
+    def _keep_trace(self, session_id: str, trace: TurnTrace) -> None:
+        with self._stats_lock:
+            self._traces[session_id] = trace
+            self._traces.move_to_end(session_id)
+            while len(self._traces) > MAX_TRACES:
+                self._traces.popitem(last=False)
+
+    def last_trace(self, session_id: str) -> Optional[TurnTrace]:
+        """Trace (etapas e tempos) do último turno da sessão, para o painel de debug."""
+        with self._stats_lock:
+            return self._traces.get(session_id)
+
+    def get_next_agent(self, session_id: str) -> str:
+        """next_agent do último turno da sessão (a UI exibe uploads se for company_opening_agent)."""
+        snapshot = self.workflow.get_state({"configurable": {"thread_id": session_id}})
+        return snapshot.values.get("next_agent", "end_node") if snapshot.values else "end_node"
+
+    async def aget_next_agent(self, session_id: str) -> str:
+        """Versão assíncrona de get_next_agent."""
+        snapshot = await self.workflow.aget_state({"configurable": {"thread_id": session_id}})
+        return snapshot.values.get("next_agent", "end_node") if snapshot.values else "end_node"
+
     def process_message(
         self,
         message: str,
-        chat_history: List[Dict[str, str]],
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        session_id: str = "default",
     ) -> str:
         """Executa o workflow e devolve apenas o texto de resposta.
-        Atributo self.last_next_agent indica a próxima etapa do grafo."""
+        get_next_agent(session_id) indica a próxima etapa do grafo."""
         try:
             logger.info(f"Processing message: {message[:50]}...")
-            initial_state = AgentState(
-                message=message, chat_history=chat_history, next_agent="welcome_agent"
-            )
-            result = self.workflow.invoke(initial_state)             # AddableValuesDict
-            self.last_next_agent = result.get("next_agent", "end_node")
-            logger.info(f"Message processed, next agent: {self.last_next_agent}")
+            with turn_trace() as trace:
+                self._keep_trace(session_id, trace)
+                result = self.workflow.invoke(                      # AddableValuesDict
+                    self._turn_input(message), config=self._run_config(session_id, chat_history)
+                )
+            logger.info(f"Message processed, next agent: {result.get('next_agent', 'end_node')}")
             return result.get("response", "No response produced.")
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
             return "Desculpe, ocorreu um erro no processamento."
 
+    def process_message_stream(
+        self,
+        message: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        session_id: str = "default",
+    ) -> Iterator[str]:
+        """Como process_message, mas produz a resposta token a token à medida que a LLM gera."""
+        try:
+            logger.info(f"Streaming message: {message[:50]}...")
+            final_state: Dict[str, Any] = {}
+            streamed = False
+            with turn_trace() as trace:
+                self._keep_trace(session_id, trace)
+                for mode, chunk in self.workflow.stream(
+                    self._turn_input(message),
+                    config=self._run_config(session_id, chat_history, stream_tokens=True),
+                    stream_mode=["custom", "values"],
+                ):
+                    if mode == "custom":
+                        streamed = True
+                        yield chunk["token"]
+                    else:
+                        final_state = chunk
+            logger.info(f"Message streamed, next agent: {final_state.get('next_agent', 'end_node')}")
+            if not streamed:
+                yield final_state.get("response") or "No response produced."
+        except Exception as e:
+            logger.error(f"Error streaming message: {str(e)}", exc_info=True)
+            yield "Desculpe, ocorreu um erro no processamento."
+
+    async def aprocess_message(
+        self,
+        message: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        session_id: str = "default",
+    ) -> str:
+        """Versão assíncrona de process_message: um event loop atende muitas conversas."""
+        try:
+            logger.info(f"Processing message (async): {message[:50]}...")
+            with turn_trace() as trace:
+                self._keep_trace(session_id, trace)
+                result = await self.workflow.ainvoke(
+                    self._turn_input(message), config=self._run_config(session_id, chat_history)
+                )
+            logger.info(f"Message processed, next agent: {result.get('next_agent', 'end_node')}")
+            return result.get("response", "No response produced.")
+        except Exception as e:
+            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            return "Desculpe, ocorreu um erro no processamento."
+
+    async def aprocess_message_stream(
+        self,
+        message: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        session_id: str = "default",
+    ) -> AsyncIterator[str]:
+        """Versão assíncrona de process_message_stream."""
+        try:
+            logger.info(f"Streaming message (async): {message[:50]}...")
+            final_state: Dict[str, Any] = {}
+            streamed = False
+            with turn_trace() as trace:
+                self._keep_trace(session_id, trace)
+                async for mode, chunk in self.workflow.astream(
+                    self._turn_input(message),
+                    config=self._run_config(session_id, chat_history, stream_tokens=True),
+                    stream_mode=["custom", "values"],
+                ):
+                    if mode == "custom":
+                        streamed = True
+                        yield chunk["token"]
+                    else:
+                        final_state = chunk
+            logger.info(f"Message streamed, next agent: {final_state.get('next_agent', 'end_node')}")
+            if not streamed:
+                yield final_state.get("response") or "No response produced."
+        except Exception as e:
+            logger.error(f"Error streaming message: {str(e)}", exc_info=True)
+            yield "Desculpe, ocorreu um erro no processamento."
+
     def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Processa a mensagem do usuário através do fluxo de agentes."""
         try:
@@ -0,0 +1,158 @@
+"""API HTTP (ASGI) do chatbot, sem interface: o Streamlit passa a ser só um cliente.
+
+Uso:
+    python server.py [--host 0.0.0.0] [--port 8000] [--workers 4] [--provider openai]
+    # ou: uvicorn server:app --workers 4
+
+Endpoints:
+    POST   /chat                 {"message", "session_id"?} -> {"session_id", "response", "next_agent"}
+    POST   /chat/stream          mesma entrada; resposta NDJSON: {"token": ...} por token e, no
+                                 fim, {"done": true, "session_id", "next_agent"}
+    GET    /sessions/{id}        próximo agente da sessão
+    DELETE /sessions/{id}        esquece a conversa
+    GET    /metrics              métricas Prometheus do worker que atendeu
+    GET    /health               status do worker (pid, provedor, versão do corpus)
+
+O estado fica fora dos workers, então qualquer um atende qualquer sessão:
+conversas no SQLite de ``SESSION_DB_PATH`` (padrão ``data/sessions.sqlite``),
+respostas no cache SQLite de ``RESPONSE_CACHE_PATH`` (padrão
+``data/response_cache.sqlite``) e o índice do site no snapshot, rastreado por
+um único worker e recarregado pelos outros (``utils/crawler.py``).
+"""
+import argparse
+import json
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from manager.agent_manager import AgentManager
+from utils.metrics import render_prometheus
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+DEFAULT_SESSION_DB_PATH = os.path.join("data", "sessions.sqlite")
+DEFAULT_RESPONSE_CACHE_PATH = os.path.join("data", "response_cache.sqlite")
+MAX_MESSAGE_CHARS = 4000
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1, max_length=MAX_MESSAGE_CHARS)
+    # sem session_id, uma nova sessão é criada e devolvida na resposta
+    session_id: Optional[str] = Field(default=None, max_length=128)
+    # transcrição anterior (opcional), só usada numa sessão que ainda não tem estado
+    chat_history: Optional[List[Dict[str, str]]] = None
+
+
+class ChatResponse(BaseModel):
+    session_id: str
+    response: str
+    next_agent: str
+
+
+class SessionInfo(BaseModel):
+    session_id: str
+    next_agent: str
+
+
+def shared_state_defaults() -> None:
+    """Estado compartilhado entre workers, a menos que o ambiente já diga outra coisa."""
+    os.environ.setdefault("SESSION_DB_PATH", DEFAULT_SESSION_DB_PATH)
+    os.environ.setdefault("RESPONSE_CACHE_PATH", DEFAULT_RESPONSE_CACHE_PATH)
+
+
+def create_app(provider: Optional[str] = None) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        shared_state_defaults()
+        manager = AgentManager.shared(provider or os.getenv("LLM_PROVIDER", "openai"))
+        # carrega snapshot/índice e abre conexões antes de aceitar requisições
+        manager.warm_up()
+        app.state.manager = manager
+        logger.info(f"Worker {os.getpid()} ready ({manager.llm_provider})")
+        yield
+        await manager.agents["welcome_agent"].scraper.aclose()
+
+    app = FastAPI(title="Contabilizei Chatbot API", lifespan=lifespan)
+
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(request: ChatRequest) -> ChatResponse:
+        manager: AgentManager = app.state.manager
+        session_id = request.session_id or uuid.uuid4().hex
+        response = await manager.aprocess_message(request.message, request.chat_history, session_id=session_id)
+        return ChatResponse(
+            session_id=session_id, response=response, next_agent=await manager.aget_next_agent(session_id))
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest) -> StreamingResponse:
+        manager: AgentManager = app.state.manager
+        session_id = request.session_id or uuid.uuid4().hex
+
+        async def lines() -> AsyncIterator[str]:
+            async for token in manager.aprocess_message_stream(
+                request.message, request.chat_history, session_id=session_id
+            ):
+                yield json.dumps({"token": token}, ensure_ascii=False) + "\n"
+            done = {"done": True, "session_id": session_id, "next_agent": await manager.aget_next_agent(session_id)}
+            yield json.dumps(done) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Session-Id": session_id})
+
+    @app.get("/sessions/{session_id}", response_model=SessionInfo)
+    async def session_info(session_id: str) -> SessionInfo:
+        return SessionInfo(session_id=session_id, next_agent=await app.state.manager.aget_next_agent(session_id))
+
+    @app.delete("/sessions/{session_id}", status_code=204)
+    async def reset_session(session_id: str) -> Response:
+        await app.state.manager.areset_session(session_id)
+        return Response(status_code=204)
+
+    @app.get("/metrics")
+    async def metrics() -> PlainTextResponse:
+        # por worker: com vários workers, cada scrape vê o processo que atendeu
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        manager: AgentManager = app.state.manager
+        return {
+            "status": "ok",
+            "pid": str(os.getpid()),
+            "provider": manager.llm_provider,
+            # sem o snapshot carregado, o índice busca a página inicial; não bloqueia o event loop
+            "corpus_version": await manager.agents["welcome_agent"].scraper.acorpus_version(),
+        }
+
+    return app
+
+
+app = create_app()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API HTTP do chatbot (ASGI)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--provider", default=os.getenv("LLM_PROVIDER", "openai"), choices=["openai", "groq"])
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # os workers herdam o ambiente do processo pai
+    os.environ["LLM_PROVIDER"] = args.provider
+    shared_state_defaults()
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
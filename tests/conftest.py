@@ -0,0 +1,64 @@
+"""Shared fixtures: local stand-in for the site, offline LLM, clean process state."""
+import os
+import threading
+from http.server import ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+
+from utils.testing.fake_llm import register_fake_provider
+from utils.testing.fixture_site import QuietHandler, build_site, write_sitemap
+from utils.testing.process_state import clear_singletons
+
+
+class CountingHandler(QuietHandler):
+    """Static-file handler that records every GET path on the server."""
+
+    def do_GET(self) -> None:
+        self.server.requests.append(self.path)
+        super().do_GET()
+
+
+class Site:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.paths = build_site(directory)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *a: CountingHandler(*a, directory=directory))
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        write_sitemap(directory, self.base_url, self.paths)
+
+    @property
+    def requests(self) -> List[str]:
+        return self.server.requests
+
+    def page_requests(self, path: str = "/") -> int:
+        return sum(1 for p in self.requests if p == path)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch) -> Iterator[Site]:
+    """The recorded pages of ``benchmarks/fixtures`` served on a free local port."""
+    stand_in = Site(str(tmp_path / "site"))
+    threading.Thread(target=stand_in.server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("CONTABILIZEI_BASE_URL", stand_in.base_url)
+    yield stand_in
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch, tmp_path) -> Iterator[None]:
+    """Fake LLM as provider ``fake``, no crawler, no shared cache, sessions in memory."""
+    monkeypatch.setenv("SITE_CRAWLER_ENABLED", "0")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("CONTABILIZEI_SNAPSHOT_PATH", os.path.join(str(tmp_path), "snapshot.json"))
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_SECOND", "0")
+    monkeypatch.delenv("SESSION_DB_PATH", raising=False)
+    monkeypatch.delenv("LLM_HEDGE_PROVIDER", raising=False)
+    register_fake_provider()
+    clear_singletons()
+    yield
+    clear_singletons()
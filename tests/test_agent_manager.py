@@ -0,0 +1,59 @@
+"""AgentManager end to end, with the fake LLM injected as provider ``fake``."""
+import pytest
+
+from manager.agent_manager import AgentManager
+from utils.testing.fake_llm import FakeStreamingChatModel
+from utils.llm_factory import create_llm
+
+
+def test_fake_provider_is_not_built_in():
+    from utils import llm_factory
+
+    llm_factory._EXTRA_PROVIDERS.pop("fake")
+    with pytest.raises(ValueError):
+        create_llm("fake")
+
+
+def test_registered_provider_builds_the_fake_model():
+    assert isinstance(create_llm("fake"), FakeStreamingChatModel)
+
+
+def test_general_question_streams_the_answer(site):
+    manager = AgentManager("fake")
+    tokens = list(manager.process_message_stream("quanto custa a contabilidade?", [], session_id="s1"))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Resposta simulada da Contabilizei para: quanto custa a contabilidade?"
+    assert manager.get_next_agent("s1") == "end_node"
+
+
+def test_opening_flow_continues_on_the_next_turn(site):
+    manager = AgentManager("fake")
+    manager.process_message("quero abrir um cnpj para minha empresa", [], session_id="s1")
+    assert manager.get_next_agent("s1") == "company_opening_agent"
+
+    reply = manager.process_message("quais documentos preciso?", [], session_id="s1")
+    assert reply == "Resposta simulada da Contabilizei para: quais documentos preciso?"
+    assert manager.get_next_agent("s1") == "company_opening_agent"
+
+
+def test_exit_phrase_ends_the_flow_without_calling_the_llm(site):
+    from manager.agent_manager import EXIT_RESPONSE
+    from utils.testing.fake_llm import default_responder
+    from utils.llm_factory import register_provider
+
+    calls = []
+
+    def responder(messages):
+        calls.append(messages)
+        return default_responder(messages)
+
+    register_provider("counting", lambda: FakeStreamingChatModel(responder=responder))
+    manager = AgentManager("counting")
+    manager.process_message("quero abrir um cnpj para minha empresa", [], session_id="s1")
+    assert manager.get_next_agent("s1") == "company_opening_agent"
+    calls.clear()
+
+    assert manager.process_message("cancelar", [], session_id="s1") == EXIT_RESPONSE
+    assert calls == []
+    assert manager.get_next_agent("s1") == "end_node"
@@ -0,0 +1,83 @@
+"""batch.py: resumed sessions keep their state; route mode rate-limits LLM calls only."""
+import asyncio
+import json
+
+from batch import BatchRunner, completed_ids, read_records, session_state_defaults
+from manager.agent_manager import AgentManager
+from utils.testing.process_state import clear_singletons
+
+
+def _run_full(input_path, output, **runner_kwargs):
+    records = read_records(str(input_path))
+    done = completed_ids(output)
+    session_state_defaults(output)
+    manager = AgentManager("fake")
+
+    async def run():
+        with open(output, "a", encoding="utf-8") as out:
+            await BatchRunner(manager, out, **runner_kwargs).run_full([r for r in records if r["id"] not in done])
+            await manager.agents["welcome_agent"].scraper.aclose()
+
+    asyncio.run(run())
+
+
+def test_resumed_session_continues_the_flow(site, tmp_path):
+    input_path = tmp_path / "mensagens.jsonl"
+    output = str(tmp_path / "resultados.jsonl")
+    rows = [
+        {"id": "1", "session_id": "a", "message": "quero abrir um cnpj para minha empresa"},
+        {"id": "2", "session_id": "a", "message": "quais documentos preciso?"},
+    ]
+    input_path.write_text(json.dumps(rows[0]) + "\n", encoding="utf-8")
+    _run_full(input_path, output)
+
+    # outro processo: nada na memória, só o que ficou em disco
+    clear_singletons()
+    input_path.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    _run_full(input_path, output)
+
+    with open(output, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f]
+    assert [r["id"] for r in results] == ["1", "2"]
+    assert (tmp_path / "resultados.sessions.sqlite").exists()
+    assert results[1]["next_agent"] == "company_opening_agent"
+
+
+def test_route_mode_rate_limits_only_llm_calls(site):
+    agent = AgentManager("fake").agents["welcome_agent"]
+    waits = []
+
+    async def before_llm():
+        waits.append(1)
+
+    # uma palavra nunca passa pelo fast path (INTENT_FASTPATH_MIN_WORDS)
+    messages = ["quero abrir um cnpj", "quero abrir minha empresa", "cnpj"]
+    results = asyncio.run(agent.aclassify_batch(messages, before_llm=before_llm))
+
+    assert len(waits) == sum(1 for _, source in results if source == "llm")
+    assert {source for _, source in results} == {"fast_path", "llm"}
+
+
+def test_failed_rows_are_retried_on_resume(site, tmp_path, monkeypatch):
+    input_path = tmp_path / "mensagens.jsonl"
+    output = str(tmp_path / "resultados.jsonl")
+    rows = [{"id": "1", "session_id": "a", "message": "quanto custa o plano?"},
+            {"id": "2", "session_id": "b", "message": "quero abrir um cnpj para minha empresa"}]
+    input_path.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "1", "session_id": "a", "message": rows[0]["message"], "error": "timeout"}) + "\n")
+
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "2")
+    _run_full(input_path, output, timeout=0.2)
+    with open(output, encoding="utf-8") as f:
+        assert [(r["id"], r.get("error")) for r in map(json.loads, f)] == [("1", "timeout"), ("2", "timeout")]
+
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0")
+    clear_singletons()
+    _run_full(input_path, output)
+
+    with open(output, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f]
+    assert sorted(r["id"] for r in results) == ["1", "2"]
+    assert all("error" not in r and r["response"] for r in results)
+    assert completed_ids(output) == {"1", "2"}
@@ -0,0 +1,66 @@
+"""Conversation memory: extractive summary on the turn, LLM summary in the background."""
+import threading
+import time
+
+from utils.testing.fake_llm import FakeStreamingChatModel
+from utils.chat_memory import ChatMemory
+
+TURN = [
+    {"role": "user", "content": "Sou dentista em Curitiba e quero saber sobre o Simples Nacional. " * 3},
+    {"role": "assistant", "content": "Para dentistas, o Simples Nacional costuma ser vantajoso. " * 3},
+]
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_each_eviction_counts_one_summary_update():
+    memory = ChatMemory(token_budget=150, mode="extractive")
+    history, summary = [], ""
+    for _ in range(3):
+        history, summary = memory.update(history, summary, TURN)
+
+    assert memory.stats["turns"] == 3
+    assert memory.stats["summary_updates"] == 2
+    assert summary.startswith("Usuário: Sou dentista em Curitiba")
+
+
+def test_llm_summary_runs_after_the_turn_and_applies_to_the_next_one():
+    release = threading.Event()
+    calls = []
+
+    def responder(messages):
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return "Cliente dentista em Curitiba, avaliando o Simples Nacional."
+
+    memory = ChatMemory(token_budget=150, mode="llm", llm=FakeStreamingChatModel(responder=responder))
+    history, summary = memory.update([], "", TURN, session_id="s1")
+    started = time.perf_counter()
+    history, summary = memory.update(history, summary, TURN, session_id="s1")
+
+    # o turno termina com o resumo extrativo, sem esperar a LLM
+    assert time.perf_counter() - started < 1.0
+    assert summary.startswith("Usuário: Sou dentista")
+    _wait_for(lambda: calls)
+    assert memory.refined_summary("s1", summary) is None        # ainda não ficou pronto
+
+    release.set()
+    _wait_for(lambda: memory.stats["llm_summaries"] == 1)
+    assert calls[0].startswith("chat-summary")
+    assert memory.refined_summary("s1", summary) == "Cliente dentista em Curitiba, avaliando o Simples Nacional."
+    assert memory.stats["summary_updates"] == 1
+
+
+def test_llm_summary_is_dropped_if_the_summary_changed():
+    memory = ChatMemory(token_budget=150, mode="llm", llm=FakeStreamingChatModel(responder=lambda m: "resumo da LLM"))
+    history, summary = memory.update([], "", TURN, session_id="s1")
+    history, summary = memory.update(history, summary, TURN, session_id="s1")
+    _wait_for(lambda: memory.stats["llm_summaries"] == 1)
+
+    assert memory.refined_summary("s1", "outro resumo") is None
+    assert memory.refined_summary("s1", summary) is None          # já consumido
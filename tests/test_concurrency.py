@@ -0,0 +1,62 @@
+"""Many sessions at once on one AgentManager: answers stay correct and per-session."""
+import asyncio
+import threading
+
+from manager.agent_manager import AgentManager
+from utils.webscraper import get_shared_scraper
+
+SESSIONS = 100
+
+
+async def _conversation(manager: AgentManager, n: int):
+    session_id = f"s{n}"
+    if n % 2:
+        first = await manager.aprocess_message(f"quero abrir um cnpj numero {n}", [], session_id=session_id)
+    else:
+        first = await manager.aprocess_message(f"quanto custa o plano numero {n}?", [], session_id=session_id)
+    after_first = await manager.aget_next_agent(session_id)
+    second = await manager.aprocess_message(f"e os documentos do cliente {n}?", [], session_id=session_id)
+    return first, after_first, second, await manager.aget_next_agent(session_id)
+
+
+def test_concurrent_sessions_are_correct_and_isolated(site, monkeypatch):
+    monkeypatch.setenv("SITE_CRAWLER_ENABLED", "1")
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0.005")
+    from utils.testing.fake_llm import register_fake_provider
+
+    register_fake_provider()
+    crawler = get_shared_scraper().crawler
+    manager = AgentManager("fake")
+
+    # recrawls em paralelo aos turnos: o índice nunca mistura páginas e versões de crawls diferentes
+    stop = threading.Event()
+
+    def recrawl():
+        while not stop.is_set():
+            crawler.crawl()
+            pages, version = crawler.current()
+            assert version == crawler._compute_version(pages.values())
+
+    recrawler = threading.Thread(target=recrawl, daemon=True)
+    recrawler.start()
+
+    async def run_all():
+        return await asyncio.gather(*(_conversation(manager, n) for n in range(SESSIONS)))
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        stop.set()
+        recrawler.join(timeout=30)
+
+    for n, (first, after_first, second, after_second) in enumerate(results):
+        if n % 2:
+            assert first.endswith(f"cnpj numero {n}")
+            assert after_first == "company_opening_agent"
+            # o fluxo de abertura continua: a resposta é do especialista, para a pergunta desta sessão
+            assert second == f"Resposta simulada da Contabilizei para: e os documentos do cliente {n}?"
+            assert after_second == "company_opening_agent"
+        else:
+            assert first.endswith(f"quanto custa o plano numero {n}?")
+            assert after_first == "end_node"
+            assert second.endswith(f"e os documentos do cliente {n}?")
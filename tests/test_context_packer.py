@@ -0,0 +1,79 @@
+"""Token budget packing and the offline token estimate."""
+import sys
+
+import pytest
+
+from manager.agent_manager import AgentManager
+from utils import context_packer
+from utils.context_packer import count_tokens, pack_context
+
+
+@pytest.fixture
+def undecided(monkeypatch):
+    """A fresh process: no token counter chosen yet."""
+    monkeypatch.setattr(context_packer, "_encoding", None)
+    monkeypatch.setattr(context_packer, "_decided", False)
+
+
+@pytest.fixture
+def no_tiktoken(undecided, monkeypatch):
+    """tiktoken cannot provide the encoding (offline / not installed)."""
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+
+
+def test_offline_falls_back_to_character_estimate(no_tiktoken):
+    assert context_packer.load_encoding() is None
+    assert count_tokens("x" * 10) == 3
+
+
+class _Encoding:
+    def encode(self, text):
+        return text.split()
+
+
+def test_counter_never_changes_after_the_first_count(undecided, monkeypatch):
+    loads = []
+    fake_tiktoken = type(sys)("tiktoken")
+    fake_tiktoken.get_encoding = lambda name: loads.append(name) or _Encoding()
+    monkeypatch.setitem(sys.modules, "tiktoken", fake_tiktoken)
+
+    # sem warm-up: a primeira contagem fixa a estimativa, sem carregar (nem baixar) o encoding
+    assert count_tokens("abcdefgh") == 2
+    assert context_packer.load_encoding() is None and loads == []
+    assert count_tokens("abcdefgh") == 2
+
+
+def test_warm_up_loads_the_encoding_before_the_first_count(undecided, monkeypatch):
+    fake_tiktoken = type(sys)("tiktoken")
+    fake_tiktoken.get_encoding = lambda name: _Encoding()
+    monkeypatch.setitem(sys.modules, "tiktoken", fake_tiktoken)
+
+    assert context_packer.load_encoding() is not None
+    assert count_tokens("três palavras aqui") == 3
+
+
+def test_near_duplicates_and_over_budget_passages_are_dropped(no_tiktoken):
+    passages = [
+        ("abertura de empresa gratuita com a contabilizei em poucos dias", 3.0),
+        ("abertura de empresa gratuita com a contabilizei em poucos dias!", 2.5),
+        ("x" * 400, 2.0),
+        ("planos a partir de 89 reais", 1.0),
+    ]
+    packed = pack_context(passages, token_budget=40)
+
+    assert packed.passages_used == 2
+    assert packed.duplicates_dropped == 1
+    assert packed.over_budget_dropped == 1
+    assert packed.tokens_used <= 40
+
+
+def test_packing_stats_go_to_each_turn_trace(site):
+    manager = AgentManager("fake")
+    manager.process_message("quanto custa a contabilidade?", [], session_id="a")
+    manager.process_message("o que está incluso no plano?", [], session_id="b")
+
+    for session_id in ("a", "b"):
+        rows = [r for r in manager.last_trace(session_id).as_rows() if r["stage"] == "welcome.pack_context"]
+        assert len(rows) == 1
+        assert rows[0]["tokens"] <= manager.agents["welcome_agent"].context_token_budget
+    assert not hasattr(manager.agents["welcome_agent"], "last_context")
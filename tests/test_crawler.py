@@ -0,0 +1,104 @@
+"""SiteCrawler against the recorded pages served by a local static-file server."""
+import json
+import os
+import shutil
+import time
+
+from utils.crawler import SiteCrawler, shared_crawler
+from utils.webscraper import ContabilizeiScraper
+
+BLOG_PATH = "/blog/limite-faturamento-mei/"
+
+
+def _crawler(site, tmp_path, **kwargs):
+    scraper = ContabilizeiScraper(base_url=site.base_url, cache_ttl=0)
+    return scraper.enable_crawler(background=False, snapshot_path=str(tmp_path / "snapshot.json"), **kwargs)
+
+
+def test_crawl_discovers_the_site_and_saves_a_snapshot(site, tmp_path):
+    crawler = _crawler(site, tmp_path)
+    crawler.crawl()
+    crawler.save_snapshot()
+
+    assert site.base_url + BLOG_PATH in crawler.pages
+    with open(crawler.snapshot_path, encoding="utf-8") as f:
+        assert json.load(f)["version"] == crawler.version
+
+
+def test_removed_page_is_dropped_on_recrawl(site, tmp_path):
+    crawler = _crawler(site, tmp_path)
+    crawler.crawl()
+    version = crawler.version
+    shutil.rmtree(os.path.join(site.directory, BLOG_PATH.strip("/")))
+
+    crawler.crawl()
+
+    assert site.base_url + BLOG_PATH not in crawler.pages
+    assert site.base_url + "/precos/" in crawler.pages
+    assert crawler.version != version
+
+
+def test_not_modified_pages_do_not_touch_the_published_corpus(site, tmp_path):
+    crawler = _crawler(site, tmp_path)
+    crawler.crawl()
+    published, version = crawler.current()
+    crawled_at = {url: record.crawled_at for url, record in published.items()}
+    time.sleep(0.01)
+
+    crawler.crawl()                      # servidor responde 304: nada mudou
+
+    assert crawler.version == version
+    assert {url: record.crawled_at for url, record in published.items()} == crawled_at
+    assert all(crawler.pages[url].crawled_at > crawled_at[url] for url in crawled_at)
+    assert all(crawler.pages[url].text == published[url].text for url in crawled_at)
+
+
+def test_unreachable_site_keeps_the_previous_records(site, tmp_path):
+    crawler = _crawler(site, tmp_path)
+    crawler.crawl()
+    pages = dict(crawler.pages)
+    site.server.shutdown()
+    site.server.server_close()
+
+    crawler.crawl()
+
+    assert crawler.pages.keys() == pages.keys()
+
+
+def test_fresh_snapshot_is_not_recrawled_on_start(site, tmp_path):
+    first = _crawler(site, tmp_path, recrawl_interval=3600)
+    first.crawl()
+    first.save_snapshot()
+
+    # outro processo (ou restart) com o mesmo snapshot
+    restarted = ContabilizeiScraper(base_url=site.base_url, cache_ttl=0)
+    crawler = SiteCrawler(restarted, snapshot_path=first.snapshot_path, recrawl_interval=3600)
+    assert crawler.load_snapshot()
+    requests_before = len(site.requests)
+    crawler.start_background()
+    time.sleep(0.3)
+    crawler.stop()
+
+    assert 3500 < crawler.next_crawl_in() <= 3600
+    assert len(site.requests) == requests_before
+
+
+def test_stale_snapshot_is_recrawled_on_start(site, tmp_path):
+    first = _crawler(site, tmp_path, recrawl_interval=60)
+    first.crawl()
+    first.crawled_at = time.time() - 120
+    first.save_snapshot()
+
+    crawler = SiteCrawler(first.scraper, snapshot_path=first.snapshot_path, recrawl_interval=60)
+    assert crawler.load_snapshot()
+    assert crawler.next_crawl_in() == 0
+
+
+def test_one_crawler_per_site_in_the_process(site, tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.json")
+    scrapers = [ContabilizeiScraper(base_url=site.base_url) for _ in range(3)]
+    crawlers = [s.enable_crawler(background=True, snapshot_path=snapshot_path) for s in scrapers]
+
+    assert all(c is crawlers[0] for c in crawlers)
+    assert shared_crawler(scrapers[0], snapshot_path=snapshot_path) is crawlers[0]
+    crawlers[0].stop()
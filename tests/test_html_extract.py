@@ -0,0 +1,59 @@
+"""Main-region extraction: text after a closed ``role="main"`` region stays out."""
+import pytest
+
+from utils.html_extract import available_extractors, extract_links, extract_stdlib, get_extractor
+
+ARTICLE = " ".join(["Abrir empresa com a Contabilizei é simples e rápido."] * 8)
+
+
+def _page(main: str) -> str:
+    return (
+        "<html><body><nav>Menu Planos Blog</nav>"
+        f"{main}"
+        "<footer>Rodapé com links e endereço da empresa</footer>"
+        "<div>Cookies: aceitar todos</div></body></html>"
+    )
+
+
+@pytest.mark.parametrize("extractor", [e for e in available_extractors() if e != "bs4"])
+def test_role_main_div_closes_at_its_own_end_tag(extractor):
+    html = _page(f'<div role="main"><div><p>{ARTICLE}</p></div><div>Outro bloco do artigo</div></div>')
+    text = get_extractor(extractor)(html)
+
+    assert ARTICLE in text and "Outro bloco do artigo" in text
+    assert "Rodapé" not in text and "Cookies" not in text and "Menu" not in text
+
+
+def test_nested_main_regions_close_with_their_tags():
+    html = _page(f'<main><div role="main"><p>{ARTICLE}</p></div><p>Ainda no main</p></main>')
+    text = extract_stdlib(html)
+
+    assert "Ainda no main" in text
+    assert "Rodapé" not in text and "Cookies" not in text
+
+
+def test_unclosed_inner_region_ends_with_the_outer_one():
+    html = _page(f'<main><div role="main"><p>{ARTICLE}</p></main>')
+    text = extract_stdlib(html)
+
+    assert ARTICLE in text
+    assert "Rodapé" not in text and "Cookies" not in text
+
+
+@pytest.mark.parametrize("extractor", [e for e in available_extractors() if e != "bs4"])
+def test_unclosed_option_does_not_hide_the_rest_of_the_page(extractor):
+    html = ("<html><body><select><option>Opção 1<option>Opção 2</select>"
+            f"<form><select><option>Opção 3</select></form><p>{ARTICLE}</p></body></html>")
+    text = get_extractor(extractor)(html)
+
+    assert ARTICLE in text
+    assert "Opção" not in text
+
+
+@pytest.mark.parametrize("extractor", [e for e in available_extractors() if e != "bs4"])
+def test_page_with_xml_declaration(extractor):
+    html = ('<?xml version="1.0" encoding="utf-8"?>\n'
+            f'<html><body><main><p>{ARTICLE}</p><a href="/planos">Planos</a></main></body></html>')
+
+    assert ARTICLE in get_extractor(extractor)(html)
+    assert extract_links(html) == ["/planos"]
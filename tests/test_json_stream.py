@@ -0,0 +1,67 @@
+"""IncrementalJSONParser fed one character (or one odd-sized chunk) at a time."""
+import json
+
+import pytest
+
+from utils.json_stream import IncrementalJSONParser
+
+
+def _feed(raw: str, size: int = 1):
+    parser = IncrementalJSONParser()
+    events = []
+    for i in range(0, len(raw), size):
+        events.extend(parser.feed(raw[i:i + size]))
+    return parser, events
+
+
+def _deltas(events, key):
+    return [text for kind, k, text in events if kind == "delta" and k == key]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_surrogate_pair_is_emitted_as_one_character(size):
+    raw = '{"intent": "geral", "response": "Oi \\ud83d\\ude00 tudo bem?"}'
+    parser, events = _feed(raw, size)
+
+    deltas = _deltas(events, "response")
+    assert "".join(deltas) == "Oi 😀 tudo bem?" == json.loads(raw)["response"]
+    for text in deltas:
+        text.encode("utf-8")          # um surrogate solto não codifica
+    assert parser.close() == json.loads(raw)
+
+
+def test_lone_high_surrogate_is_kept_like_json_loads():
+    raw = '{"response": "a\\ud83d"}'
+    parser, events = _feed(raw)
+
+    assert "".join(_deltas(events, "response")) == json.loads(raw)["response"]
+    assert parser.fields["response"] == "a\ud83d"
+
+
+@pytest.mark.parametrize("size", [1, 4])
+def test_nested_object_does_not_stop_streaming(size):
+    raw = '{"intent": "geral", "meta": {"a": "b", "c": [1, {"d": "}"}]}, "response": "Olá, tudo bem?"}'
+    parser, events = _feed(raw, size)
+
+    fields = {k: v for kind, k, v in events if kind == "field"}
+    assert fields["meta"] == {"a": "b", "c": [1, {"d": "}"}]}
+    assert "".join(_deltas(events, "response")) == "Olá, tudo bem?"
+    assert fields["response"] == "Olá, tudo bem?"
+    assert parser.done
+    assert parser.close() == json.loads(raw)
+
+
+def test_nested_array_and_escaped_quotes():
+    raw = '{"tags": ["a\\"]", "b"], "response": "ok"}'
+    parser, events = _feed(raw)
+
+    assert parser.fields == {"tags": ['a"]', "b"], "response": "ok"}
+    assert _deltas(events, "response") == ["o", "k"]
+
+
+def test_intent_is_known_before_the_response_finishes():
+    parser = IncrementalJSONParser()
+    events = parser.feed('```json\n{"intent": "abrir_empresa", "response": "Claro')
+
+    assert ("field", "intent", "abrir_empresa") in events
+    assert parser.close() == {"intent": "abrir_empresa", "response": "Claro"}
@@ -0,0 +1,24 @@
+"""Display escaping of "$": same result whether the text arrives whole or token by token."""
+import pytest
+
+from utils.markdown_text import escape_markdown, escape_stream
+
+
+def test_escapes_unescaped_dollars_only():
+    assert escape_markdown("R$ 89 ou R$ 150") == r"R\$ 89 ou R\$ 150"
+    assert escape_markdown(r"já escapado: \$ 10") == r"já escapado: \$ 10"
+
+
+@pytest.mark.parametrize("tokens", [
+    ["R", "$ 89 e ", "\\", "$ 10"],
+    ["R$", " 89 e \\", "$", " 10"],
+    list("R$ 89 e \\$ 10"),
+])
+def test_stream_matches_whole_text_across_token_splits(tokens):
+    text = "".join(tokens)
+    assert "".join(escape_stream(tokens)) == escape_markdown(text) == r"R\$ 89 e \$ 10"
+
+
+def test_backslash_state_does_not_leak_past_the_next_token():
+    assert "".join(escape_stream(["a\\", "b", "$"])) == r"a\b\$"
+    assert "".join(escape_stream(["a\\", "", "$"])) == r"a\$"
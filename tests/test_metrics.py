@@ -0,0 +1,28 @@
+"""METRICS_PATH: written by a background thread, not rewritten on every turn."""
+import time
+
+from utils import metrics
+from utils.metrics import turn_trace
+
+
+def test_metrics_file_is_written_in_the_background_and_throttled(tmp_path, monkeypatch):
+    path = str(tmp_path / "chatbot.prom")
+    monkeypatch.setenv("METRICS_PATH", path)
+    monkeypatch.setenv("METRICS_WRITE_INTERVAL", "0.3")
+    writes = []
+    real_write = metrics.write_prometheus
+    monkeypatch.setattr(metrics, "write_prometheus", lambda p: (writes.append(time.monotonic()), real_write(p)))
+
+    def turns_then_wait(expected_writes):
+        for _ in range(50):
+            with turn_trace():
+                pass
+        deadline = time.monotonic() + 5
+        while len(writes) < expected_writes and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    turns_then_wait(1)
+    assert len(writes) == 1            # 50 turnos, uma reescrita
+    assert "chatbot_turn_seconds" in open(path, encoding="utf-8").read()
+    turns_then_wait(2)
+    assert len(writes) == 2 and writes[1] - writes[0] >= 0.3
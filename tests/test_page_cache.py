@@ -0,0 +1,41 @@
+"""The page cache keeps repeated questions off the network."""
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.welcome_agent import WelcomeAgent
+from utils.testing.fake_llm import FakeStreamingChatModel
+from utils.webscraper import ContabilizeiScraper
+
+QUESTION = "quanto custa a contabilidade para prestador de serviço?"
+
+
+def test_same_question_fetches_the_page_once(site):
+    scraper = ContabilizeiScraper(base_url=site.base_url, cache_ttl=300)
+    agent = WelcomeAgent("fake", llm=FakeStreamingChatModel(), scraper=scraper)
+
+    for _ in range(10):
+        agent.process({"message": QUESTION})
+
+    assert len(site.requests) == 1
+    assert scraper.cache.stats()["misses"] == 1
+
+
+def test_counters_are_exact_under_concurrency(site):
+    scraper = ContabilizeiScraper(base_url=site.base_url, cache_ttl=300)
+    scraper.search_content(QUESTION)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: scraper.search_content(QUESTION), range(400)))
+
+    stats = scraper.cache.stats()
+    assert len(site.requests) == 1
+    assert (stats["misses"], stats["hits"], stats["revalidations"]) == (1, 400, 0)
+
+
+def test_stale_page_is_revalidated_not_downloaded(site):
+    scraper = ContabilizeiScraper(base_url=site.base_url, cache_ttl=0)
+    scraper.search_content(QUESTION)
+    scraper.search_content(QUESTION)
+
+    stats = scraper.cache.stats()
+    assert len(site.requests) == 2
+    assert (stats["misses"], stats["revalidations"]) == (1, 1)
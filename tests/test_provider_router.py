@@ -0,0 +1,155 @@
+"""Hedging between two local OpenAI-compatible servers (real HTTP, real ChatOpenAI)."""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from utils.llm_factory import open_connection
+from utils.provider_router import HedgedChatModel
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """``POST /v1/chat/completions`` with ``stream=true``: SSE chunks after ``server.delay`` seconds."""
+
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        # models.list() do aquecimento de conexão
+        self.server.model_lists += 1
+        body = json.dumps({"object": "list", "data": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.calls += 1
+        time.sleep(self.server.delay)
+        if self.server.status != 200:
+            body = json.dumps({"error": {"message": "unavailable", "type": "server_error"}}).encode()
+            self.send_response(self.server.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for text, finish in [(f"{self.server.name} ", None), ("respondeu", None), ("", "stop")]:
+            chunk = {
+                "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "test",
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": finish}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+@pytest.fixture
+def providers():
+    servers = {}
+    for name in ("primary", "secondary"):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+        server.daemon_threads = True
+        server.name, server.delay, server.status, server.calls = name, 0.0, 200, 0
+        server.model_lists = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers[name] = server
+    yield servers
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+def _client(server) -> ChatOpenAI:
+    return ChatOpenAI(
+        model="test", api_key="sk-test", base_url=f"http://127.0.0.1:{server.server_port}/v1",
+        max_retries=0, timeout=10,
+    )
+
+
+def _hedged(providers, **kwargs) -> HedgedChatModel:
+    return HedgedChatModel(
+        primary=_client(providers["primary"]), secondary=_client(providers["secondary"]),
+        primary_name="primary", secondary_name="secondary", **kwargs,
+    )
+
+
+MESSAGES = [HumanMessage(content="oi")]
+
+
+def test_fast_lead_is_not_hedged(providers):
+    llm = _hedged(providers, hedge_after=1.0)
+
+    assert llm.invoke(MESSAGES).content == "primary respondeu"
+    assert providers["secondary"].calls == 0
+    assert llm.stats()["hedged"] == 0
+
+
+def test_slow_lead_is_hedged_and_the_first_token_wins(providers):
+    providers["primary"].delay = 1.0
+    llm = _hedged(providers, hedge_after=0.1)
+
+    started = time.perf_counter()
+    assert llm.invoke(MESSAGES).content == "secondary respondeu"
+    assert time.perf_counter() - started < 0.9
+    stats = llm.stats()
+    assert stats["hedged"] == 1 and stats["secondary"]["wins"] == 1
+
+
+def test_async_failover_when_the_lead_fails(providers):
+    providers["primary"].status = 503
+    llm = _hedged(providers, hedge_after=5.0)
+
+    reply = asyncio.run(llm.ainvoke(MESSAGES))
+    assert reply.content == "secondary respondeu"
+    assert llm.stats()["failovers"] == 1
+    assert llm.stats()["primary"]["error_rate"] == 1.0
+
+
+def test_lower_p50_leads_and_hedges_at_its_p99(providers):
+    providers["primary"].delay = 0.05
+    llm = _hedged(providers, hedge_after=0.01, min_latency_samples=3)
+
+    # o secundário acumula amostras de latência vencendo os hedges
+    for _ in range(3):
+        assert llm.invoke(MESSAGES).content == "secondary respondeu"
+    assert llm._order()[0][0] == "secondary"
+    assert llm._hedge_delay("secondary") <= 0.01
+
+    llm.hedge_after = 5.0
+    lead_p99 = llm.stats()["secondary"]["p99"]
+    assert llm._hedge_delay("secondary") == lead_p99
+    providers["primary"].calls = 0
+    assert llm.invoke(MESSAGES).content == "secondary respondeu"
+    assert providers["primary"].calls == 0
+
+
+def test_counters_are_exact_under_concurrency(providers):
+    llm = _hedged(providers, hedge_after=5.0)
+    threads = [threading.Thread(target=lambda: [llm.invoke(MESSAGES) for _ in range(5)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = llm.stats()
+    assert stats["requests"] == 40
+    assert stats["primary"]["requests"] == stats["primary"]["wins"] == 40
+
+
+def test_open_connection_warms_both_hedged_providers(providers):
+    open_connection(_hedged(providers))
+
+    assert providers["primary"].model_lists == 1 and providers["secondary"].model_lists == 1
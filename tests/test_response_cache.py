@@ -0,0 +1,28 @@
+"""Response cache keys and SQLite pruning."""
+from utils.response_cache import ResponseCache, make_key
+
+
+def test_key_depends_on_the_conversation_memory():
+    first = make_key("welcome_agent:answer", "openai", "gpt", "p1", "Como abrir empresa?", "v1")
+    assert first == make_key("welcome_agent:answer", "openai", "gpt", "p1", "como abrir empresa", "v1")
+    assert first != make_key("welcome_agent:answer", "openai", "gpt", "p1", "como abrir empresa", "v1", "abc")
+    assert first != make_key("welcome_agent:answer", "openai", "gpt", "p1", "como abrir empresa", "v2")
+
+
+def test_sqlite_is_pruned_periodically_to_max_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(max_entries=10, path=path, prune_every=8)
+    for i in range(15):
+        cache.put(f"k{i}", {"response": i})
+    count = lambda: cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    # podado na 8ª gravação (ainda abaixo do limite); a próxima poda é na 16ª
+    assert count() == 15
+
+    cache.put("k15", {"response": 15})
+    assert count() == 10
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM responses")}
+    assert keys == {f"k{i}" for i in range(6, 16)}
+
+    other = ResponseCache(max_entries=10, path=path)
+    assert other.get("k15") == {"response": 15}
+    assert other.get("k0") is None
@@ -0,0 +1,34 @@
+"""HTTP API served by ``server.py`` and its client (``utils/api_client.py``)."""
+import socket
+
+from fastapi.testclient import TestClient
+
+from server import create_app
+from utils.api_client import ChatbotClient
+
+
+def test_chat_and_health(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "sessions.sqlite"))
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "response_cache.sqlite"))
+    with TestClient(create_app("fake")) as client:
+        chat = client.post("/chat", json={"message": "quero abrir um cnpj", "session_id": "s1"})
+        health = client.get("/health")
+
+    assert chat.status_code == 200 and chat.json()["response"]
+    assert health.status_code == 200
+    assert health.json()["status"] == "ok" and health.json()["corpus_version"]
+
+
+def test_client_reset_session_reports_api_errors(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "sessions.sqlite"))
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "response_cache.sqlite"))
+    with TestClient(create_app("fake")) as http:
+        client = ChatbotClient("http://testserver")
+        client._client = http
+        assert client.reset_session("s1") is True
+
+    # API fora do ar: nada de exceção chegando na sidebar
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    assert ChatbotClient(f"http://127.0.0.1:{port}", timeout=2).reset_session("s1") is False
@@ -0,0 +1,86 @@
+"""Session checkpointers: in memory (latest checkpoint only, idle and LRU eviction) and SQLite."""
+import asyncio
+import time
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from utils.session_store import BoundedMemorySaver, open_sqlite_checkpointer
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _put(saver, thread_id, value):
+    checkpoint = empty_checkpoint()
+    version = saver.get_next_version(None, None) if value is None else str(value)
+    checkpoint["channel_values"] = {"response": value}
+    checkpoint["channel_versions"] = {"response": version}
+    config = saver.put(_config(thread_id), checkpoint, {}, {"response": version})
+    saver.put_writes(config, [("response", value)], task_id="t")
+    return config
+
+
+def test_keeps_only_the_latest_checkpoint_per_thread():
+    saver = BoundedMemorySaver()
+    for turn in range(5):
+        _put(saver, "s1", turn)
+
+    assert len(saver.storage["s1"][""]) == 1
+    assert len(saver.writes) == 1
+    assert len(saver.blobs) == 1
+    assert saver.get_tuple(_config("s1")).checkpoint["channel_values"] == {"response": 4}
+
+
+def test_least_recently_used_threads_are_dropped():
+    saver = BoundedMemorySaver(max_threads=2)
+    _put(saver, "s1", 1)
+    _put(saver, "s2", 1)
+    saver.get_tuple(_config("s1"))
+    _put(saver, "s3", 1)
+
+    assert saver.get_tuple(_config("s2")) is None
+    assert saver.get_tuple(_config("s1")) is not None
+    assert list(saver.storage) == ["s1", "s3"] and saver.evicted_threads == 1
+    assert all(key[0] != "s2" for key in saver.blobs)
+
+
+def test_idle_threads_are_dropped():
+    saver = BoundedMemorySaver(idle_ttl=0.05)
+    _put(saver, "s1", 1)
+    time.sleep(0.1)
+    _put(saver, "s2", 1)
+
+    assert saver.get_tuple(_config("s1")) is None
+    assert saver.get_tuple(_config("s2")) is not None
+    assert saver.blobs and all(key[0] == "s2" for key in saver.blobs)
+
+
+def test_delete_thread_forgets_everything():
+    saver = BoundedMemorySaver()
+    _put(saver, "s1", 1)
+    saver.delete_thread("s1")
+
+    assert saver.get_tuple(_config("s1")) is None
+    assert not saver.storage and not saver.writes and not saver.blobs
+
+
+def test_sqlite_saver_serves_concurrent_async_sessions(tmp_path):
+    saver = open_sqlite_checkpointer(str(tmp_path / "sessions.sqlite"))
+
+    async def session(n):
+        thread_id = f"s{n}"
+        for turn in range(5):
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = {"response": f"{thread_id}-{turn}"}
+            config = await saver.aput(_config(thread_id), checkpoint, {}, {})
+            await saver.aput_writes(config, [("response", turn)], task_id="t")
+            saved = await saver.aget_tuple(_config(thread_id))
+            assert saved.checkpoint["channel_values"] == {"response": f"{thread_id}-{turn}"}
+        return len([item async for item in saver.alist(_config(thread_id))])
+
+    async def run():
+        return await asyncio.gather(*(session(n) for n in range(50)))
+
+    assert asyncio.run(run()) == [5] * 50
+    saver.conn.close()
@@ -0,0 +1,148 @@
+"""Single-flight: one upstream call per key, with its events fanned out to every caller."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from manager.agent_manager import AgentManager
+from utils.single_flight import SingleFlight, get_flight_group
+
+
+def test_followers_get_every_event_as_it_is_emitted():
+    flight = SingleFlight()
+    first_emitted, follower_joined, release = threading.Event(), threading.Event(), threading.Event()
+    seen = {"leader": [], "follower": []}
+    results = {}
+
+    def fn(emit):
+        emit("a")
+        first_emitted.set()
+        follower_joined.wait(5)
+        emit("b")
+        release.wait(5)
+        emit("c")
+        return "abc"
+
+    def follower():
+        first_emitted.wait(5)
+        follower_joined.set()
+        results["follower"] = flight.do_stream("k", fn, seen["follower"].append)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+
+    def leader():
+        results["leader"] = flight.do_stream("k", fn, seen["leader"].append)
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    follower_joined.wait(5)
+    # o seguidor recebe "b" antes de a chamada terminar
+    for _ in range(500):
+        if seen["follower"] == ["a", "b"]:
+            break
+        time.sleep(0.01)
+    assert seen["follower"] == ["a", "b"]
+    release.set()
+    leader_thread.join(5)
+    thread.join(5)
+
+    assert results == {"leader": ("abc", False), "follower": ("abc", True)}
+    assert seen == {"leader": ["a", "b", "c"], "follower": ["a", "b", "c"]}
+    assert flight.stats() == {"executions": 1, "coalesced": 1}
+
+
+def test_async_followers_stream_live_and_survive_a_cancelled_leader():
+    flight = SingleFlight()
+
+    async def main():
+        step = asyncio.Event()
+        calls = []
+
+        async def fn(emit):
+            calls.append(1)
+            emit("a")
+            await step.wait()
+            emit("b")
+            return "ab"
+
+        leader_events, follower_events = [], []
+        leader = asyncio.ensure_future(flight.ado_stream("k", fn, leader_events.append))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado_stream("k", fn, follower_events.append))
+        await asyncio.sleep(0.01)
+        assert follower_events == ["a"]
+
+        # a task especulativa que iniciou a chamada é descartada: o seguidor continua
+        leader.cancel()
+        await asyncio.sleep(0)
+        step.set()
+        assert await follower == ("ab", True)
+        assert follower_events == ["a", "b"]
+        assert leader.cancelled() and len(calls) == 1
+
+    asyncio.run(main())
+
+
+def test_call_is_cancelled_when_its_last_caller_is():
+    flight = SingleFlight()
+
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def fn():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        task = asyncio.ensure_future(flight.ado("k", fn))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+        # a chave fica livre para uma nova chamada
+        async def ok():
+            return 1
+
+        assert await flight.ado("k", ok) == (1, False)
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def main():
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.ado("k", fn), flight.ado("k", fn), return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError, ValueError]
+
+    asyncio.run(main())
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+
+def test_identical_questions_stream_to_both_sessions(site, monkeypatch):
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0.05")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_SECOND", "200")
+    from utils.testing.fake_llm import register_fake_provider
+
+    register_fake_provider()
+    manager = AgentManager("fake")
+    before = get_flight_group("llm").stats()["coalesced"]
+
+    async def session(session_id):
+        return [t async for t in manager.aprocess_message_stream("quanto custa a contabilidade?", [], session_id)]
+
+    async def main():
+        return await asyncio.gather(session("s1"), session("s2"))
+
+    first, second = asyncio.run(main())
+    assert get_flight_group("llm").stats()["coalesced"] > before
+    assert first == second and len(second) > 1
@@ -0,0 +1,128 @@
+"""Upload validation: strict PDF structure, results kept on disk, exact counters."""
+import io
+import os
+import threading
+import time
+
+import pytest
+from pypdf import PdfWriter
+
+from utils import upload_pipeline
+from utils.upload_pipeline import UploadPipeline
+
+
+def _pdf(pages: int = 2) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(200, 200)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return UploadPipeline(directory=str(tmp_path / "uploads"), max_pdf_pages=5)
+
+
+def _check(pipeline, data: bytes):
+    ref = pipeline.store(io.BytesIO(data), "doc.pdf")
+    return pipeline.wait(ref.sha256, timeout=10)
+
+
+def test_valid_pdf_with_trailing_bytes_is_accepted(pipeline):
+    # o antigo teste de %%EOF nos últimos 2 KB recusava este arquivo
+    result = _check(pipeline, _pdf() + b"\0" * 4096)
+    assert result.valid and result.info == {"pages": 2} and not result.best_effort
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[: len(data) // 2] + b"\n%%EOF\n",      # truncado, com marcador de fim forjado
+    lambda data: data[:-40],                                   # sem trailer
+])
+def test_broken_pdf_structure_is_rejected(pipeline, damage):
+    result = _check(pipeline, damage(_pdf()))
+    assert not result.valid and "corrompido" in result.detail
+
+
+def test_too_many_pages(pipeline):
+    result = _check(pipeline, _pdf(pages=6))
+    assert not result.valid and result.info == {"pages": 6}
+
+
+def test_without_pypdf_the_result_is_best_effort(pipeline, monkeypatch):
+    monkeypatch.setattr(upload_pipeline, "PdfReader", None)
+    result = _check(pipeline, _pdf())
+    assert result.valid and result.best_effort
+
+
+def test_finished_validations_leave_memory_and_survive_restarts(pipeline, monkeypatch):
+    ref = pipeline.store(io.BytesIO(_pdf()), "doc.pdf")
+    pipeline.wait(ref.sha256, timeout=10)
+    assert not pipeline._validations
+
+    calls = []
+    monkeypatch.setattr(upload_pipeline, "validate_pdf", lambda *a: calls.append(a))
+    restarted = UploadPipeline(directory=pipeline.directory)
+    again = restarted.store(io.BytesIO(_pdf()), "copia.pdf")
+    assert again.duplicate
+    assert restarted.wait(again.sha256, timeout=10).valid
+    assert restarted.result(again.sha256).info == {"pages": 2}
+    assert calls == []
+
+
+def test_results_in_memory_are_bounded(pipeline, monkeypatch):
+    monkeypatch.setattr(upload_pipeline, "MAX_CACHED_RESULTS", 2)
+    refs = [pipeline.store(io.BytesIO(_pdf(pages)), f"{pages}.pdf") for pages in (1, 2, 3)]
+    for ref in refs:
+        pipeline.wait(ref.sha256, timeout=10)
+
+    assert len(pipeline._results) == 2
+    # o mais antigo saiu da memória, mas continua no disco
+    assert pipeline.result(refs[0].sha256).info == {"pages": 1}
+
+
+def test_counters_are_exact_under_concurrency(pipeline):
+    data = _pdf()
+
+    def upload():
+        for _ in range(25):
+            pipeline.store(io.BytesIO(data), "doc.pdf")
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pipeline.stats["stored"] + pipeline.stats["duplicates"] == 200
+
+
+def test_session_reset_deletes_only_its_own_documents(pipeline):
+    mine = pipeline.store(io.BytesIO(_pdf(1)), "rg.pdf", session_id="a")
+    shared = pipeline.store(io.BytesIO(_pdf(2)), "cnh.pdf", session_id="a")
+    pipeline.store(io.BytesIO(_pdf(2)), "cnh.pdf", session_id="b")
+    for ref in (mine, shared):
+        pipeline.wait(ref.sha256, timeout=10)
+
+    assert pipeline.forget_session("a") == 1
+    assert not os.path.exists(mine.path) and pipeline.result(mine.sha256) is None
+    assert os.path.exists(shared.path) and pipeline.result(shared.sha256).valid
+
+
+def test_expired_uploads_are_purged(pipeline):
+    ref = pipeline.store(io.BytesIO(_pdf()), "doc.pdf")
+    pipeline.wait(ref.sha256, timeout=10)
+    pipeline.retention = 60
+    assert pipeline.purge_expired() == 0
+
+    old = time.time() - 120
+    os.utime(ref.path, (old, old))
+    assert pipeline.purge_expired() == 1
+    assert not os.listdir(os.path.dirname(ref.path))
+    assert pipeline.result(ref.sha256) is None
+
+
+def test_relative_upload_dir_is_under_the_project_root():
+    pipeline = UploadPipeline(directory=os.path.join("data", "uploads"), workers=1, retention=0)
+    assert pipeline.directory == os.path.join(upload_pipeline.PROJECT_ROOT, "data", "uploads")
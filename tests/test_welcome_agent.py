@@ -0,0 +1,59 @@
+"""WelcomeAgent routing: local fast path, LLM fallback and the handoff reply."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents.company_opening_agent import EMPTY_RESPONSE_FALLBACK, CompanyOpeningAgent
+from agents.welcome_agent import HANDOFF_RESPONSE, WelcomeAgent
+from utils.testing.fake_llm import FakeStreamingChatModel
+from utils.webscraper import ContabilizeiScraper
+
+
+@pytest.fixture
+def agent(site):
+    return WelcomeAgent("fake", llm=FakeStreamingChatModel(), scraper=ContabilizeiScraper(base_url=site.base_url))
+
+
+@pytest.mark.parametrize("word", ["empresa", "abrir", "cnpj"])
+def test_single_word_goes_to_the_llm(agent, word):
+    assert agent.classifier.predict(word)[1] >= agent.fastpath_threshold   # o classificador erraria confiante
+    assert agent._classify_locally(word) is None
+    assert agent.intent_stats == {"fast_path": 0, "llm_fallback": 1}
+
+
+def test_fast_path_handoff_is_never_empty(agent):
+    intents = []
+    result = agent.process({"message": "quero abrir uma empresa"}, on_intent=intents.append)
+
+    assert result == {"response": HANDOFF_RESPONSE, "next_agent": "company_opening_agent"}
+    assert intents == ["company_opening_agent"]
+    assert agent.intent_stats["fast_path"] == 1
+
+
+def test_empty_llm_handoff_gets_the_handoff_reply(site):
+    llm = FakeStreamingChatModel(responder=lambda messages: '{"intent": "abrir_empresa", "response": ""}')
+    agent = WelcomeAgent("fake", llm=llm, scraper=ContabilizeiScraper(base_url=site.base_url))
+
+    result = agent.process({"message": "empresa"})
+
+    assert result == {"response": HANDOFF_RESPONSE, "next_agent": "company_opening_agent"}
+
+
+def test_company_agent_never_answers_empty():
+    agent = CompanyOpeningAgent("fake", llm=FakeStreamingChatModel(responder=lambda messages: ""))
+    tokens = []
+
+    result = agent.process({"message": "quais documentos?"}, on_token=tokens.append)
+
+    assert result["response"] == EMPTY_RESPONSE_FALLBACK
+    assert "".join(tokens) == EMPTY_RESPONSE_FALLBACK
+
+
+def test_intent_stats_are_exact_under_concurrency(agent):
+    messages = ["quero abrir uma empresa", "empresa", "quanto custa o plano de contabilidade?"] * 300
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(agent._classify_locally, messages))
+
+    assert sum(agent.intent_stats.values()) == len(messages)
+    assert agent.intent_stats["llm_fallback"] >= 300
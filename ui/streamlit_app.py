@@ -1,7 +1,10 @@
 # ui/streamlit_app.py  –  coloca set_page_config uma única vez e logo após importar Streamlit
 import os
 import logging
-from typing import List, Dict, cast
+import uuid
+from itertools import chain
+from dataclasses import asdict
+from typing import Any, Iterable, Iterator, List, Dict, Union, cast
 
 import streamlit as st
 
@@ -10,6 +13,10 @@ st.set_page_config(page_title="Contabilizei Chatbot", page_icon="💬", layout="
 
 from dotenv import load_dotenv
 from manager.agent_manager import AgentManager
+from utils.api_client import ChatbotClient
+from utils.markdown_text import escape_markdown, escape_stream
+from utils.metrics import start_metrics_server
+from utils.upload_pipeline import UploadRejected, get_upload_pipeline
 
 # ----------------------------------------------------------------------------
 #                            LOGGING & ENVIRONMENT
@@ -18,6 +25,21 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# campo -> rótulo dos documentos pedidos no fluxo de abertura de CNPJ
+DOC_SLOTS = {
+    "rg_cpf": "RG e CPF do(s) proprietário(s)",
+    "comprov_end": "Comprovante de endereço atualizado",
+    "cert_cas": "Certidão de casamento (se aplicável)",
+    "iptu": "Cópia do IPTU/inscrição imobiliária",
+    "conselho": "Registro em conselho profissional (se exigido pela atividade)",
+}
+
+# com a API (server.py) no ar, a UI é só um cliente HTTP dela
+CHATBOT_API_URL = os.getenv("CHATBOT_API_URL", "")
+
+# mensagens do histórico desenhadas a cada rerun; as anteriores ficam atrás de um botão (0 = todas)
+CHAT_VISIBLE_MESSAGES = int(os.getenv("CHAT_VISIBLE_MESSAGES", "20"))
+
 
 # ----------------------------------------------------------------------------
 #                        SESSION‑STATE INITIALIZATION
@@ -27,10 +49,38 @@ def init_session() -> None:
         st.session_state.messages = cast(List[Dict[str, str]], [])
     if "llm_provider" not in st.session_state:
         st.session_state.llm_provider = "openai"
-    if "agent_manager" not in st.session_state:
-        st.session_state.agent_manager = AgentManager(st.session_state.llm_provider)
     if "show_upload" not in st.session_state:
         st.session_state.show_upload = False
+    if "session_id" not in st.session_state:
+        # chave do estado da conversa no checkpointer do AgentManager
+        st.session_state.session_id = uuid.uuid4().hex
+    if "doc_refs" not in st.session_state:
+        # campo -> referência do arquivo no disco (o conteúdo não fica na sessão)
+        st.session_state.doc_refs = cast(Dict[str, Dict[str, Any]], {})
+    if "visible_messages" not in st.session_state:
+        st.session_state.visible_messages = CHAT_VISIBLE_MESSAGES
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up(llm_provider: str) -> None:
+    """Uma vez por processo e provedor: monta o grafo e abre conexões antes da 1ª mensagem."""
+    if not CHATBOT_API_URL:
+        AgentManager.warm_up_in_background(llm_provider)
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(int(os.environ["METRICS_PORT"]))
+
+
+@st.cache_resource(show_spinner=False)
+def get_api_client(base_url: str) -> ChatbotClient:
+    return ChatbotClient(base_url)
+
+
+def get_manager() -> Union[AgentManager, ChatbotClient]:
+    """Manager compartilhado do provedor atual; a sessão guarda só mensagens e session_id."""
+    if CHATBOT_API_URL:
+        # o provedor é o configurado no servidor
+        return get_api_client(CHATBOT_API_URL)
+    return AgentManager.shared(st.session_state.llm_provider)
 
 
 # ----------------------------------------------------------------------------
@@ -47,7 +97,6 @@ def sidebar() -> None:
         if prov.lower() != st.session_state.llm_provider:
             logger.info(f"Alterando provedor para {prov.lower()}")
             st.session_state.llm_provider = prov.lower()
-            st.session_state.agent_manager = AgentManager(st.session_state.llm_provider)
 
         api_key = st.text_input(
             f"{prov} API Key", type="password",
@@ -56,58 +105,138 @@ def sidebar() -> None:
         if api_key:
             os.environ[f"{prov.upper()}_API_KEY"] = api_key
 
+        st.session_state.debug = st.toggle("🔍 Debug (tempos do último turno)", value=st.session_state.get("debug", False))
+
         if st.button("🗑️ Limpar conversa"):
             st.session_state.messages.clear()
+            st.session_state.visible_messages = CHAT_VISIBLE_MESSAGES
             st.session_state.show_upload = False
-            st.session_state.agent_manager.last_next_agent = "end_node"
+            st.session_state.doc_refs.clear()
+            # documentos de identidade enviados só por esta sessão saem do disco
+            get_upload_pipeline().forget_session(st.session_state.session_id)
+            # com CHATBOT_API_URL, False quando a API não respondeu
+            if get_manager().reset_session(st.session_state.session_id) is False:
+                st.error("Não foi possível limpar a conversa no servidor. Tente novamente.")
 
 
 # ----------------------------------------------------------------------------
 #                                 MAIN CHAT UI
 # ----------------------------------------------------------------------------
 def chat_ui() -> None:
-    mgr: AgentManager = st.session_state.agent_manager
+    mgr = get_manager()
 
     st.title("💬 Contabilizei Chatbot")
     st.markdown("Bem‑vindo ao assistente virtual da Contabilizei!")
 
-    # histórico
-    for m in st.session_state.messages:
-        with st.chat_message(m["role"]):
-            st.markdown(m["content"])
+    history()
 
     # input
     if prompt := st.chat_input("Digite sua mensagem..."):
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
-            st.markdown(prompt)
+            st.markdown(escape_markdown(prompt))
 
         with st.chat_message("assistant"):
+            # spinner só até o primeiro token; depois a resposta é exibida enquanto é gerada.
+            # o histórico não é enviado: a memória da conversa fica no checkpointer da sessão
+            tokens = mgr.process_message_stream(prompt, session_id=st.session_state.session_id)
             with st.spinner("Pensando..."):
                 try:
-                    reply = mgr.process_message(prompt, st.session_state.messages)
+                    first_token = next(tokens, "")
                 except Exception:
                     logger.exception("Erro no processamento do agente")
-                    reply = "Desculpe, ocorreu um erro. Tente novamente."
-                st.markdown(reply)
+                    tokens, first_token = iter(()), "Desculpe, ocorreu um erro. Tente novamente."
+            # o escape ("$" -> "\$") é só para exibir: o histórico guarda o texto original
+            raw_tokens: List[str] = []
+            st.write_stream(escape_stream(_collect(chain([first_token], tokens), raw_tokens)))
+
+        st.session_state.messages.append({"role": "assistant", "content": "".join(raw_tokens)})
 
-        st.session_state.messages.append({"role": "assistant", "content": reply})
+        # se intenção = abrir empresa, ativa uploads (e desativa ao sair do fluxo)
+        next_agent = mgr.get_next_agent(st.session_state.session_id)
+        st.session_state.show_upload = next_agent == "company_opening_agent"
 
-        # se intenção = abrir empresa, ativa uploads
-        if mgr.last_next_agent == "company_opening_agent":
-            st.session_state.show_upload = True
+    if st.session_state.get("debug"):
+        debug_panel(mgr)
 
     # seção de upload
     if st.session_state.show_upload:
-        st.markdown("### 📑 Faça upload dos documentos para abrir seu CNPJ")
-        st.session_state.docs_uploads = {
-            "rg_cpf": st.file_uploader("RG e CPF do(s) proprietário(s)", type=["pdf", "jpg", "png"]),
-            "comprov_end": st.file_uploader("Comprovante de endereço atualizado", type=["pdf", "jpg", "png"]),
-            "cert_cas": st.file_uploader("Certidão de casamento (se aplicável)", type=["pdf", "jpg", "png"]),
-            "iptu": st.file_uploader("Cópia do IPTU/inscrição imobiliária", type=["pdf", "jpg", "png"]),
-            "conselho": st.file_uploader(
-                "Registro em conselho profissional (se exigido pela atividade)", type=["pdf", "jpg", "png"]),
-        }
+        upload_section()
+
+
+def _collect(tokens: Iterable[str], into: List[str]) -> Iterator[str]:
+    for token in tokens:
+        into.append(token)
+        yield token
+
+
+def _show_older() -> None:
+    st.session_state.visible_messages += CHAT_VISIBLE_MESSAGES
+
+
+def history() -> None:
+    """Só as últimas mensagens são desenhadas a cada rerun; as anteriores, sob demanda."""
+    messages = st.session_state.messages
+    limit = st.session_state.visible_messages
+    hidden = max(0, len(messages) - limit) if limit > 0 else 0
+    if hidden:
+        st.button(f"⬆️ Carregar mensagens anteriores ({hidden} ocultas)", on_click=_show_older)
+    for m in messages[hidden:]:
+        with st.chat_message(m["role"]):
+            st.markdown(escape_markdown(m["content"]))
+
+
+def debug_panel(mgr: Union[AgentManager, ChatbotClient]) -> None:
+    """Etapas do último turno (nós do grafo, scraper, busca, LLM) com tempos e contadores."""
+    trace = mgr.last_trace(st.session_state.session_id)
+    if trace is None:
+        return
+    total = f"{trace.total * 1000:.0f} ms" if trace.total is not None else "em andamento"
+    with st.expander(f"🔍 Último turno: {total}"):
+        lines = ["| etapa | início (ms) | duração (ms) | detalhes |", "|---|---:|---:|---|"]
+        for row in trace.as_rows():
+            details = ", ".join(f"{k}={v}" for k, v in row.items() if k not in ("stage", "start_ms", "ms"))
+            lines.append(f"| `{row['stage']}` | {row['start_ms']} | {row['ms']} | {details} |")
+        st.markdown("\n".join(lines))
+        if trace.counts:
+            st.json({name: int(value) if value == int(value) else value for name, value in trace.counts.items()})
+
+
+def upload_section() -> None:
+    """Arquivos vão para o disco (utils/upload_pipeline.py); a sessão guarda só referências."""
+    pipeline = get_upload_pipeline()
+    st.markdown("### 📑 Faça upload dos documentos para abrir seu CNPJ")
+    st.caption("Digite **sair** para voltar ao atendimento geral.")
+
+    pending = False
+    for slot, label in DOC_SLOTS.items():
+        uploaded = st.file_uploader(label, type=["pdf", "jpg", "jpeg", "png"], key=f"upload_{slot}")
+        ref = st.session_state.doc_refs.get(slot)
+        if uploaded is None:
+            removed = st.session_state.doc_refs.pop(slot, None)
+            if removed is not None:
+                pipeline.release(st.session_state.session_id, removed["sha256"])
+            continue
+        if ref is None or ref["file_id"] != uploaded.file_id:
+            # arquivo novo neste campo: grava uma vez, não a cada rerun
+            try:
+                if ref is not None:       # outro arquivo no mesmo campo substitui o anterior
+                    pipeline.release(st.session_state.session_id, ref["sha256"])
+                stored = pipeline.store(uploaded, uploaded.name, session_id=st.session_state.session_id)
+            except UploadRejected as e:
+                st.error(f"{uploaded.name}: {e}")
+                continue
+            ref = st.session_state.doc_refs[slot] = {"file_id": uploaded.file_id, **asdict(stored)}
+        result = pipeline.result(ref["sha256"])
+        if result is None:
+            pending = True
+            st.caption(f"⏳ {ref['filename']}: validando...")
+        elif result.valid:
+            st.caption(f"✅ {ref['filename']}: {result.detail}")
+        else:
+            st.warning(f"{ref['filename']}: {result.detail}")
+    if pending:
+        st.button("🔄 Atualizar status dos documentos")
 
 
 # ----------------------------------------------------------------------------
@@ -115,6 +244,7 @@ def chat_ui() -> None:
 # ----------------------------------------------------------------------------
 def main() -> None:
     init_session()
+    start_warm_up(st.session_state.llm_provider)
     sidebar()
     chat_ui()
 
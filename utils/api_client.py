@@ -0,0 +1,85 @@
+"""HTTP client for ``server.py`` with the subset of the AgentManager API the UI uses.
+
+With ``CHATBOT_API_URL`` set, the Streamlit app talks to the API service
+instead of running the agents in its own process.
+"""
+import json
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ERROR_REPLY = "Desculpe, ocorreu um erro no processamento."
+
+
+class ChatbotClient:
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.Client(base_url=self.base_url, timeout=timeout)
+        # next_agent chega no fim do stream; evita uma requisição extra por turno
+        self._next_agent: Dict[str, str] = {}
+
+    def _payload(self, message: str, chat_history: Optional[List[Dict[str, str]]], session_id: str) -> Dict:
+        return {"message": message, "session_id": session_id, "chat_history": chat_history}
+
+    def process_message(
+        self, message: str, chat_history: Optional[List[Dict[str, str]]] = None, session_id: str = "default"
+    ) -> str:
+        try:
+            response = self._client.post("/chat", json=self._payload(message, chat_history, session_id))
+            response.raise_for_status()
+        except httpx.HTTPError:
+            logger.error("Chat API request failed", exc_info=True)
+            return ERROR_REPLY
+        data = response.json()
+        self._next_agent[session_id] = data["next_agent"]
+        return data["response"]
+
+    def process_message_stream(
+        self, message: str, chat_history: Optional[List[Dict[str, str]]] = None, session_id: str = "default"
+    ) -> Iterator[str]:
+        self._next_agent.pop(session_id, None)
+        try:
+            with self._client.stream(
+                "POST", "/chat/stream", json=self._payload(message, chat_history, session_id)
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("done"):
+                        self._next_agent[session_id] = event["next_agent"]
+                    else:
+                        yield event["token"]
+        except httpx.HTTPError:
+            logger.error("Chat API stream failed", exc_info=True)
+            yield ERROR_REPLY
+
+    def get_next_agent(self, session_id: str) -> str:
+        next_agent = self._next_agent.pop(session_id, None)
+        if next_agent is not None:
+            return next_agent
+        try:
+            response = self._client.get(f"/sessions/{session_id}")
+            response.raise_for_status()
+        except httpx.HTTPError:
+            logger.error("Chat API request failed", exc_info=True)
+            return "end_node"
+        return response.json()["next_agent"]
+
+    def reset_session(self, session_id: str) -> bool:
+        """False (logged) when the API could not forget the session."""
+        self._next_agent.pop(session_id, None)
+        try:
+            self._client.delete(f"/sessions/{session_id}").raise_for_status()
+        except httpx.HTTPError:
+            logger.error("Chat API session reset failed", exc_info=True)
+            return False
+        return True
+
+    def last_trace(self, session_id: str) -> None:
+        """Traces stay in the API worker that ran the turn (see its ``/metrics``)."""
+        return None
@@ -0,0 +1,261 @@
+"""Token-bounded conversation memory: recent-message window + rolling summary.
+
+The memory lives in the graph state (per session, in the checkpointer) as
+two small fields instead of the full chat history:
+
+    history   the most recent messages, at most ``CHAT_HISTORY_TOKEN_BUDGET``
+              tokens (oldest messages are evicted first, whole turns at a time)
+    summary   a summary of everything evicted so far, at most
+              ``CHAT_SUMMARY_TOKEN_BUDGET`` tokens
+
+The summary is updated incrementally: only the messages evicted in a turn
+are folded into the previous summary, so the per-turn cost does not grow
+with the conversation. The end of a turn always uses the local extractive
+summarizer (first sentence of each message). With ``CHAT_SUMMARY_MODE=llm``
+the agent's LLM also merges the evicted messages into the summary, in a
+background thread after the turn; the next turn of the session picks that
+summary up (``refined_summary``) if nothing changed the summary meanwhile.
+The refined summary stays in the process that ran the turn.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from utils.context_packer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]          # {"role": "user" | "assistant", "content": ...}
+
+# custo aproximado de cada mensagem além do conteúdo (papel, separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+# palavras de cada mensagem mantidas no resumo extrativo
+SUMMARY_LINE_WORDS = 30
+# resumos da LLM prontos e ainda não aplicados (sessões que não voltaram), no máximo
+MAX_PENDING_SUMMARIES = 1024
+
+_FIRST_SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+_ROLE_LABELS = {"user": "Usuário", "assistant": "Assistente"}
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Você mantém o resumo de uma conversa entre um cliente e o assistente da Contabilizei. "
+            "Atualize o resumo com as novas mensagens, em português, em no máximo {max_words} palavras. "
+            "Preserve dados do cliente (atividade, cidade, regime, dúvidas em aberto) e decisões tomadas. "
+            "Responda só com o resumo.",
+        ),
+        ("human", "Resumo atual:\n{summary}\n\nNovas mensagens:\n{messages}"),
+    ]
+)
+
+
+def message_tokens(message: Message) -> int:
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def history_digest(history: List[Message], summary: str) -> str:
+    """Short stable hash of the memory; part of the response-cache/single-flight keys."""
+    if not history and not summary:
+        return ""
+    payload = json.dumps([summary, [(m["role"], m["content"]) for m in history]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def to_messages(history: List[Message], summary: str) -> List[BaseMessage]:
+    """Memory as chat messages for a ``MessagesPlaceholder("history")``."""
+    messages: List[BaseMessage] = []
+    if summary:
+        messages.append(SystemMessage(content=f"Resumo da conversa até aqui:\n{summary}"))
+    for m in history:
+        cls = AIMessage if m["role"] == "assistant" else HumanMessage
+        messages.append(cls(content=m["content"]))
+    return messages
+
+
+def _format_messages(messages: List[Message]) -> str:
+    return "\n".join(f"{_ROLE_LABELS.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+
+
+class ChatMemory:
+    """Applies the window/summary policy; stateless, one instance per manager."""
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        summary_token_budget: Optional[int] = None,
+        mode: Optional[str] = None,
+        llm=None,
+    ):
+        self.token_budget = token_budget if token_budget is not None else int(
+            os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1000"))
+        self.summary_token_budget = summary_token_budget if summary_token_budget is not None else int(
+            os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+        self.mode = (mode or os.getenv("CHAT_SUMMARY_MODE", "extractive")).lower()
+        self.llm = llm
+        self.stats = {
+            "turns": 0, "evicted_messages": 0, "summary_updates": 0, "llm_summaries": 0, "llm_summary_errors": 0,
+        }
+        self._lock = threading.Lock()
+        # session_id -> (resumo extrativo que a LLM refinou, resumo da LLM)
+        self._refined: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, stat: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += n
+
+    # ------------------------------------------------------------------ #
+    #                              WINDOW                                #
+    # ------------------------------------------------------------------ #
+    def _split(self, history: List[Message]) -> Tuple[List[Message], List[Message]]:
+        """(evicted, kept): drop the oldest messages until the rest fits the budget."""
+        tokens = sum(message_tokens(m) for m in history)
+        cut = 0
+        while cut < len(history) and tokens > self.token_budget:
+            tokens -= message_tokens(history[cut])
+            cut += 1
+        # a janela sempre começa numa mensagem do usuário (turnos inteiros)
+        while cut < len(history) and history[cut]["role"] != "user":
+            cut += 1
+        return history[:cut], history[cut:]
+
+    # ------------------------------------------------------------------ #
+    #                             SUMMARY                                #
+    # ------------------------------------------------------------------ #
+    def _extractive(self, summary: str, evicted: List[Message]) -> str:
+        lines = summary.splitlines() if summary else []
+        for m in evicted:
+            content = " ".join(m.get("content", "").split())
+            if not content:
+                continue
+            sentence = _FIRST_SENTENCE_RE.split(content, maxsplit=1)[0]
+            words = sentence.split()
+            if len(words) > SUMMARY_LINE_WORDS:
+                sentence = " ".join(words[:SUMMARY_LINE_WORDS]) + "…"
+            lines.append(f"{_ROLE_LABELS.get(m['role'], m['role'])}: {sentence}")
+        return self._trim_summary(lines)
+
+    def _trim_summary(self, lines: List[str]) -> str:
+        """Drops the oldest lines until the summary fits its budget."""
+        while lines and count_tokens("\n".join(lines)) > self.summary_token_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _summary_vars(self, summary: str, evicted: List[Message]) -> Dict[str, Any]:
+        return {
+            "summary": summary or "(vazio)",
+            "messages": _format_messages(evicted),
+            "max_words": max(20, self.summary_token_budget * 3 // 4),
+        }
+
+    def _llm_result(self, text: str, summary: str, evicted: List[Message]) -> str:
+        text = text.strip()
+        if not text:
+            return self._extractive(summary, evicted)
+        return self._trim_summary(text.splitlines())
+
+    def summarize(self, summary: str, evicted: List[Message]) -> str:
+        """Folds ``evicted`` into ``summary`` (extractive, no LLM call)."""
+        if not evicted:
+            return summary
+        self._count("summary_updates")
+        return self._extractive(summary, evicted)
+
+    def summarize_with_llm(self, summary: str, evicted: List[Message]) -> str:
+        """Folds ``evicted`` into ``summary`` with the LLM (extractive on errors)."""
+        try:
+            chain = SUMMARY_PROMPT | self.llm | StrOutputParser()
+            text = chain.invoke(self._summary_vars(summary, evicted))
+            self._count("llm_summaries")
+            return self._llm_result(text, summary, evicted)
+        except Exception:
+            self._count("llm_summary_errors")
+            logger.error("LLM summary failed, keeping the extractive summary", exc_info=True)
+            return self._extractive(summary, evicted)
+
+    # ------------------------------------------------------------------ #
+    #                      BACKGROUND LLM SUMMARY                        #
+    # ------------------------------------------------------------------ #
+    def _refine_in_background(self, session_id: str, summary: str, evicted: List[Message], base: str) -> None:
+        """Asks the LLM for the summary after the turn; ``base`` is the extractive one it replaces."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+            executor = self._executor
+
+        def run() -> None:
+            refined = self.summarize_with_llm(summary, evicted)
+            with self._lock:
+                self._refined[session_id] = (base, refined)
+                self._refined.move_to_end(session_id)
+                while len(self._refined) > MAX_PENDING_SUMMARIES:
+                    self._refined.popitem(last=False)
+
+        executor.submit(run)
+
+    def refined_summary(self, session_id: str, summary: str) -> Optional[str]:
+        """LLM summary computed after the session's last turn, if ``summary`` is still
+        the one it refines (None otherwise, or when it is not ready yet)."""
+        with self._lock:
+            pending = self._refined.pop(session_id, None)
+        if pending is None or pending[0] != summary:
+            return None
+        return pending[1]
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._refined.pop(session_id, None)
+
+    # ------------------------------------------------------------------ #
+    #                                API                                 #
+    # ------------------------------------------------------------------ #
+    def update(
+        self,
+        history: List[Message],
+        summary: str,
+        new_messages: List[Message],
+        session_id: Optional[str] = None,
+    ) -> Tuple[List[Message], str]:
+        """(history, summary) after appending ``new_messages`` (a finished turn).
+
+        Never calls the LLM; in ``llm`` mode with a ``session_id`` the LLM
+        summary is computed in the background (see ``refined_summary``).
+        """
+        evicted, kept = self._split(list(history) + [m for m in new_messages if m.get("content")])
+        self._count("turns")
+        if not evicted:
+            return kept, summary
+        self._count("evicted_messages", len(evicted))
+        logger.debug(f"Chat memory: {len(evicted)} messages moved to the summary")
+        new_summary = self.summarize(summary, evicted)
+        if self.mode == "llm" and self.llm is not None and session_id is not None:
+            self._refine_in_background(session_id, summary, evicted, new_summary)
+        return kept, new_summary
+
+    def seed(self, chat_history: List[Message], current_message: str = "") -> Tuple[List[Message], str]:
+        """Memory built from a full transcript (e.g. a replayed log).
+
+        A trailing user message equal to ``current_message`` (the turn being
+        processed) is left out. Older messages go to the summary in one
+        extractive pass, without LLM calls.
+        """
+        messages = [
+            {"role": m.get("role", "user"), "content": m.get("content", "")}
+            for m in chat_history if m.get("content")
+        ]
+        if messages and messages[-1]["role"] == "user" and messages[-1]["content"] == current_message:
+            messages.pop()
+        evicted, kept = self._split(messages)
+        return kept, self._extractive("", evicted)
@@ -0,0 +1,127 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Optional, Tuple, Union
+
+from utils.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# um único contador por processo: o encoding do tiktoken, se o warm-up o carregou
+# antes do primeiro count_tokens, ou ~4 caracteres por token. O arquivo do o200k_base
+# pode ser baixado na carga, por isso ela só acontece no warm-up, nunca numa requisição.
+_encoding = None
+_decided = False
+_encoding_lock = threading.Lock()
+
+
+def load_encoding():
+    """Choose tiktoken as this process's token counter (may download the encoding once).
+
+    Called by the warm-up at startup. Once ``count_tokens`` has run, the
+    counter in use is kept and nothing is loaded. Returns the encoding, or
+    None when the character estimate is in use (tiktoken or the network
+    missing, or the warm-up came too late).
+    """
+    if _decided:
+        return _encoding
+    encoding = None
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:  # ImportError, or the encoding file cannot be downloaded
+        logger.info("tiktoken unavailable, estimating tokens from text length")
+    return _decide(encoding)
+
+
+def _decide(encoding):
+    global _encoding, _decided
+    with _encoding_lock:
+        if not _decided:
+            _encoding = encoding
+            _decided = True
+            if encoding is None:
+                logger.info("Counting tokens as ~4 characters per token")
+        return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Local token count with the process's counter: tiktoken when the warm-up loaded it, else ~4 characters per token."""
+    encoding = _encoding if _decided else _decide(None)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class PackedContext:
+    """Passages selected for the prompt and how much of the budget they use."""
+    text: str
+    tokens_used: int
+    token_budget: int
+    passages_used: int
+    duplicates_dropped: int
+    over_budget_dropped: int
+
+
+def _shingles(passage: str, size: int = 3) -> FrozenSet[Tuple[str, ...]]:
+    terms = tokenize(passage)
+    if len(terms) < size:
+        return frozenset((t,) for t in terms)
+    return frozenset(tuple(terms[i:i + size]) for i in range(len(terms) - size + 1))
+
+
+def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_context(
+    passages: Iterable[Union[str, Tuple[str, float]]],
+    token_budget: int,
+    similarity_threshold: float = 0.7,
+    separator: str = "\n",
+) -> PackedContext:
+    """Fill ``token_budget`` with ranked passages, best first.
+
+    ``passages`` must already be ordered by relevance (e.g. the output of
+    ``ContabilizeiScraper.search_passages``). Passages whose word 3-gram
+    Jaccard similarity with an already selected one reaches
+    ``similarity_threshold`` are dropped as near-duplicates; passages that do
+    not fit in the remaining budget are skipped so shorter, lower-ranked ones
+    can still use the space.
+    """
+    separator_tokens = count_tokens(separator)
+    selected: List[str] = []
+    selected_shingles: List[FrozenSet] = []
+    tokens_used = 0
+    duplicates = over_budget = 0
+
+    for item in passages:
+        passage = (item[0] if isinstance(item, tuple) else item).strip()
+        if not passage:
+            continue
+        shingles = _shingles(passage)
+        if any(_jaccard(shingles, other) >= similarity_threshold for other in selected_shingles):
+            duplicates += 1
+            continue
+        cost = count_tokens(passage) + (separator_tokens if selected else 0)
+        if tokens_used + cost > token_budget:
+            over_budget += 1
+            continue
+        selected.append(passage)
+        selected_shingles.append(shingles)
+        tokens_used += cost
+
+    return PackedContext(
+        text=separator.join(selected),
+        tokens_used=tokens_used,
+        token_budget=token_budget,
+        passages_used=len(selected),
+        duplicates_dropped=duplicates,
+        over_budget_dropped=over_budget,
+    )
+
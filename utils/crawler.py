@@ -0,0 +1,358 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from utils.html_extract import extract_links
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:        # sem flock (Windows): cada processo rastreia o site
+    fcntl = None
+
+DEFAULT_SNAPSHOT_PATH = os.path.join("data", "site_snapshot.json")
+
+# status que indicam página removida do site (sai do corpus no próximo crawl)
+_GONE_STATUSES = (404, 410)
+
+# Extensões que nunca são páginas HTML
+_SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico",
+    ".css", ".js", ".zip", ".mp4", ".mp3", ".xml", ".json", ".woff", ".woff2",
+)
+
+
+@dataclass
+class PageRecord:
+    """Extracted text of one crawled page plus the validators used to recrawl it."""
+    url: str
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    links: List[str] = field(default_factory=list)
+    crawled_at: float = 0.0  # time.time() of the last 200/304
+
+
+class SiteCrawler:
+    """Discovers and crawls pages under the scraper's base domain.
+
+    Pages are discovered from ``/sitemap.xml`` and from links found on already
+    crawled pages, and fetched concurrently with a bounded worker pool. On a
+    recrawl, known pages are requested with their stored ETag/Last-Modified,
+    so only pages that changed are downloaded and re-extracted. The corpus is
+    persisted to a JSON snapshot that a fresh process loads instead of
+    crawling cold.
+
+    When several processes share the snapshot (API workers), only the one
+    holding ``<snapshot>.lock`` crawls; the others reload the snapshot when
+    it changes on disk. If that process exits, another one takes over.
+    Within a process, use ``shared_crawler`` so there is one per site.
+    """
+
+    def __init__(
+        self,
+        scraper,
+        snapshot_path: Optional[str] = None,
+        max_pages: int = 200,
+        max_workers: int = 8,
+        recrawl_interval: float = 3600.0,
+        poll_interval: float = 30.0,
+    ):
+        self.scraper = scraper
+        self.snapshot_path = snapshot_path or os.getenv("CONTABILIZEI_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.recrawl_interval = recrawl_interval
+        self.poll_interval = poll_interval
+        # (páginas, versão) publicados juntos numa única atribuição: quem lê em
+        # outra thread nunca vê as páginas de um crawl com a versão de outro
+        self._corpus: Tuple[Dict[str, PageRecord], str] = ({}, "")
+        self.crawled_at = 0.0          # time.time() do último crawl (ou do snapshot carregado)
+        self._crawl_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._leader_file = None
+        self._snapshot_mtime = 0.0
+
+    @property
+    def pages(self) -> Dict[str, PageRecord]:
+        return self._corpus[0]
+
+    @property
+    def version(self) -> str:
+        return self._corpus[1]
+
+    def current(self) -> Tuple[Dict[str, PageRecord], str]:
+        """The published (pages, version) pair; the dict is never mutated afterwards."""
+        return self._corpus
+
+    # ------------------------------------------------------------------ #
+    #                           URL HELPERS                              #
+    # ------------------------------------------------------------------ #
+    def _normalize(self, url: str) -> Optional[str]:
+        """Absolute, fragment-free URL under the base domain, or None."""
+        url, _ = urldefrag(url)
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return None
+        if parsed.netloc != urlparse(self.scraper.base_url).netloc:
+            return None
+        if parsed.path.lower().endswith(_SKIP_EXTENSIONS):
+            return None
+        path = parsed.path or "/"
+        return parsed._replace(path=path, query="", params="").geturl()
+
+    def _extract_links(self, url: str, html: str) -> List[str]:
+        links: Set[str] = set()
+        for href in extract_links(html):
+            normalized = self._normalize(urljoin(url, href))
+            if normalized:
+                links.add(normalized)
+        return sorted(links)
+
+    def _sitemap_urls(self) -> List[str]:
+        """URLs listed in the sitemap (following one level of sitemap index)."""
+        urls: List[str] = []
+        pending = [urljoin(self.scraper.base_url, "/sitemap.xml")]
+        seen: Set[str] = set()
+        while pending and len(urls) < self.max_pages:
+            sitemap_url = pending.pop()
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            status, response = self.scraper._conditional_get(sitemap_url)
+            if status != 200:
+                continue
+            try:
+                root = ET.fromstring(response.content)
+            except ET.ParseError:
+                logger.warning(f"Invalid sitemap: {sitemap_url}")
+                continue
+            for loc in root.iter():
+                if not loc.tag.endswith("loc") or not loc.text:
+                    continue
+                if root.tag.endswith("sitemapindex"):
+                    pending.append(loc.text.strip())
+                else:
+                    normalized = self._normalize(loc.text.strip())
+                    if normalized:
+                        urls.append(normalized)
+        return urls
+
+    # ------------------------------------------------------------------ #
+    #                              CRAWL                                 #
+    # ------------------------------------------------------------------ #
+    def _crawl_one(self, url: str) -> Optional[PageRecord]:
+        """Fetch one page; reuse the previous record when the server answers 304.
+
+        A page the server reports as gone (404/410) returns None, so it drops
+        out of the corpus; on other errors the previous record is kept.
+        """
+        previous = self.pages.get(url)
+        status, response = self.scraper._conditional_get(
+            url,
+            etag=previous.etag if previous else None,
+            last_modified=previous.last_modified if previous else None,
+        )
+        if status == 304 and previous is not None:
+            # registro novo: o anterior pertence ao corpus já publicado, que outras threads leem
+            return replace(previous, crawled_at=time.time())
+        if status in _GONE_STATUSES:
+            if previous is not None:
+                logger.info(f"Dropping removed page {url} (HTTP {status})")
+            return None
+        if status != 200:
+            return previous
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return None
+        html = response.text
+        return PageRecord(
+            url=url,
+            text=self.scraper._extract_text(html),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            links=self._extract_links(url, html),
+            crawled_at=time.time(),
+        )
+
+    def crawl(self) -> int:
+        """Crawl the site once and return how many pages were (re)downloaded."""
+        with self._crawl_lock:
+            started = time.perf_counter()
+            seeds = [self._normalize(self.scraper.base_url)] + self._sitemap_urls() + list(self.pages)
+            frontier = list(dict.fromkeys(u for u in seeds if u))
+            seen: Set[str] = set(frontier)
+            crawled: Dict[str, PageRecord] = {}
+            changed = 0
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                while frontier and len(crawled) < self.max_pages:
+                    batch = frontier[: self.max_pages - len(crawled)]
+                    frontier = frontier[len(batch):]
+                    for url, record in zip(batch, pool.map(self._crawl_one, batch)):
+                        if record is None:
+                            continue
+                        if record is not self.pages.get(url):
+                            changed += 1
+                        crawled[url] = record
+                        for link in record.links:
+                            if link not in seen:
+                                seen.add(link)
+                                frontier.append(link)
+
+            if crawled:
+                self._corpus = (crawled, self._compute_version(crawled.values()))
+                self.crawled_at = time.time()
+            logger.info(
+                f"Crawl finished: {len(crawled)} pages, {changed} changed "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+            return changed
+
+    @staticmethod
+    def _compute_version(records: Iterable[PageRecord]) -> str:
+        digest = hashlib.sha256()
+        for record in sorted(records, key=lambda r: r.url):
+            digest.update(record.url.encode())
+            digest.update(hashlib.sha256(record.text.encode()).digest())
+        return digest.hexdigest()[:16]
+
+    # ------------------------------------------------------------------ #
+    #                             SNAPSHOT                               #
+    # ------------------------------------------------------------------ #
+    def load_snapshot(self) -> bool:
+        """Load a previously saved corpus; returns False if there is none."""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            logger.error(f"Could not read snapshot {self.snapshot_path}", exc_info=True)
+            return False
+        if data.get("base_url") != self.scraper.base_url:
+            logger.info("Snapshot belongs to another base_url, ignoring it")
+            return False
+        pages = {url: PageRecord(**record) for url, record in data.get("pages", {}).items()}
+        self._corpus = (pages, data.get("version") or self._compute_version(pages.values()))
+        self.crawled_at = data.get("saved_at", 0.0)
+        self._snapshot_mtime = mtime
+        logger.info(f"Loaded snapshot with {len(pages)} pages ({self.snapshot_path})")
+        return True
+
+    def save_snapshot(self) -> None:
+        """Atomically write the current corpus to ``snapshot_path``."""
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pages, version = self.current()
+        data = {
+            "base_url": self.scraper.base_url,
+            "version": version,
+            "saved_at": self.crawled_at or time.time(),
+            "pages": {url: asdict(record) for url, record in pages.items()},
+        }
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime
+
+    def reload_if_changed(self) -> bool:
+        """Reload the snapshot if another process rewrote it since we last read or wrote it."""
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime
+        except FileNotFoundError:
+            return False
+        return mtime != self._snapshot_mtime and self.load_snapshot()
+
+    # ------------------------------------------------------------------ #
+    #                            BACKGROUND                              #
+    # ------------------------------------------------------------------ #
+    def start_background(self) -> None:
+        """Recrawl in a daemon thread every ``recrawl_interval`` seconds."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="site-crawler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _try_lead(self) -> bool:
+        """True if this process is the one that crawls (holds the snapshot lock)."""
+        if fcntl is None or self._leader_file is not None:
+            return True
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(f"{self.snapshot_path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # mantido aberto: o lock é liberado quando o processo termina
+        self._leader_file = lock_file
+        logger.info(f"Crawling for all processes sharing {self.snapshot_path}")
+        return True
+
+    def next_crawl_in(self) -> float:
+        """Seconds until the corpus is due for a recrawl (0 if never crawled or already stale)."""
+        if not self.pages:
+            return 0.0
+        return max(0.0, self.crawled_at + self.recrawl_interval - time.time())
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            leader = self._try_lead()
+            wait = self.poll_interval
+            try:
+                if leader:
+                    # um snapshot recente (ex.: restart do processo) não é rastreado de novo na hora
+                    wait = self.next_crawl_in()
+                    if wait == 0:
+                        self.crawl()
+                        # salvo mesmo sem mudança: saved_at registra a idade real do corpus
+                        self.save_snapshot()
+                        wait = self.recrawl_interval
+                else:
+                    self.reload_if_changed()
+            except Exception:
+                logger.error("Background crawl failed", exc_info=True)
+            self._stop.wait(wait)
+
+    def corpus(self) -> Dict[str, str]:
+        """Mapping url -> extracted text of every crawled page."""
+        return {url: record.text for url, record in self.pages.items()}
+
+
+_SHARED_CRAWLERS: Dict[Tuple[str, str], SiteCrawler] = {}
+_SHARED_CRAWLERS_LOCK = threading.Lock()
+
+
+def shared_crawler(scraper, **kwargs) -> SiteCrawler:
+    """The process-wide crawler for ``scraper``'s site and snapshot path.
+
+    Created (and its snapshot loaded) on first use; later scrapers of the
+    same site get the same instance instead of a second crawl thread.
+    """
+    snapshot_path = kwargs.get("snapshot_path") or os.getenv("CONTABILIZEI_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    key = (scraper.base_url, os.path.abspath(snapshot_path))
+    with _SHARED_CRAWLERS_LOCK:
+        crawler = _SHARED_CRAWLERS.get(key)
+        if crawler is None:
+            crawler = _SHARED_CRAWLERS[key] = SiteCrawler(scraper, **{**kwargs, "snapshot_path": snapshot_path})
+            crawler.load_snapshot()
+        return crawler
@@ -0,0 +1,268 @@
+"""HTML -> text extraction for the retrieval step.
+
+Extractors take an HTML string and return plain text with one block
+(paragraph, heading, list item, table row...) per line, so
+``split_passages`` sees real paragraph and sentence boundaries. Scripts,
+styles, navigation, headers, footers, forms and asides are skipped; when the
+page has a ``<main>``, ``<article>`` or ``role="main"`` region with enough
+text, only that region is kept.
+
+Backends:
+    lxml    libxml2 parser (fastest; used when lxml is installed)
+    stdlib  streaming ``html.parser`` without building a tree
+    bs4     the original BeautifulSoup extraction, kept for comparison
+
+``HTML_EXTRACTOR`` selects the backend (default: lxml, else stdlib).
+"""
+import html as _html
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml.html as _lxml_html
+    from lxml import etree as _lxml_etree
+    # recebe bytes: com str, o lxml recusa páginas com declaração <?xml ... encoding=...?>
+    _LXML_PARSER = _lxml_html.HTMLParser(encoding="utf-8")
+except ImportError:        # lxml é opcional: cai para o parser da stdlib
+    _lxml_html = None
+    _lxml_etree = None
+    _LXML_PARSER = None
+
+# elementos cujo conteúdo nunca é texto útil para responder perguntas
+SKIP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "nav", "header", "footer", "aside", "form", "button", "select", "option",
+})
+# elementos que começam/terminam um bloco de texto
+BLOCK_TAGS = frozenset({
+    "address", "article", "blockquote", "br", "dd", "details", "div", "dl", "dt",
+    "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "main",
+    "ol", "p", "pre", "section", "summary", "table", "tr", "ul",
+})
+# células ficam na linha da tabela, separadas por espaço
+CELL_TAGS = frozenset({"td", "th"})
+MAIN_TAGS = frozenset({"main", "article"})
+VOID_TAGS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"})
+
+# região principal com menos texto que isto é ignorada (ex.: <article> de um card)
+MIN_MAIN_CHARS = 200
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_HREF_RE = re.compile(r"""<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+Extractor = Callable[[str], str]
+
+
+def _join_blocks(blocks: List[str]) -> str:
+    return "\n".join(blocks)
+
+
+class _BlockCollector:
+    """Accumulates inline text pieces and emits normalized blocks."""
+
+    __slots__ = ("blocks", "pieces", "chars")
+
+    def __init__(self):
+        self.blocks: List[str] = []
+        self.pieces: List[str] = []
+        self.chars = 0
+
+    def add(self, text: str) -> None:
+        self.pieces.append(text)
+
+    def flush(self) -> None:
+        if self.pieces:
+            block = _WHITESPACE_RE.sub(" ", "".join(self.pieces)).strip()
+            self.pieces = []
+            if block:
+                self.blocks.append(block)
+                self.chars += len(block)
+
+
+# --------------------------------------------------------------------------- #
+#                                  STDLIB                                     #
+# --------------------------------------------------------------------------- #
+class _StdlibExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.page = _BlockCollector()         # todo o texto fora de SKIP_TAGS
+        self.main = _BlockCollector()         # só o texto da região principal
+        # SKIP_TAGS abertas; o fim de uma fecha também as internas sem fim (<option> sem </option>)
+        self.skip_stack: List[str] = []
+        # (tag, profundidade dessa tag) de cada região principal aberta: o </div> que
+        # fecha um <div role="main"> é o da mesma profundidade, não o de um div interno
+        self.main_stack: List[Tuple[str, int]] = []
+        self.open_tags: Dict[str, int] = {}
+
+    @property
+    def skip_depth(self) -> int:
+        return len(self.skip_stack)
+
+    @property
+    def main_depth(self) -> int:
+        return len(self.main_stack)
+
+    def _flush(self) -> None:
+        self.page.flush()
+        if self.main_depth:
+            self.main.flush()
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self.skip_stack.append(tag)
+            return
+        if self.skip_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        elif tag in CELL_TAGS:
+            self.handle_data(" ")
+        if tag in VOID_TAGS:
+            return
+        depth = self.open_tags[tag] = self.open_tags.get(tag, 0) + 1
+        if tag in MAIN_TAGS or ("role", "main") in attrs:
+            self.main_stack.append((tag, depth))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIP_TAGS:
+            if tag in self.skip_stack:
+                index = len(self.skip_stack) - 1 - self.skip_stack[::-1].index(tag)
+                del self.skip_stack[index:]
+            return
+        if self.skip_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        depth = self.open_tags.get(tag, 0)
+        if not depth:
+            return                            # fechamento sem abertura
+        if (tag, depth) in self.main_stack:
+            # fecha também regiões internas que ficaram sem fechamento
+            self.main.flush()
+            del self.main_stack[self.main_stack.index((tag, depth)):]
+        self.open_tags[tag] = depth - 1
+
+    def handle_data(self, data: str) -> None:
+        if self.skip_depth:
+            return
+        self.page.add(data)
+        if self.main_depth:
+            self.main.add(data)
+
+    def result(self) -> str:
+        self.close()
+        self.page.flush()
+        self.main.flush()
+        collector = self.main if self.main.chars >= MIN_MAIN_CHARS else self.page
+        return _join_blocks(collector.blocks)
+
+
+def extract_stdlib(html: str) -> str:
+    parser = _StdlibExtractor()
+    parser.feed(html)
+    return parser.result()
+
+
+# --------------------------------------------------------------------------- #
+#                                   LXML                                      #
+# --------------------------------------------------------------------------- #
+def _walk(element, collector: _BlockCollector) -> None:
+    tag = element.tag if isinstance(element.tag, str) else None   # comentários / PIs
+    if tag in SKIP_TAGS:
+        if element.tail:
+            collector.add(element.tail)
+        return
+    block = tag in BLOCK_TAGS
+    if block:
+        collector.flush()
+    elif tag in CELL_TAGS:
+        collector.add(" ")
+    if tag is not None and element.text:
+        collector.add(element.text)
+    for child in element:
+        _walk(child, collector)
+    if block:
+        collector.flush()
+    if element.tail:
+        collector.add(element.tail)
+
+
+def _lxml_document(html: str):
+    return _lxml_html.document_fromstring(html.encode("utf-8"), parser=_LXML_PARSER)
+
+
+def extract_lxml(html: str) -> str:
+    if _lxml_html is None:
+        raise RuntimeError("lxml is not installed")
+    try:
+        root = _lxml_document(html)
+    except (_lxml_etree.ParserError, ValueError):
+        return ""
+    for candidate in root.xpath('//main | //article | //*[@role="main"]'):
+        collector = _BlockCollector()
+        candidate_tail, candidate.tail = candidate.tail, None     # o texto depois da região não conta
+        _walk(candidate, collector)
+        candidate.tail = candidate_tail
+        collector.flush()
+        if collector.chars >= MIN_MAIN_CHARS:
+            return _join_blocks(collector.blocks)
+    body = root.find("body")
+    collector = _BlockCollector()
+    _walk(body if body is not None else root, collector)
+    collector.flush()
+    return _join_blocks(collector.blocks)
+
+
+# --------------------------------------------------------------------------- #
+#                              BS4 (ORIGINAL)                                 #
+# --------------------------------------------------------------------------- #
+def extract_bs4(html: str) -> str:
+    """The scraper's original extraction: whole page, blocks joined by spaces."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return " ".join(chunk for chunk in chunks if chunk)
+
+
+EXTRACTORS: Dict[str, Extractor] = {
+    "lxml": extract_lxml,
+    "stdlib": extract_stdlib,
+    "bs4": extract_bs4,
+}
+
+
+def available_extractors() -> List[str]:
+    return [name for name in EXTRACTORS if name != "lxml" or _lxml_html is not None]
+
+
+def get_extractor(name: Optional[str] = None) -> Extractor:
+    """Extractor ``name`` (or ``HTML_EXTRACTOR``); lxml falls back to stdlib when missing."""
+    name = (name or os.getenv("HTML_EXTRACTOR") or "lxml").lower()
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor: {name}")
+    if name == "lxml" and _lxml_html is None:
+        logger.info("lxml not installed, using the stdlib HTML extractor")
+        name = "stdlib"
+    return EXTRACTORS[name]
+
+
+def extract_links(html: str) -> List[str]:
+    """``href`` of every ``<a>`` tag (raw, not resolved or deduplicated)."""
+    if _lxml_html is not None:
+        try:
+            root = _lxml_document(html)
+            return [str(href) for href in root.xpath("//a/@href")]
+        except (_lxml_etree.ParserError, ValueError):
+            return []
+    return [_html.unescape(next(g for g in match.groups() if g is not None)) for match in _HREF_RE.finditer(html)]
@@ -0,0 +1,168 @@
+"""Lightweight in-process intent classifier used as a fast path before the LLM.
+
+Features are hashed word 1-2-grams and character 3-5-grams (accent-folded),
+fed to a binary logistic regression trained with SGD on a labeled JSONL file
+(``{"text": ..., "intent": "abrir_empresa" | "geral"}``).
+
+Offline report (cross-validated accuracy, fallback rate per threshold and
+prediction latency):
+
+    python -m utils.intent_classifier --report [--data data/intent_examples.jsonl]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.search_index import fold_accents
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_PATH = os.path.join("data", "intent_examples.jsonl")
+POSITIVE_LABEL = "abrir_empresa"
+NEGATIVE_LABEL = "geral"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def word_count(text: str) -> int:
+    return len(_WORD_RE.findall(text))
+
+
+def hashed_features(text: str, n_features: int = 2 ** 18) -> Dict[int, float]:
+    """L2-normalized sparse vector of hashed word and character n-grams."""
+    words = _WORD_RE.findall(fold_accents(text))
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        for n in (3, 4, 5):
+            grams += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+
+    vector: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode()) % n_features   # crc32: estável entre processos
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {i: v / norm for i, v in vector.items()}
+
+
+class IntentClassifier:
+    """Binary logistic regression over hashed n-gram features."""
+
+    def __init__(self, n_features: int = 2 ** 18):
+        self.n_features = n_features
+        self.weights: Dict[int, float] = {}
+        self.bias = 0.0
+
+    def _score(self, features: Dict[int, float]) -> float:
+        z = self.bias + sum(self.weights.get(i, 0.0) * v for i, v in features.items())
+        return 1.0 / (1.0 + math.exp(-max(min(z, 35.0), -35.0)))
+
+    def fit(
+        self,
+        examples: Sequence[Tuple[str, str]],
+        epochs: int = 40,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 13,
+    ) -> "IntentClassifier":
+        data = [(hashed_features(text, self.n_features), 1.0 if label == POSITIVE_LABEL else 0.0)
+                for text, label in examples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for features, target in data:
+                gradient = self._score(features) - target
+                for i, v in features.items():
+                    w = self.weights.get(i, 0.0)
+                    self.weights[i] = w - learning_rate * (gradient * v + l2 * w)
+                self.bias -= learning_rate * gradient
+        return self
+
+    def predict_proba(self, text: str) -> float:
+        """Probability that ``text`` is about opening a company."""
+        return self._score(hashed_features(text, self.n_features))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(label, confidence) where confidence is the probability of the chosen label."""
+        p = self.predict_proba(text)
+        return (POSITIVE_LABEL, p) if p >= 0.5 else (NEGATIVE_LABEL, 1.0 - p)
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["text"], row["intent"]))
+    return examples
+
+
+@lru_cache(maxsize=None)
+def get_intent_classifier(path: Optional[str] = None) -> Optional[IntentClassifier]:
+    """Classifier trained on ``path`` (once per process); None when there is no data file."""
+    path = path or os.getenv("INTENT_EXAMPLES_PATH", DEFAULT_DATA_PATH)
+    try:
+        examples = load_examples(path)
+    except FileNotFoundError:
+        logger.warning(f"Intent examples not found at {path}, fast path disabled")
+        return None
+    started = time.perf_counter()
+    classifier = IntentClassifier().fit(examples)
+    logger.info(f"Intent classifier trained on {len(examples)} examples "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return classifier
+
+
+# --------------------------------------------------------------------------- #
+#                              OFFLINE REPORT                                 #
+# --------------------------------------------------------------------------- #
+def report(path: str, folds: int = 5, thresholds: Sequence[float] = (0.6, 0.7, 0.8, 0.85, 0.9, 0.95)) -> None:
+    examples = load_examples(path)
+    random.Random(7).shuffle(examples)
+    predictions: List[Tuple[str, str, float]] = []   # (gold, predicted, confidence)
+    latencies: List[float] = []
+
+    for k in range(folds):
+        test = examples[k::folds]
+        train = [e for i, e in enumerate(examples) if i % folds != k]
+        classifier = IntentClassifier().fit(train)
+        for text, gold in test:
+            started = time.perf_counter()
+            label, confidence = classifier.predict(text)
+            latencies.append(time.perf_counter() - started)
+            predictions.append((gold, label, confidence))
+
+    accuracy = sum(g == p for g, p, _ in predictions) / len(predictions)
+    latencies.sort()
+    print(f"{len(examples)} examples, {folds}-fold cross-validation")
+    print(f"overall accuracy: {accuracy:.1%}")
+    print(f"latency per prediction: p50 {latencies[len(latencies) // 2] * 1e6:.0f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+    print(f"\n{'threshold':>9} {'fast-path':>9} {'fallback':>9} {'fast-path acc':>13}")
+    for threshold in thresholds:
+        confident = [(g, p) for g, p, c in predictions if c >= threshold]
+        fast_accuracy = (sum(g == p for g, p in confident) / len(confident)) if confident else float("nan")
+        print(f"{threshold:>9.2f} {len(confident) / len(predictions):>9.1%} "
+              f"{1 - len(confident) / len(predictions):>9.1%} {fast_accuracy:>13.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intent classifier offline report")
+    parser.add_argument("--report", action="store_true", help="print cross-validated accuracy/latency")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+    if args.report:
+        report(args.data, args.folds)
+    else:
+        parser.print_help()
@@ -0,0 +1,202 @@
+"""Incremental decoder for the JSON object the WelcomeAgent LLM returns."""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# Eventos devolvidos por feed():
+#   ("delta", key, text)  -> mais texto do valor string de ``key``
+#   ("field", key, value) -> valor de ``key`` completo
+Event = Tuple[str, str, Any]
+
+_END = object()  # marca o fim de um valor string
+
+
+class IncrementalJSONParser:
+    """Character-level parser for a JSON object fed chunk by chunk.
+
+    Top-level string values are reported as deltas while they are still
+    being generated, and every field is reported as soon as its value is
+    complete, so callers can act on ``intent`` before ``response`` has been
+    fully generated. Nested objects/arrays are reported as one field once
+    closed. Text before the opening brace (e.g. a ```json fence) is
+    ignored. ``close()`` never raises: whatever was decoded is kept.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.fields: Dict[str, Any] = {}
+        self.partial: Dict[str, str] = {}
+        # start | key_wait | key | colon | value_wait | string | scalar | nested | after_value | done
+        self._state = "start"
+        self._key = ""
+        self._buffer: List[str] = []
+        self._escape: Optional[str] = None   # None, "" after a backslash, or hex digits of \\uXXXX
+        self._high_surrogate = ""            # \\uD83D... esperando a segunda metade do par
+        self._depth = 0                      # objetos/arrays abertos dentro de um valor aninhado
+        self._nested_string = False          # dentro de uma string de um valor aninhado
+
+    def feed(self, chunk: str) -> List[Event]:
+        self.raw += chunk
+        events: List[Event] = []
+        delta: List[str] = []
+
+        def flush_delta():
+            if delta:
+                text = "".join(delta)
+                self.partial[self._key] = self.partial.get(self._key, "") + text
+                events.append(("delta", self._key, text))
+                delta.clear()
+
+        for ch in chunk:
+            state = self._state
+            if state == "start":
+                if ch == "{":
+                    self._state = "key_wait"
+            elif state == "key_wait":
+                if ch == '"':
+                    self._state, self._buffer = "key", []
+                elif ch == "}":
+                    self._state = "done"
+            elif state == "key":
+                if self._escape is not None:
+                    self._buffer.append(_ESCAPES.get(ch, ch))
+                    self._escape = None
+                elif ch == "\\":
+                    self._escape = ""
+                elif ch == '"':
+                    self._key, self._state = "".join(self._buffer), "colon"
+                else:
+                    self._buffer.append(ch)
+            elif state == "colon":
+                if ch == ":":
+                    self._state = "value_wait"
+            elif state == "value_wait":
+                if ch == '"':
+                    self._state, self._buffer = "string", []
+                elif ch in "{[":
+                    self._state, self._buffer = "nested", [ch]
+                    self._depth, self._nested_string = 1, False
+                elif not ch.isspace():
+                    self._state, self._buffer = "scalar", [ch]
+            elif state == "string":
+                decoded = self._decode_string_char(ch)
+                if decoded is _END and self._high_surrogate:
+                    # par incompleto no fim da string: fica solto, como no json.loads
+                    self._buffer.append(self._high_surrogate)
+                    delta.append(self._high_surrogate)
+                    self._high_surrogate = ""
+                if decoded is _END:
+                    flush_delta()
+                    value = "".join(self._buffer)
+                    self.fields[self._key] = value
+                    self.partial.pop(self._key, None)
+                    events.append(("field", self._key, value))
+                    self._state = "after_value"
+                elif decoded:
+                    self._buffer.append(decoded)
+                    delta.append(decoded)
+            elif state == "scalar":
+                if ch in ",}":
+                    value = self._scalar("".join(self._buffer).strip())
+                    self.fields[self._key] = value
+                    events.append(("field", self._key, value))
+                    self._state = "key_wait" if ch == "," else "done"
+                else:
+                    self._buffer.append(ch)
+            elif state == "nested":
+                self._buffer.append(ch)
+                if self._nested_end(ch):
+                    value = self._scalar("".join(self._buffer))
+                    self.fields[self._key] = value
+                    events.append(("field", self._key, value))
+                    self._state = "after_value"
+            elif state == "after_value":
+                if ch == ",":
+                    self._state = "key_wait"
+                elif ch == "}":
+                    self._state = "done"
+        flush_delta()
+        return events
+
+    def _nested_end(self, ch: str) -> bool:
+        """Track brackets of a nested value (ignoring ones inside its strings); True when it closes."""
+        if self._nested_string:
+            if self._escape is not None:
+                self._escape = None
+            elif ch == "\\":
+                self._escape = ""
+            elif ch == '"':
+                self._nested_string = False
+        elif ch == '"':
+            self._nested_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            return self._depth == 0
+        return False
+
+    def _decode_string_char(self, ch: str):
+        """Decoded text for ``ch`` inside a string, "" while inside an escape, or _END.
+
+        A high surrogate (``\\ud83d``) is held back until the low half arrives,
+        so a delta never ends in half of a character.
+        """
+        if self._escape is None:
+            if ch == "\\":
+                self._escape = ""
+                return ""
+            if ch == '"':
+                return _END
+            pending, self._high_surrogate = self._high_surrogate, ""
+            return pending + ch
+        if self._escape == "" and ch != "u":
+            self._escape = None
+            pending, self._high_surrogate = self._high_surrogate, ""
+            return pending + _ESCAPES.get(ch, ch)
+        self._escape += ch
+        if len(self._escape) < 5:        # "u" + 4 hex digits
+            return ""
+        code, self._escape = self._escape[1:], None
+        try:
+            value = int(code, 16)
+        except ValueError:
+            return ""
+        pending, self._high_surrogate = self._high_surrogate, ""
+        if pending and 0xDC00 <= value <= 0xDFFF:
+            high = ord(pending)
+            return chr(0x10000 + ((high - 0xD800) << 10) + (value - 0xDC00))
+        if 0xD800 <= value <= 0xDBFF:
+            self._high_surrogate = chr(value)
+            return pending
+        return pending + chr(value)
+
+    @staticmethod
+    def _scalar(token: str) -> Any:
+        try:
+            return json.loads(token)
+        except ValueError:
+            return token
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def close(self) -> Dict[str, Any]:
+        """Final object: strict ``json.loads`` when valid, else the fields recovered so far.
+
+        A string value cut off mid-generation is returned with the text
+        decoded up to that point.
+        """
+        try:
+            data = json.loads(_FENCE_RE.sub("", self.raw))
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+        recovered = dict(self.partial)
+        recovered.update(self.fields)
+        return recovered
@@ -0,0 +1,124 @@
+"""Construção e compartilhamento dos clientes LLM por provedor.
+
+Os SDKs dos provedores são importados só quando o provedor é usado pela
+primeira vez: um deploy que usa apenas Groq não paga o import do OpenAI
+(e vice-versa) no cold start.
+"""
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SHARED_LLMS: Dict[Tuple[Optional[str], ...], object] = {}
+_SHARED_LOCK = threading.Lock()
+# provedores extras registrados por quem embute o chatbot (ex.: LLM offline dos testes)
+_EXTRA_PROVIDERS: Dict[str, Callable[[], object]] = {}
+
+
+def api_key_for(provider: str) -> Optional[str]:
+    return os.getenv(f"{provider.upper()}_API_KEY")
+
+
+def register_provider(name: str, factory: Callable[[], object]) -> None:
+    """Make ``factory()`` the chat model of provider ``name`` (tests, benchmarks)."""
+    with _SHARED_LOCK:
+        _EXTRA_PROVIDERS[name.lower()] = factory
+        # clientes já criados com o nome antigo não valem mais
+        for key in [k for k in _SHARED_LLMS if name.lower() in k]:
+            del _SHARED_LLMS[key]
+
+
+def create_llm(provider: str):
+    """New chat model client for ``provider`` (openai | groq | a registered one)."""
+    try:
+        provider = provider.lower()
+        if provider in _EXTRA_PROVIDERS:
+            logger.debug(f"Initializing registered LLM provider {provider}")
+            return _EXTRA_PROVIDERS[provider]()
+        if provider == "openai":
+            logger.debug("Initializing OpenAI LLM (gpt‑4o-mini)")
+            from langchain_openai import ChatOpenAI
+
+            return ChatOpenAI(
+                model="gpt-4o-mini",
+                temperature=0,
+                api_key=api_key_for(provider),
+            )
+        if provider == "groq":
+            logger.debug("Initializing Groq LLM (llama3-70b-8192)")
+            from langchain_groq import ChatGroq
+
+            return ChatGroq(
+                model="llama3-70b-8192",          # modelo em produção no Groq
+                temperature=0,
+                api_key=api_key_for(provider),
+            )
+        raise ValueError(f"Unsupported provider: {provider}")
+    except Exception:
+        logger.error("Error initializing LLM", exc_info=True)
+        raise
+
+
+def hedge_provider_for(provider: str) -> Optional[str]:
+    """Second provider for hedged requests (``LLM_HEDGE_PROVIDER``), None when unset or equal."""
+    hedge = os.getenv("LLM_HEDGE_PROVIDER", "").strip().lower()
+    return hedge if hedge and hedge != provider.lower() else None
+
+
+def get_llm(provider: str):
+    """Process-wide client for ``provider``, shared by every agent and session.
+
+    Keyed by provider and current API key, so a key typed in the sidebar
+    gets its own client instead of reusing one built without it. With
+    ``LLM_HEDGE_PROVIDER`` set, the client is a ``HedgedChatModel`` that
+    falls back to / races the second provider.
+    """
+    provider = provider.lower()
+    hedge = hedge_provider_for(provider)
+    key = (provider, api_key_for(provider), hedge, api_key_for(hedge) if hedge else None)
+    with _SHARED_LOCK:
+        llm = _SHARED_LLMS.get(key)
+        if llm is None:
+            llm = create_llm(provider)
+            if hedge is not None:
+                from utils.provider_router import HedgedChatModel
+
+                logger.info(f"Hedging {provider} with {hedge}")
+                llm = HedgedChatModel(
+                    primary=llm,
+                    secondary=create_llm(hedge),
+                    primary_name=provider,
+                    secondary_name=hedge,
+                    hedge_after=float(os.getenv("LLM_HEDGE_AFTER", "1.5")),
+                    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                    cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+                )
+            _SHARED_LLMS[key] = llm
+        return llm
+
+
+def open_connection(llm) -> None:
+    """Open (and keep in the pool) the HTTP connection of an OpenAI/Groq client.
+
+    Sends one cheap ``models.list`` request so DNS, TCP and TLS setup happen
+    before the first user message. Errors are only logged. A hedged model
+    (``HedgedChatModel``) has no client of its own: both providers are warmed.
+    """
+    if hasattr(llm, "primary") and hasattr(llm, "secondary"):
+        open_connection(llm.primary)
+        open_connection(llm.secondary)
+        return
+    root = getattr(llm, "root_client", None) or getattr(getattr(llm, "client", None), "_client", None)
+    if root is None or not hasattr(root, "models"):
+        return
+    try:
+        root.with_options(timeout=5.0, max_retries=0).models.list()
+    except Exception as e:
+        logger.warning(f"LLM warm-up request failed: {e}")
+
+
+def clear_shared_llms() -> None:
+    with _SHARED_LOCK:
+        _SHARED_LLMS.clear()
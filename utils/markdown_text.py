@@ -0,0 +1,37 @@
+"""Escaping of chat text for ``st.markdown`` (display only; stored text stays raw).
+
+An unescaped ``$`` turns into a LaTeX formula in Streamlit's markdown
+("R$ 89 ... R$ 150"), so every ``$`` not already preceded by a backslash
+is escaped. ``StreamEscaper`` does the same over a token stream, where a
+backslash and the ``$`` it escapes may arrive in different tokens.
+"""
+import re
+from typing import Iterable, Iterator
+
+_DOLLAR_RE = re.compile(r"(?<!\\)\$")
+
+
+def escape_markdown(text: str) -> str:
+    return _DOLLAR_RE.sub(r"\\$", text)
+
+
+class StreamEscaper:
+    """``escape_markdown`` applied token by token, with the previous token's last character carried over."""
+
+    def __init__(self):
+        self._after_backslash = False
+
+    def feed(self, token: str) -> str:
+        if not token:
+            return token
+        escaped = escape_markdown(token)
+        if self._after_backslash and token.startswith("$"):
+            escaped = escaped[1:]                 # the previous token's trailing "\" already escapes this "$"
+        self._after_backslash = token.endswith("\\")
+        return escaped
+
+
+def escape_stream(tokens: Iterable[str]) -> Iterator[str]:
+    escaper = StreamEscaper()
+    for token in tokens:
+        yield escaper.feed(token)
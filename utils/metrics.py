@@ -0,0 +1,388 @@
+"""Latency histograms, counters and per-turn traces.
+
+Stages are timed with ``span("welcome.llm")``: each span feeds the
+``chatbot_stage_seconds{stage=...}`` histogram and, when a turn is being
+traced (``turn_trace()``), is also appended to that turn's ``TurnTrace`` so
+the UI can show where the time went. The current trace travels in a
+contextvar, so spans opened in graph nodes, asyncio tasks and
+``copy_context()`` threads all land in the same turn.
+
+Metrics are exported in the Prometheus text format: ``render_prometheus()``,
+``write_prometheus(path)`` (``METRICS_PATH``, rewritten from a background
+thread at most every ``METRICS_WRITE_INTERVAL`` seconds while turns run) or
+``start_metrics_server(port)`` (``METRICS_PORT``, serves ``/metrics``).
+"""
+import asyncio
+import atexit
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.context_packer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# segundos; cobre de um cache hit (~ms) a uma resposta longa da LLM
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# --------------------------------------------------------------------------- #
+#                                  METRICS                                    #
+# --------------------------------------------------------------------------- #
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_labels(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # por label: contagem por bucket (não cumulativa), soma, total
+        self._series: Dict[LabelKey, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(_labels(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kwargs: Any):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+TURN_SECONDS = REGISTRY.histogram("chatbot_turn_seconds", "End-to-end latency of a chat turn.")
+NODE_SECONDS = REGISTRY.histogram("chatbot_node_seconds", "Latency of each agent-graph node.")
+STAGE_SECONDS = REGISTRY.histogram("chatbot_stage_seconds", "Latency of each stage inside a turn.")
+FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "chatbot_llm_first_token_seconds", "Time from LLM request to its first streamed token.")
+CACHE_TOTAL = REGISTRY.counter("chatbot_cache_total", "Cache lookups by cache and result.")
+TOKENS_TOTAL = REGISTRY.counter("chatbot_llm_tokens_total", "Estimated LLM tokens by agent and kind.")
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def write_prometheus(path: str) -> None:
+    """Atomically rewrites ``path`` (e.g. for node_exporter's textfile collector)."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsFileWriter:
+    """Rewrites ``path`` in a daemon thread after turns end, at most once every ``interval`` seconds."""
+
+    def __init__(self, path: str, interval: float):
+        self.path = path
+        self.interval = interval
+        self._dirty = threading.Event()
+        threading.Thread(target=self._run, name="metrics-file", daemon=True).start()
+        atexit.register(self.flush)
+
+    def mark(self) -> None:
+        self._dirty.set()
+
+    def flush(self) -> None:
+        if self._dirty.is_set():
+            self._dirty.clear()
+            try:
+                write_prometheus(self.path)
+            except OSError:
+                logger.error(f"Could not write metrics to {self.path}", exc_info=True)
+
+    def _run(self) -> None:
+        while True:
+            self._dirty.wait()
+            self.flush()
+            time.sleep(self.interval)
+
+
+_WRITERS: Dict[str, _MetricsFileWriter] = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+def _metrics_file_writer(path: str) -> _MetricsFileWriter:
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(path)
+        if writer is None:
+            interval = float(os.getenv("METRICS_WRITE_INTERVAL", "10"))
+            writer = _WRITERS[path] = _MetricsFileWriter(path, interval)
+        return writer
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("metrics: " + format % args)
+
+
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves ``/metrics`` from a daemon thread; only one server per process."""
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_SERVER.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+        return _SERVER
+
+
+# --------------------------------------------------------------------------- #
+#                                  TRACES                                     #
+# --------------------------------------------------------------------------- #
+@dataclass
+class Span:
+    name: str
+    start: float                         # segundos desde o início do turno
+    duration: float = 0.0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class TurnTrace:
+    """Spans and counts of one turn, in the order they finished."""
+    started_at: float = field(default_factory=time.perf_counter)
+    total: Optional[float] = None
+    spans: List[Span] = field(default_factory=list)
+    counts: Dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def add_count(self, name: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0.0) + amount
+
+    def as_rows(self) -> List[Dict[str, Any]]:
+        """Spans as table rows for the UI (ms, ordered by start)."""
+        return [
+            {"stage": s.name, "start_ms": round(s.start * 1000, 1), "ms": round(s.duration * 1000, 1),
+             **{k: v for k, v in s.attrs.items()}}
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+
+
+_CURRENT_TRACE: "contextvars.ContextVar[Optional[TurnTrace]]" = contextvars.ContextVar(
+    "chatbot_turn_trace", default=None)
+
+
+def current_trace() -> Optional[TurnTrace]:
+    return _CURRENT_TRACE.get()
+
+
+@contextmanager
+def turn_trace() -> Iterator[TurnTrace]:
+    """Traces one turn: spans opened inside (same context) are collected in the yielded trace."""
+    trace = TurnTrace()
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.total = time.perf_counter() - trace.started_at
+        TURN_SECONDS.observe(trace.total)
+        try:
+            _CURRENT_TRACE.reset(token)
+        except ValueError:        # gerador encerrado em outro contexto
+            _CURRENT_TRACE.set(None)
+        path = os.getenv("METRICS_PATH")
+        if path:
+            # o arquivo é reescrito pela thread do writer, fora do caminho da requisição
+            _metrics_file_writer(path).mark()
+
+
+@contextmanager
+def span(name: str, histogram: Histogram = STAGE_SECONDS, **attrs: Any) -> Iterator[Span]:
+    """Times a block as stage ``name``; ``attrs`` (and ones set on the span) go to the trace only."""
+    started = time.perf_counter()
+    trace = _CURRENT_TRACE.get()
+    current = Span(name, started - trace.started_at if trace is not None else 0.0, attrs=dict(attrs))
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - started
+        histogram.observe(current.duration, **({"node": name} if histogram is NODE_SECONDS else {"stage": name}))
+        if trace is not None:
+            trace.add_span(current)
+
+
+def count(name: str, amount: float = 1.0) -> None:
+    """Adds to a per-turn count shown in the trace (no Prometheus series)."""
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_count(name, amount)
+
+
+def cache_result(cache: str, hit: bool) -> None:
+    result = "hit" if hit else "miss"
+    CACHE_TOTAL.inc(cache=cache, result=result)
+    count(f"{cache}_cache_{result}")
+
+
+def llm_tokens(agent: str, prompt: int = 0, completion: int = 0) -> None:
+    if prompt:
+        TOKENS_TOTAL.inc(prompt, agent=agent, kind="prompt")
+        count("prompt_tokens", prompt)
+    if completion:
+        TOKENS_TOTAL.inc(completion, agent=agent, kind="completion")
+        count("completion_tokens", completion)
+
+
+class LLMCall:
+    """Handle yielded by ``llm_span``: feed it the streamed chunks and the final output."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_seconds: Optional[float] = None
+        self.output = ""
+
+    def token(self, text: str) -> None:
+        if self.first_token_seconds is None and text:
+            self.first_token_seconds = time.perf_counter() - self.started
+
+
+@contextmanager
+def llm_span(agent: str, prompt_tokens: int = 0) -> Iterator[LLMCall]:
+    """``<agent>.llm`` span plus first-token latency and (estimated) token counters."""
+    call = LLMCall()
+    with span(f"{agent}.llm") as current:
+        try:
+            yield call
+        finally:
+            if call.first_token_seconds is not None:
+                FIRST_TOKEN_SECONDS.observe(call.first_token_seconds, agent=agent)
+                current.attrs["first_token_ms"] = round(call.first_token_seconds * 1000, 1)
+            completion = count_tokens(call.output) if call.output else 0
+            llm_tokens(agent, prompt_tokens, completion)
+            current.attrs.update(prompt_tokens=prompt_tokens, completion_tokens=completion)
+
+
+def timed_node(name: str, fn: Callable) -> Callable:
+    """Wraps a graph node (sync or async) in a ``chatbot_node_seconds`` span."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name, NODE_SECONDS):
+                return await fn(*args, **kwargs)
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with span(name, NODE_SECONDS):
+            return fn(*args, **kwargs)
+    return wrapper
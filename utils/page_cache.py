@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class CachedPage:
+    """A fetched page plus the text already extracted from it."""
+    url: str
+    html: str
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    validated_at: float = 0.0  # time.monotonic() of the last fetch or 304
+    version: str = field(init=False)  # content hash, used to key derived data (search index)
+
+    def __post_init__(self):
+        self.version = hashlib.sha1(self.html.encode()).hexdigest()[:12]
+
+
+class PageCache:
+    """Size-bounded LRU cache of pages with a freshness TTL.
+
+    Entries older than ``ttl`` are not dropped: they are kept as stale so the
+    scraper can revalidate them with a conditional GET (ETag/Last-Modified).
+    The scraper is shared by every session thread, so the counters are only
+    updated under the lock.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0            # served from memory, no network
+        self.revalidations = 0   # served from memory after a 304
+        self.misses = 0          # full download + extraction
+        self.evictions = 0
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Return the entry for ``url`` (fresh or stale) and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def lookup(self, url: str) -> Tuple[Optional[CachedPage], bool]:
+        """``(entry, fresh)`` for ``url``; a fresh entry counts as a hit."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None, False
+            self._entries.move_to_end(url)
+            fresh = self.is_fresh(entry)
+            if fresh:
+                self.hits += 1
+            return entry, fresh
+
+    def is_fresh(self, entry: CachedPage) -> bool:
+        return time.monotonic() - entry.validated_at < self.ttl
+
+    def put(self, entry: CachedPage) -> None:
+        """Store a freshly downloaded page (counted as a miss)."""
+        entry.validated_at = time.monotonic()
+        with self._lock:
+            self.misses += 1
+            self._entries[entry.url] = entry
+            self._entries.move_to_end(entry.url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def mark_revalidated(self, entry: CachedPage) -> None:
+        """Reset the TTL of an entry the server confirmed with a 304."""
+        with self._lock:
+            self.revalidations += 1
+            entry.validated_at = time.monotonic()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,423 @@
+"""Hedged requests and failover between two chat model providers.
+
+``HedgedChatModel`` streams from a lead provider; if no token arrives within
+the hedge delay (or the lead fails before its first token), the same
+request is sent to the other provider and whichever produces a token first
+wins; the loser is cancelled. Each provider keeps rolling first-token
+latency (p50/p99) and error-rate stats, and a circuit breaker that takes a
+failing provider out of the lead position for ``cooldown`` seconds.
+
+Once both providers have ``min_latency_samples`` first-token samples, the
+one with the lower p50 leads, and the hedge fires at the lead's p99
+(capped at ``hedge_after``) instead of the fixed ``hedge_after``.
+
+Enabled through ``get_llm`` when ``LLM_HEDGE_PROVIDER`` names a second
+provider (see ``utils.llm_factory``).
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from utils.response_cache import model_name
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """Rolling first-token latency / error window plus a circuit breaker for one provider."""
+
+    def __init__(
+        self,
+        window: int = 200,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        max_error_rate: float = 0.5,
+        min_samples: int = 20,
+    ):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)        # True = erro
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.requests = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.wins += 1
+
+    def record_first_token(self, latency: float) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures = 0
+            if self.opened_at is not None:
+                # sonda após o cooldown deu certo: fecha e recomeça a janela de erros
+                logger.info("Circuit breaker closed")
+                self.opened_at = None
+                self.outcomes.clear()
+
+    def record_error(self) -> None:
+        """Opens the breaker after ``failure_threshold`` consecutive errors or an
+        error rate of ``max_error_rate`` over at least ``min_samples`` requests."""
+        with self._lock:
+            self.outcomes.append(True)
+            self.consecutive_failures += 1
+            error_rate = sum(self.outcomes) / len(self.outcomes)
+            if (
+                self.consecutive_failures >= self.failure_threshold
+                or (len(self.outcomes) >= self.min_samples and error_rate >= self.max_error_rate)
+            ):
+                if self.opened_at is None:
+                    logger.warning(f"Circuit breaker opened (error rate {error_rate:.0%})")
+                self.opened_at = time.monotonic()
+
+    def available(self) -> bool:
+        """Closed breaker, or open for longer than ``cooldown`` (half-open: the next
+        request probes the provider and a single failure opens it again)."""
+        with self._lock:
+            return self.opened_at is None or time.monotonic() - self.opened_at >= self.cooldown
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """First-token latency percentile; None with fewer than ``min_samples`` samples."""
+        with self._lock:
+            if not self.latencies or len(self.latencies) < min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, wins = self.requests, self.wins
+        return {
+            "requests": requests,
+            "wins": wins,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "error_rate": self.error_rate,
+            "circuit_open": not self.available(),
+        }
+
+
+class HedgedChatModel(BaseChatModel):
+    """Chat model that hedges a primary provider with a secondary one."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    primary: BaseChatModel
+    secondary: BaseChatModel
+    primary_name: str = "primary"
+    secondary_name: str = "secondary"
+    hedge_after: float = 1.5
+    failure_threshold: int = 5
+    cooldown: float = 30.0
+    max_error_rate: float = 0.5
+    min_latency_samples: int = 20
+    model_name: str = Field(default="")
+
+    _stats: Dict[str, ProviderStats] = PrivateAttr(default_factory=dict)
+    _counters: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _counters_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._stats = {
+            name: ProviderStats(
+                failure_threshold=self.failure_threshold,
+                cooldown=self.cooldown,
+                max_error_rate=self.max_error_rate,
+            )
+            for name in (self.primary_name, self.secondary_name)
+        }
+        self._counters = {"requests": 0, "hedged": 0, "failovers": 0}
+        if not self.model_name:
+            self.model_name = f"{model_name(self.primary)}|{model_name(self.secondary)}"
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-chat"
+
+    # ------------------------------------------------------------------ #
+    #                             ROUTING                                #
+    # ------------------------------------------------------------------ #
+    def _order(self) -> List[Tuple[str, BaseChatModel]]:
+        """[(lead), (hedge)]: a provider with an open breaker is only used when
+        both are open; otherwise the lower rolling p50 leads (the primary until
+        both have ``min_latency_samples`` samples)."""
+        primary = (self.primary_name, self.primary)
+        secondary = (self.secondary_name, self.secondary)
+        p_open = not self._stats[self.primary_name].available()
+        s_open = not self._stats[self.secondary_name].available()
+        if p_open and not s_open:
+            return [secondary]
+        if s_open and not p_open:
+            return [primary]
+        p50_primary = self._stats[self.primary_name].percentile(0.5, self.min_latency_samples)
+        p50_secondary = self._stats[self.secondary_name].percentile(0.5, self.min_latency_samples)
+        if p50_primary is not None and p50_secondary is not None and p50_secondary < p50_primary:
+            return [secondary, primary]
+        return [primary, secondary]
+
+    def _hedge_delay(self, lead: str) -> float:
+        """Seconds to wait for the lead's first token: its rolling p99, at most ``hedge_after``."""
+        p99 = self._stats[lead].percentile(0.99, self.min_latency_samples)
+        return self.hedge_after if p99 is None else min(self.hedge_after, p99)
+
+    def _record_losers(self, winner: str, started: Dict[str, float]) -> None:
+        """A provider cancelled before its first token gets the time it had as a
+        (lower-bound) latency sample, so a lead that keeps losing hedges loses the lead."""
+        now = time.perf_counter()
+        for name, started_at in started.items():
+            if name != winner:
+                self._stats[name].record_first_token(now - started_at)
+
+    def _count(self, counter: str) -> None:
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus rolling latency/error stats per provider."""
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {**counters, **{name: s.snapshot() for name, s in self._stats.items()}}
+
+    # ------------------------------------------------------------------ #
+    #                               SYNC                                 #
+    # ------------------------------------------------------------------ #
+    def _run_thread(
+        self,
+        name: str,
+        llm: BaseChatModel,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        kwargs: Dict[str, Any],
+        out: "queue.Queue[Tuple[str, str, Any]]",
+        cancel: threading.Event,
+    ) -> None:
+        stats = self._stats[name]
+        stats.record_request()
+        started = time.perf_counter()
+        first = True
+        try:
+            for chunk in llm.stream(messages, stop=stop, **kwargs):
+                if cancel.is_set():
+                    return               # perdeu a corrida: fecha o stream (e a conexão)
+                if first:
+                    stats.record_first_token(time.perf_counter() - started)
+                    first = False
+                out.put(("chunk", name, chunk))
+            stats.record_success()
+            out.put(("end", name, None))
+        except Exception as e:
+            if not cancel.is_set():
+                stats.record_error()
+            out.put(("error", name, e))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._count("requests")
+        order = self._order()
+        hedge_delay = self._hedge_delay(order[0][0])
+        out: "queue.Queue[Tuple[str, str, Any]]" = queue.Queue()
+        cancels: Dict[str, threading.Event] = {}
+
+        started: Dict[str, float] = {}
+
+        def start(index: int) -> None:
+            name, llm = order[index]
+            started[name] = time.perf_counter()
+            cancels[name] = threading.Event()
+            threading.Thread(
+                target=self._run_thread, args=(name, llm, messages, stop, kwargs, out, cancels[name]),
+                name=f"hedge-{name}", daemon=True,
+            ).start()
+
+        start(0)
+        deadline = time.monotonic() + hedge_delay
+        winner: Optional[str] = None
+        try:
+            while True:
+                hedge_pending = len(cancels) < len(order)
+                timeout = max(0.0, deadline - time.monotonic()) if hedge_pending and winner is None else None
+                try:
+                    kind, name, payload = out.get(timeout=timeout)
+                except queue.Empty:
+                    logger.info(f"No token from {order[0][0]} after {hedge_delay:.2f}s, hedging")
+                    self._count("hedged")
+                    start(1)
+                    continue
+                if winner is not None and name != winner:
+                    continue
+                if kind == "error":
+                    if winner is not None:
+                        raise payload        # falhou no meio da resposta: não dá para trocar
+                    logger.warning(f"Provider {name} failed before first token: {payload}")
+                    cancels[name].set()
+                    if hedge_pending:
+                        self._count("failovers")
+                        start(1)
+                    elif all(c.is_set() for c in cancels.values()):
+                        raise payload
+                    continue
+                if winner is None:
+                    winner = name
+                    self._stats[name].record_win()
+                    # quem já falhou (cancel setado) não vira amostra de latência
+                    self._record_losers(name, {n: t for n, t in started.items() if not cancels[n].is_set()})
+                    for other, cancel in cancels.items():
+                        if other != name:
+                            cancel.set()
+                if kind == "end":
+                    return
+                chunk = ChatGenerationChunk(message=payload)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            for cancel in cancels.values():
+                cancel.set()
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = "".join(chunk.text for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    # ------------------------------------------------------------------ #
+    #                               ASYNC                                #
+    # ------------------------------------------------------------------ #
+    async def _run_task(
+        self,
+        name: str,
+        llm: BaseChatModel,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        kwargs: Dict[str, Any],
+        out: "asyncio.Queue[Tuple[str, str, Any]]",
+    ) -> None:
+        stats = self._stats[name]
+        stats.record_request()
+        started = time.perf_counter()
+        first = True
+        try:
+            async for chunk in llm.astream(messages, stop=stop, **kwargs):
+                if first:
+                    stats.record_first_token(time.perf_counter() - started)
+                    first = False
+                out.put_nowait(("chunk", name, chunk))
+            stats.record_success()
+            out.put_nowait(("end", name, None))
+        except Exception as e:
+            stats.record_error()
+            out.put_nowait(("error", name, e))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._count("requests")
+        order = self._order()
+        hedge_delay = self._hedge_delay(order[0][0])
+        out: "asyncio.Queue[Tuple[str, str, Any]]" = asyncio.Queue()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        started: Dict[str, float] = {}
+
+        def start(index: int) -> None:
+            name, llm = order[index]
+            started[name] = time.perf_counter()
+            tasks[name] = asyncio.ensure_future(self._run_task(name, llm, messages, stop, kwargs, out))
+
+        start(0)
+        deadline = time.monotonic() + hedge_delay
+        winner: Optional[str] = None
+        failed: set = set()
+        try:
+            while True:
+                hedge_pending = len(tasks) < len(order)
+                timeout = max(0.0, deadline - time.monotonic()) if hedge_pending and winner is None else None
+                try:
+                    kind, name, payload = await asyncio.wait_for(out.get(), timeout)
+                except asyncio.TimeoutError:
+                    logger.info(f"No token from {order[0][0]} after {hedge_delay:.2f}s, hedging")
+                    self._count("hedged")
+                    start(1)
+                    continue
+                if winner is not None and name != winner:
+                    continue
+                if kind == "error":
+                    if winner is not None:
+                        raise payload
+                    logger.warning(f"Provider {name} failed before first token: {payload}")
+                    failed.add(name)
+                    if hedge_pending:
+                        self._count("failovers")
+                        start(1)
+                    elif failed == set(tasks):
+                        raise payload
+                    continue
+                if winner is None:
+                    winner = name
+                    self._stats[name].record_win()
+                    self._record_losers(name, {n: t for n, t in started.items() if n not in failed})
+                    for other, task in tasks.items():
+                        if other != name:
+                            task.cancel()    # perdeu a corrida: cancela a requisição
+                if kind == "end":
+                    return
+                chunk = ChatGenerationChunk(message=payload)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        parts = [chunk.text async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(parts)))])
+
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from utils.search_index import fold_accents
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_message(message: str) -> str:
+    """Case, accent, punctuation and whitespace folding ("Como abrir empresa?" -> "como abrir empresa")."""
+    return " ".join(_PUNCTUATION_RE.sub(" ", fold_accents(message)).split())
+
+
+def prompt_version(prompt) -> str:
+    """Short hash of a prompt template; changes whenever the template text changes."""
+    return hashlib.sha256(prompt.pretty_repr().encode()).hexdigest()[:12]
+
+
+def model_name(llm) -> str:
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", "") or type(llm).__name__)
+
+
+def make_key(
+    agent: str,
+    provider: str,
+    model: str,
+    prompt_ver: str,
+    message: str,
+    context_version: str = "",
+    history: str = "",
+) -> str:
+    """Cache key; ``context_version`` ties answers to the website snapshot they used
+    and ``history`` (``chat_memory.history_digest``) to the conversation so far.
+
+    The agents' prompts include the conversation memory, so an answer is only
+    reused for the same question over the same memory. In practice hits come
+    from the first message of a session (empty memory), and from retries of a
+    turn; later turns of a conversation almost never hit.
+    """
+    parts = [agent, provider, model, prompt_ver, context_version, normalize_message(message)]
+    if history:
+        parts.append(history)
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of deterministic agent answers.
+
+    Always keeps an in-process LRU. When ``path`` is set, entries are also
+    stored in a SQLite file (WAL mode) so several Streamlit/API worker
+    processes share answers; a memory miss falls back to the file.
+    Entries never need explicit invalidation: prompt and website versions
+    are part of the key, and old keys age out through TTL and LRU. The file
+    is pruned every ``prune_every`` writes, not on each one.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl: float = 3600.0, path: Optional[str] = None, prune_every: int = 64
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.prune_every = prune_every
+        self._puts_since_prune = 0
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._open_db(path)
+
+    # ------------------------------------------------------------------ #
+    #                              DISK                                  #
+    # ------------------------------------------------------------------ #
+    def _open_db(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at)")
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        row = self._db.execute(
+            "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[1], json.loads(row[0])
+
+    def _disk_put(self, key: str, value: Dict[str, Any], expires_at: float, now: float) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+        )
+        self._puts_since_prune += 1
+        if self._puts_since_prune >= self.prune_every:
+            self._puts_since_prune = 0
+            self._disk_prune(now)
+
+    def _disk_prune(self, now: float) -> None:
+        """Drops expired rows and, above ``max_entries``, the least recently accessed."""
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count <= self.max_entries:
+            return
+        # só as linhas excedentes, pelo índice de accessed_at (sem ordenar a tabela toda)
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses"
+            " ORDER BY accessed_at LIMIT ?)",
+            (count - self.max_entries,),
+        )
+
+    # ------------------------------------------------------------------ #
+    #                               API                                  #
+    # ------------------------------------------------------------------ #
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._memory[key]
+                entry = None
+            if entry is None and self._db is not None:
+                try:
+                    entry = self._disk_get(key, now)
+                except sqlite3.Error:
+                    logger.error("Response cache read failed", exc_info=True)
+                if entry is not None:
+                    self._memory[key] = entry
+            if entry is None:
+                self.misses += 1
+                return None
+            self._memory.move_to_end(key)
+            self._trim()
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            self._trim()
+            if self._db is not None:
+                try:
+                    self._disk_put(key, value, expires_at, now)
+                except sqlite3.Error:
+                    logger.error("Response cache write failed", exc_info=True)
+
+    def _trim(self) -> None:
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory)}
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment; None when disabled."""
+    if os.getenv("RESPONSE_CACHE_ENABLED", "1") != "1":
+        return None
+    return ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        path=os.getenv("RESPONSE_CACHE_PATH") or None,
+    )
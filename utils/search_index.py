@@ -0,0 +1,95 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+# Stopwords do português (já sem acentos, pois são comparadas após fold_accents)
+PT_STOPWORDS = frozenset(
+    """
+    a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele
+    deles depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta
+    estao estas este estes eu foi foram ha isso isto ja la lhe lhes mais mas me mesmo meu
+    meus minha minhas muito na nao nas nem no nos nossa nossas nosso nossos num numa o os
+    ou para pela pelas pelo pelos por qual quando que quem se sem ser seu seus so sua suas
+    tambem te tem ter seja sao sobre tu tua tuas um uma umas uns voce voces vos pra pro
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip diacritics ("Abertura Grátis" -> "abertura gratis")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded terms without Portuguese stopwords and one-letter tokens."""
+    return [t for t in _TOKEN_RE.findall(fold_accents(text)) if len(t) > 1 and t not in PT_STOPWORDS]
+
+
+def split_passages(text: str, max_words: int = 60) -> List[str]:
+    """Split text into sentences, cutting sentences longer than ``max_words`` into windows."""
+    passages = []
+    for sentence in _SENTENCE_RE.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            passage = " ".join(words[start:start + max_words])
+            if passage:
+                passages.append(passage)
+    return passages
+
+
+class BM25Index:
+    """Inverted index over passages scored with Okapi BM25.
+
+    Built once per corpus version. A query only walks the postings of its own
+    terms, so its cost depends on the query, not on the number of passages.
+    """
+
+    def __init__(self, passages: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # passagens repetidas (menus, rodapés) são indexadas uma única vez
+        self.passages: List[str] = list(dict.fromkeys(p for p in passages if p.strip()))
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, passage in enumerate(self.passages):
+            terms = tokenize(passage)
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((doc_id, tf))
+
+        n_docs = len(self.passages)
+        self.avg_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str], **kwargs) -> "BM25Index":
+        return cls([p for text in texts for p in split_passages(text)], **kwargs)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-``k`` passages for ``query`` as (passage, score), best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        avg_length = self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.passages[doc_id], score) for doc_id, score in best]
+
+    def __len__(self) -> int:
+        return len(self.passages)
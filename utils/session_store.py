@@ -0,0 +1,250 @@
+"""Where conversation state (the LangGraph checkpoints, one thread per session) lives.
+
+By default sessions are kept in memory, which is enough for a single
+process (the Streamlit app): only the latest checkpoint of each session is
+kept, and sessions idle for ``SESSION_IDLE_TTL`` seconds (or beyond the
+``SESSION_MAX_THREADS`` most recent ones) are dropped. With
+``SESSION_DB_PATH`` set they go to a SQLite file in WAL mode instead, so
+several API worker processes behind a load balancer serve any session, and
+sessions survive restarts.
+
+``langgraph-checkpoint-sqlite`` ships a synchronous saver only; the async
+graph API (``ainvoke``/``astream``) gets the same saver with its calls run
+in a worker thread (local SQLite calls take well under a millisecond). The
+one connection is shared by those worker threads, so every call on it is
+serialized by the saver's ``conn_lock``.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:        # só necessário com SESSION_DB_PATH
+    SqliteSaver = None
+
+
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver that keeps only the latest checkpoint per thread and forgets idle threads.
+
+    The graph never reads older checkpoints (no time travel / history), so
+    they and their pending writes and channel blobs are dropped on each
+    ``put``. Threads unused for ``idle_ttl`` seconds, or beyond the
+    ``max_threads`` most recently used, are deleted.
+    """
+
+    def __init__(self, max_threads: int = 10000, idle_ttl: float = 86400.0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.idle_ttl = idle_ttl
+        self.evicted_threads = 0
+        self._lock = threading.RLock()
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        # blobs de cada thread, por namespace: a limpeza não percorre os blobs de todas as sessões
+        self._blob_keys: Dict[str, Dict[str, Set[Tuple[str, str, str, Any]]]] = defaultdict(
+            lambda: defaultdict(set))
+
+    def _touch(self, thread_id: str) -> None:
+        now = time.monotonic()
+        self._last_used[thread_id] = now
+        self._last_used.move_to_end(thread_id)
+        while self._last_used:
+            oldest, used_at = next(iter(self._last_used.items()))
+            if len(self._last_used) <= self.max_threads and now - used_at < self.idle_ttl:
+                break
+            self._drop_thread(oldest)
+            self.evicted_threads += 1
+
+    def _drop_thread(self, thread_id: str) -> None:
+        self._last_used.pop(thread_id, None)
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id in checkpoints:
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        for blob_keys in self._blob_keys.pop(thread_id, {}).values():
+            for blob_key in blob_keys:
+                self.blobs.pop(blob_key, None)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            # sessão desconhecida: não cria entradas vazias em self.storage
+            if thread_id not in self._last_used:
+                return None
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            for old_id in [i for i in checkpoints if i != checkpoint["id"]]:
+                del checkpoints[old_id]
+                self.writes.pop((thread_id, checkpoint_ns, old_id), None)
+            blob_keys = self._blob_keys[thread_id][checkpoint_ns]
+            blob_keys.update((thread_id, checkpoint_ns, k, v) for k, v in new_versions.items())
+            live = {(thread_id, checkpoint_ns, k, v) for k, v in checkpoint["channel_versions"].items()}
+            for key in blob_keys - live:
+                self.blobs.pop(key, None)
+            blob_keys &= live
+            self._touch(thread_id)
+            return saved
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
+
+if SqliteSaver is not None:
+    class ThreadedSqliteSaver(SqliteSaver):
+        """SqliteSaver that also serves the async graph API (calls run in a thread).
+
+        The connection is opened with ``check_same_thread=False`` and used from
+        whichever thread runs the call; ``conn_lock`` makes sure only one of
+        them touches it at a time, setup and whole reads included.
+        """
+
+        def __init__(self, conn: sqlite3.Connection, **kwargs: Any):
+            super().__init__(conn, **kwargs)
+            # RLock: setup() também é chamado de dentro das outras operações
+            self.conn_lock = threading.RLock()
+
+        def setup(self) -> None:
+            with self.conn_lock:
+                super().setup()
+
+        def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+            with self.conn_lock:
+                return super().get_tuple(config)
+
+        def list(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[Dict[str, Any]] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+        ) -> Iterator[CheckpointTuple]:
+            # materializado: um gerador parado no meio seguraria a conexão
+            with self.conn_lock:
+                items = [*super().list(config, filter=filter, before=before, limit=limit)]
+            return iter(items)
+
+        def put(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+        ) -> RunnableConfig:
+            with self.conn_lock:
+                return super().put(config, checkpoint, metadata, new_versions)
+
+        def put_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[Tuple[str, Any]],
+            task_id: str,
+            task_path: str = "",
+        ) -> None:
+            with self.conn_lock:
+                super().put_writes(config, writes, task_id, task_path)
+
+        def delete_thread(self, thread_id: str) -> None:
+            with self.conn_lock:
+                super().delete_thread(thread_id)
+
+        async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[Dict[str, Any]] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+        ) -> AsyncIterator[CheckpointTuple]:
+            items = await asyncio.to_thread(
+                lambda: [*self.list(config, filter=filter, before=before, limit=limit)])
+            for item in items:
+                yield item
+
+        async def aput(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+        ) -> RunnableConfig:
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[Tuple[str, Any]],
+            task_id: str,
+            task_path: str = "",
+        ) -> None:
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def open_sqlite_checkpointer(path: str) -> BaseCheckpointSaver:
+    """Checkpointer on the SQLite file ``path``, shared by every process that opens it."""
+    if SqliteSaver is None:
+        raise ImportError("SESSION_DB_PATH requires the langgraph-checkpoint-sqlite package")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+    # WAL: leituras de um worker não bloqueiam a escrita de outro
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    saver = ThreadedSqliteSaver(conn)
+    saver.setup()
+    logger.info(f"Session state stored in {path}")
+    return saver
+
+
+@lru_cache(maxsize=1)
+def get_session_checkpointer() -> BaseCheckpointSaver:
+    """Process-wide checkpointer: SQLite when ``SESSION_DB_PATH`` is set, else in memory."""
+    path = os.getenv("SESSION_DB_PATH")
+    if path:
+        return open_sqlite_checkpointer(path)
+    return BoundedMemorySaver(
+        max_threads=int(os.getenv("SESSION_MAX_THREADS", "10000")),
+        idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "86400")),
+    )
@@ -0,0 +1,203 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+While a call for ``key`` is running, other callers asking for the same key
+(from any thread, or any task of the same event loop) wait for it and get
+its result (or exception) instead of starting their own upstream call.
+Nothing is cached once the call finishes; that is the caches' job.
+
+``do_stream``/``ado_stream`` also fan out the events the call emits while
+it runs (e.g. LLM tokens): every caller receives them as they are produced,
+from the first one, instead of only the final result.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Emit = Callable[[Any], None]
+
+
+class _Call:
+    __slots__ = ("cond", "finished", "value", "error", "waiters", "events")
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.finished = False
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.events: List[Any] = []
+
+    def emit(self, event: Any) -> None:
+        with self.cond:
+            self.events.append(event)
+            self.cond.notify_all()
+
+
+class _AsyncCall:
+    """Call shared by the tasks of one event loop; ``task`` runs ``fn`` on its own."""
+
+    __slots__ = ("task", "events", "changed", "waiters")
+
+    def __init__(self):
+        self.task: Optional["asyncio.Task[Any]"] = None
+        self.events: List[Any] = []
+        self.changed = asyncio.Event()
+        self.waiters = 0
+
+    def emit(self, event: Any) -> None:
+        self.events.append(event)
+        self._wake()
+
+    def _wake(self, *_: Any) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """Group of coalesced calls; ``do``/``do_stream`` for threads, ``ado``/``ado_stream`` for coroutines."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Tuple[int, Hashable], _AsyncCall] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """(result of ``fn``, coalesced): ``coalesced`` is True when another caller ran it."""
+        return self.do_stream(key, lambda emit: fn())
+
+    def do_stream(
+        self, key: Hashable, fn: Callable[[Emit], T], on_event: Optional[Emit] = None
+    ) -> Tuple[T, bool]:
+        """``do`` for calls that publish events: ``fn(emit)`` runs once, and every
+        caller's ``on_event`` receives each ``emit``-ed event in order."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            delivered = 0
+            while True:
+                with call.cond:
+                    call.cond.wait_for(lambda: call.finished or len(call.events) > delivered)
+                    pending = call.events[delivered:]
+                    finished = call.finished
+                for event in pending:
+                    if on_event is not None:
+                        on_event(event)
+                delivered += len(pending)
+                if finished and delivered == len(call.events):
+                    break
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        def emit(event: Any) -> None:
+            call.emit(event)
+            if on_event is not None:
+                on_event(event)
+
+        try:
+            call.value = fn(emit)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            with call.cond:
+                call.finished = True
+                call.cond.notify_all()
+            if call.waiters:
+                logger.debug(f"single-flight {self.name}: {call.waiters} callers shared one call")
+        return call.value, False
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Async ``do``; coalesces callers running on the same event loop."""
+        return await self.ado_stream(key, lambda emit: fn())
+
+    async def ado_stream(
+        self, key: Hashable, fn: Callable[[Emit], Awaitable[T]], on_event: Optional[Emit] = None
+    ) -> Tuple[T, bool]:
+        """Async ``do_stream``. ``fn`` runs in its own task, which every caller
+        (the first one included) waits on: a cancelled caller leaves the others
+        unaffected, and the call is cancelled only when no caller is left
+        (e.g. a discarded speculative task that nobody else joined)."""
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        call = self._async_calls.get(loop_key)
+        if call is not None and call.waiters == 0:
+            call = None               # sem ninguém esperando, já foi cancelada
+        leader = call is None
+        if leader:
+            call = self._async_calls[loop_key] = _AsyncCall()
+
+            def forget(_: "asyncio.Task[Any]") -> None:
+                if self._async_calls.get(loop_key) is call:
+                    del self._async_calls[loop_key]
+
+            call.task = loop.create_task(fn(call.emit))
+            call.task.add_done_callback(call._wake)
+            call.task.add_done_callback(forget)
+        with self._lock:
+            if leader:
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        call.waiters += 1
+
+        delivered = 0
+        try:
+            while True:
+                pending = call.events[delivered:]
+                delivered += len(pending)
+                for event in pending:
+                    if on_event is not None:
+                        on_event(event)
+                if call.task.done() and delivered == len(call.events):
+                    break
+                if delivered == len(call.events):
+                    await call.changed.wait()
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+        if call.task.cancelled():
+            # só acontece se o próprio fn foi cancelado por fora; para quem espera é um erro
+            raise RuntimeError(f"single-flight {self.name}: shared call was cancelled")
+        return call.task.result(), not leader
+
+    def stats(self) -> Dict[str, int]:
+        """Upstream calls made and calls saved by coalescing."""
+        with self._lock:
+            return {"executions": self.executions, "coalesced": self.coalesced}
+
+
+_GROUPS: Dict[str, SingleFlight] = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+def get_flight_group(name: str) -> SingleFlight:
+    """Process-wide group shared by every session thread (e.g. "pages", "llm")."""
+    with _GROUPS_LOCK:
+        group = _GROUPS.get(name)
+        if group is None:
+            group = _GROUPS[name] = SingleFlight(name)
+        return group
+
+
+def flight_stats() -> Dict[str, Dict[str, int]]:
+    """``stats()`` of every group created so far."""
+    with _GROUPS_LOCK:
+        return {name: group.stats() for name, group in _GROUPS.items()}
@@ -0,0 +1,123 @@
+"""Offline chat model for tests and benchmarks (never a user-selectable provider).
+
+``register_fake_provider()`` injects it into ``utils.llm_factory`` under the
+name ``fake``, so code that builds agents by provider name (``AgentManager``,
+``server.py``, ``batch.py``) runs against it without any API.
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from utils.llm_factory import register_provider
+
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
+_OPENING_RE = re.compile(r"\b(abrir|abertura|cnpj|criar|montar|formalizar)\b", re.IGNORECASE)
+
+
+def default_responder(messages: List[BaseMessage]) -> str:
+    """Plausible answers for the two agents' prompts without calling any API."""
+    question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+    system = "\n".join(m.content for m in messages if isinstance(m, SystemMessage))
+    if '"intent"' in system:
+        intent = "abrir_empresa" if _OPENING_RE.search(question) else "geral"
+        return (
+            '{"intent": "%s", "response": "Resposta simulada da Contabilizei para: %s"}'
+            % (intent, question.replace('"', "'")[:200])
+        )
+    return f"Resposta simulada da Contabilizei para: {question}"
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Chat model that streams a canned answer with configurable latency.
+
+    ``first_token_latency`` is the delay before the first chunk and
+    ``tokens_per_second`` the pace of the following ones (0 = no delay).
+    """
+
+    model_name: str = "fake"
+    first_token_latency: float = 0.0
+    tokens_per_second: float = 0.0
+    responder: Callable[[List[BaseMessage]], str] = default_responder
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[str]:
+        return _CHUNK_RE.findall(self.responder(messages)) or [""]
+
+    def _delay(self, index: int) -> float:
+        if index == 0:
+            return self.first_token_latency
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for i, text in enumerate(self._chunks(messages)):
+            delay = self._delay(i)
+            if delay:
+                time.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for i, text in enumerate(self._chunks(messages)):
+            delay = self._delay(i)
+            if delay:
+                await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = "".join(chunk.text for chunk in self._stream(messages, stop, None, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        parts = [chunk.text async for chunk in self._astream(messages, stop, None, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(parts)))])
+
+
+def register_fake_provider(name: str = "fake") -> None:
+    """Register ``FakeStreamingChatModel`` as provider ``name``.
+
+    Latencies come from ``FAKE_LLM_FIRST_TOKEN_LATENCY`` and
+    ``FAKE_LLM_TOKENS_PER_SECOND`` (read when the client is created).
+    """
+    register_provider(name, lambda: FakeStreamingChatModel(
+        first_token_latency=float(os.getenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0")),
+        tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0")),
+    ))
@@ -0,0 +1,68 @@
+"""Local stand-in for contabilizei.com.br used by the tests and benchmarks.
+
+``build_site`` lays out the recorded pages of ``benchmarks/fixtures`` as a
+small site (home, pricing, one blog post, ``sitemap.xml``) and
+``start_server`` serves a directory from a background thread on a free
+port, so crawler, scraper and agents run against real HTTP without network.
+"""
+import glob
+import os
+import shutil
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "fixtures")
+
+# fixture -> caminho no site
+SITE_LAYOUT = {
+    "home.html": "index.html",
+    "pricing.html": "precos/index.html",
+    "blog_post.html": "blog/limite-faturamento-mei/index.html",
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def build_site(directory: str) -> List[str]:
+    """Copies the recorded pages into ``directory``; returns their URL paths."""
+    paths = []
+    for fixture, target in SITE_LAYOUT.items():
+        destination = os.path.join(directory, target)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(os.path.join(FIXTURES_DIR, fixture), destination)
+        paths.append("/" + target[: -len("index.html")])
+    # páginas gravadas que não estão no layout ficam na raiz
+    for extra in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        name = os.path.basename(extra)
+        if name not in SITE_LAYOUT:
+            shutil.copyfile(extra, os.path.join(directory, name))
+            paths.append("/" + name)
+    return paths
+
+
+def write_sitemap(directory: str, base_url: str, paths: List[str]) -> None:
+    urls = "".join(f"<url><loc>{base_url}{path}</loc></url>" for path in paths)
+    with open(os.path.join(directory, "sitemap.xml"), "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+
+
+def start_server(directory: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_fixture_site(directory: str) -> ThreadingHTTPServer:
+    """Builds the recorded site in ``directory`` and serves it; base URL is ``http://127.0.0.1:<port>``."""
+    paths = build_site(directory)
+    server = start_server(directory)
+    write_sitemap(directory, f"http://127.0.0.1:{server.server_port}", paths)
+    return server
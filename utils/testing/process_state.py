@@ -0,0 +1,18 @@
+"""Process-wide state reset between tests (and between simulated processes in one test)."""
+
+
+def clear_singletons() -> None:
+    """Stops the shared crawlers and drops every process-wide singleton (a fresh process for the next test)."""
+    from manager import agent_manager
+    from utils import crawler, llm_factory, response_cache, session_store, webscraper
+
+    with crawler._SHARED_CRAWLERS_LOCK:
+        for site_crawler in crawler._SHARED_CRAWLERS.values():
+            site_crawler.stop()
+        crawler._SHARED_CRAWLERS.clear()
+    webscraper.get_shared_scraper.cache_clear()
+    response_cache.get_response_cache.cache_clear()
+    session_store.get_session_checkpointer.cache_clear()
+    llm_factory.clear_shared_llms()
+    with agent_manager._SHARED_LOCK:
+        agent_manager._SHARED_MANAGERS.clear()
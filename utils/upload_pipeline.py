@@ -0,0 +1,484 @@
+"""Document uploads for the CNPJ flow: streamed to disk, deduplicated, validated.
+
+``UploadPipeline.store`` copies an uploaded file to disk in chunks while
+hashing it (SHA-256). The type is decided by magic bytes, not the file
+name, and the size limit is enforced while copying. Files are stored by
+content (``<dir>/<sha[:2]>/<sha>.<ext>``), so the same document sent twice,
+by any session, is kept and validated once.
+
+Validation (corrupt files, PDF page count, image dimensions) runs in a
+small thread pool; the UI keeps only an ``UploadRef`` per document and asks
+``result(sha256)`` on later reruns instead of waiting. Finished results are
+written next to the file (``<sha>.json``) and only the most recent ones stay
+in memory, so the same content is never validated twice, even after a
+restart.
+
+Uploads are identity documents, so they are not kept indefinitely: files
+(and their results) older than ``UPLOAD_RETENTION`` seconds are purged in
+the background, and a session reset (``forget_session``) deletes the files
+only that session uploaded.
+
+PDFs are parsed with pypdf in strict mode (cross-reference table, trailer
+and every page object must resolve). Images are decoded with Pillow
+(installed with Streamlit). Without those packages, files are checked from
+their headers and trailers only, and the result is marked ``best_effort``.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import BinaryIO, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image
+except ImportError:        # validação pelos cabeçalhos
+    Image = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:        # contagem de páginas pelos objetos /Type /Page (best-effort)
+    PdfReader = None
+
+# relativo à raiz do projeto, não ao diretório de onde o processo foi iniciado
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_UPLOAD_DIR = os.path.join("data", "uploads")
+CHUNK_SIZE = 1024 * 1024
+# resultados de validação mantidos na memória (os demais são relidos do <sha>.json)
+MAX_CACHED_RESULTS = 1024
+
+# tipo -> (assinatura no início do arquivo, extensão)
+MAGIC = {
+    "pdf": (b"%PDF-", "pdf"),
+    "png": (b"\x89PNG\r\n\x1a\n", "png"),
+    "jpeg": (b"\xff\xd8\xff", "jpg"),
+}
+_PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+class UploadRejected(ValueError):
+    """File refused before it is stored (type or size); the message is shown to the user."""
+
+
+@dataclass
+class UploadRef:
+    """What the session keeps for an uploaded document."""
+    sha256: str
+    kind: str
+    size: int
+    path: str
+    filename: str
+    duplicate: bool = False          # conteúdo já estava no disco
+
+
+@dataclass
+class ValidationResult:
+    valid: bool
+    detail: str = ""
+    info: Dict[str, int] = field(default_factory=dict)     # pages / width / height
+    best_effort: bool = False          # só cabeçalhos/trailer: pypdf ou Pillow ausentes
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Document kind from the first bytes, or None when it is not accepted."""
+    for kind, (signature, _) in MAGIC.items():
+        if head.startswith(signature):
+            return kind
+    return None
+
+
+# --------------------------------------------------------------------------- #
+#                                VALIDATION                                   #
+# --------------------------------------------------------------------------- #
+def _tail(path: str, size: int = 2048) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - size))
+        return f.read()
+
+
+def _count_pdf_pages(path: str) -> int:
+    """Page objects, scanning in chunks (pages inside compressed object streams are not seen)."""
+    count = 0
+    overlap = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            data = overlap + chunk
+            # o último pedaço pode conter o começo de um "/Type /Page" cortado
+            cut = max(0, len(data) - 32)
+            count += len(_PDF_PAGE_RE.findall(data, 0, cut))
+            overlap = data[cut:]
+    return count + len(_PDF_PAGE_RE.findall(overlap))
+
+
+def validate_pdf(path: str, max_pages: int) -> ValidationResult:
+    if PdfReader is None:
+        return _validate_pdf_heuristic(path, max_pages)
+    try:
+        # strict: xref, trailer e objetos inconsistentes são erro, não reparo silencioso
+        reader = PdfReader(path, strict=True)
+        if reader.is_encrypted:
+            return ValidationResult(False, "PDF protegido por senha")
+        pages = len(reader.pages)
+        if pages > max_pages:
+            return ValidationResult(False, f"PDF com {pages} páginas (máximo {max_pages})", {"pages": pages})
+        for page in reader.pages:
+            page.mediabox                    # cada página precisa resolver
+            page.get_contents()
+    except Exception as e:
+        return ValidationResult(False, f"PDF corrompido ({type(e).__name__})")
+    if pages == 0:
+        return ValidationResult(False, "PDF sem páginas")
+    return ValidationResult(True, f"{pages} página(s)", {"pages": pages})
+
+
+def _validate_pdf_heuristic(path: str, max_pages: int) -> ValidationResult:
+    """Without pypdf: end-of-file marker, /Encrypt and /Type /Page objects only."""
+    if b"%%EOF" not in _tail(path):
+        return ValidationResult(False, "PDF incompleto ou corrompido", best_effort=True)
+    with open(path, "rb") as f:
+        if b"/Encrypt" in f.read(CHUNK_SIZE) + _tail(path, 8192):
+            return ValidationResult(False, "PDF protegido por senha", best_effort=True)
+    pages = _count_pdf_pages(path)
+    if pages > max_pages:
+        return ValidationResult(
+            False, f"PDF com {pages} páginas (máximo {max_pages})", {"pages": pages}, best_effort=True)
+    return ValidationResult(
+        True, f"{pages} página(s)" if pages else "PDF", {"pages": pages} if pages else {}, best_effort=True)
+
+
+def _image_size_from_header(path: str, kind: str) -> Optional[tuple]:
+    """(width, height) from the PNG IHDR or the JPEG SOF marker, plus an end-marker check."""
+    with open(path, "rb") as f:
+        if kind == "png":
+            header = f.read(24)
+            if header[12:16] != b"IHDR" or not _tail(path, 12).endswith(b"IEND\xaeB`\x82"):
+                return None
+            return struct.unpack(">II", header[16:24])
+        # JPEG: percorre os segmentos até um SOFn
+        if not _tail(path, 2).endswith(b"\xff\xd9"):
+            return None
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            length = f.read(2)
+            if len(length) < 2:
+                return None
+            if marker[1] in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack(">xHH", f.read(5))
+                return width, height
+            f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def validate_image(path: str, kind: str, min_side: int, max_pixels: int) -> ValidationResult:
+    if Image is not None:
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+                if width * height > max_pixels:
+                    return ValidationResult(False, f"imagem grande demais ({width}x{height})")
+                img.verify()
+            with Image.open(path) as img:
+                img.load()             # verify() não detecta arquivo truncado
+        except Exception as e:
+            return ValidationResult(False, f"imagem corrompida ({type(e).__name__})")
+    else:
+        size = _image_size_from_header(path, kind)
+        if size is None:
+            return ValidationResult(False, "imagem incompleta ou corrompida", best_effort=True)
+        width, height = size
+        if width * height > max_pixels:
+            return ValidationResult(False, f"imagem grande demais ({width}x{height})", best_effort=True)
+    info = {"width": width, "height": height}
+    best_effort = Image is None
+    if min(width, height) < min_side:
+        return ValidationResult(
+            False, f"resolução baixa ({width}x{height}), envie uma imagem mais nítida", info, best_effort)
+    return ValidationResult(True, f"{width}x{height}", info, best_effort)
+
+
+# --------------------------------------------------------------------------- #
+#                                 PIPELINE                                    #
+# --------------------------------------------------------------------------- #
+class UploadPipeline:
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        workers: Optional[int] = None,
+        max_pdf_pages: Optional[int] = None,
+        min_image_side: Optional[int] = None,
+        max_image_pixels: Optional[int] = None,
+        retention: Optional[float] = None,
+        purge_interval: float = 600.0,
+    ):
+        self.directory = os.path.join(PROJECT_ROOT, directory or os.getenv("UPLOAD_DIR", DEFAULT_UPLOAD_DIR))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.max_pdf_pages = max_pdf_pages if max_pdf_pages is not None else int(os.getenv("UPLOAD_MAX_PDF_PAGES", "30"))
+        self.min_image_side = min_image_side if min_image_side is not None else int(os.getenv("UPLOAD_MIN_IMAGE_SIDE", "300"))
+        self.max_image_pixels = max_image_pixels if max_image_pixels is not None else 40_000_000
+        # 0 = sem limite de tempo (só o reset da sessão apaga)
+        self.retention = retention if retention is not None else float(os.getenv("UPLOAD_RETENTION", "86400"))
+        self.purge_interval = purge_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers if workers is not None else int(os.getenv("UPLOAD_WORKERS", "2")),
+            thread_name_prefix="upload-validate",
+        )
+        # validações em andamento; ao terminar, o resultado vai para _results e para o disco
+        self._validations: Dict[str, "Future[ValidationResult]"] = {}
+        self._results: "OrderedDict[str, ValidationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        # sessões que enviaram cada conteúdo (neste processo): o reset de uma não apaga o de outra
+        self._owners: Dict[str, Set[str]] = defaultdict(set)
+        self._last_purge = 0.0
+        self.stats = {"stored": 0, "duplicates": 0, "rejected": 0, "purged": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._maybe_purge()
+
+    def _path(self, sha256: str, kind: str) -> str:
+        return os.path.join(self.directory, sha256[:2], f"{sha256}.{MAGIC[kind][1]}")
+
+    def _result_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], f"{sha256}.json")
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def store(self, source: BinaryIO, filename: str = "", session_id: Optional[str] = None) -> UploadRef:
+        """Streams ``source`` to disk and schedules its validation; raises ``UploadRejected``.
+
+        ``session_id`` records the uploader, for ``forget_session``.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        kind: Optional[str] = None
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := source.read(CHUNK_SIZE):
+                    if kind is None:
+                        kind = sniff(chunk)
+                        if kind is None:
+                            raise UploadRejected("Formato não aceito: envie PDF, JPG ou PNG.")
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadRejected(f"Arquivo maior que {round(self.max_bytes / 2 ** 20, 1):g} MB.")
+                    digest.update(chunk)
+                    out.write(chunk)
+            if kind is None:
+                raise UploadRejected("Arquivo vazio.")
+            sha256 = digest.hexdigest()
+            path = self._path(sha256, kind)
+            duplicate = os.path.exists(path)
+            if duplicate:
+                os.remove(tmp_path)
+                os.utime(path)                # a retenção conta a partir do último envio
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except UploadRejected:
+            self._count("rejected")
+            os.remove(tmp_path)
+            logger.info(f"Upload rejected: {filename}")
+            raise
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if session_id is not None:
+            with self._lock:
+                self._owners[sha256].add(session_id)
+        self._count("duplicates" if duplicate else "stored")
+        logger.info(f"Upload stored: {filename} ({kind}, {size} bytes, sha256 {sha256[:12]}, duplicate={duplicate})")
+        self._schedule(sha256, kind, path)
+        self._maybe_purge()
+        return UploadRef(sha256=sha256, kind=kind, size=size, path=path, filename=filename, duplicate=duplicate)
+
+    def _schedule(self, sha256: str, kind: str, path: str) -> None:
+        with self._lock:
+            # mesmo conteúdo: valida uma vez só (em andamento, na memória ou já gravado)
+            if sha256 in self._validations or sha256 in self._results:
+                return
+            future = self._validations[sha256] = self._executor.submit(self._validate, kind, path, sha256)
+        future.add_done_callback(lambda done: self._finish(sha256, done))
+
+    def _validate(self, kind: str, path: str, sha256: str) -> ValidationResult:
+        saved = self._load_result(sha256)
+        if saved is not None:
+            return saved
+        try:
+            if kind == "pdf":
+                result = validate_pdf(path, self.max_pdf_pages)
+            else:
+                result = validate_image(path, kind, self.min_image_side, self.max_image_pixels)
+        except Exception as e:
+            logger.error(f"Validation failed for {path}", exc_info=True)
+            return ValidationResult(False, f"erro ao validar ({type(e).__name__})")
+        self._save_result(sha256, result)
+        return result
+
+    def _finish(self, sha256: str, future: "Future[ValidationResult]") -> None:
+        """Done callback: keeps the result (bounded) and drops the future."""
+        with self._lock:
+            self._validations.pop(sha256, None)
+            if sha256 in self._owners and not self._owners[sha256]:
+                # todas as sessões donas foram resetadas durante a validação
+                del self._owners[sha256]
+                orphan = True
+            else:
+                orphan = False
+                if not future.cancelled():
+                    self._remember(sha256, future.result())
+        if orphan:
+            self._delete(sha256)
+            self._count("purged")
+
+    def _remember(self, sha256: str, result: ValidationResult) -> None:
+        self._results[sha256] = result
+        self._results.move_to_end(sha256)
+        while len(self._results) > MAX_CACHED_RESULTS:
+            self._results.popitem(last=False)
+
+    def _save_result(self, sha256: str, result: ValidationResult) -> None:
+        path = self._result_path(sha256)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(result), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.error(f"Could not save the validation result of {sha256[:12]}", exc_info=True)
+
+    def _load_result(self, sha256: str) -> Optional[ValidationResult]:
+        try:
+            with open(self._result_path(sha256), encoding="utf-8") as f:
+                return ValidationResult(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError):
+            logger.warning(f"Ignoring unreadable validation result of {sha256[:12]}")
+            return None
+
+    def result(self, sha256: str) -> Optional[ValidationResult]:
+        """Validation result, or None while it is still running (or was never scheduled)."""
+        with self._lock:
+            if sha256 in self._validations:
+                return None
+            result = self._results.get(sha256)
+            if result is not None:
+                self._results.move_to_end(sha256)
+                return result
+        result = self._load_result(sha256)
+        if result is not None:
+            with self._lock:
+                self._remember(sha256, result)
+        return result
+
+    # ------------------------------------------------------------------ #
+    #                             RETENTION                              #
+    # ------------------------------------------------------------------ #
+    def _delete(self, sha256: str) -> None:
+        """Removes the stored file of ``sha256`` and its validation result."""
+        with self._lock:
+            self._results.pop(sha256, None)
+        for ext in [kind_ext for _, kind_ext in MAGIC.values()] + ["json"]:
+            try:
+                os.remove(os.path.join(self.directory, sha256[:2], f"{sha256}.{ext}"))
+            except FileNotFoundError:
+                pass
+
+    def release(self, session_id: str, sha256: str) -> bool:
+        """Drops ``session_id``'s claim on ``sha256``; deletes the file when no session holds it."""
+        with self._lock:
+            owners = self._owners.get(sha256)
+            if owners is None or session_id not in owners:
+                return False
+            owners.discard(session_id)
+            if owners:
+                return False
+            if sha256 in self._validations:
+                return False          # _finish apaga quando a validação terminar
+            del self._owners[sha256]
+        self._delete(sha256)
+        self._count("purged")
+        return True
+
+    def forget_session(self, session_id: str) -> int:
+        """Session reset: deletes the documents only ``session_id`` uploaded; returns how many."""
+        with self._lock:
+            owned = [sha256 for sha256, owners in self._owners.items() if session_id in owners]
+        return sum(self.release(session_id, sha256) for sha256 in owned)
+
+    def _maybe_purge(self) -> None:
+        """Schedules ``purge_expired`` at most once every ``purge_interval`` seconds."""
+        if not self.retention:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._last_purge and now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        self._executor.submit(self.purge_expired)
+
+    def purge_expired(self) -> int:
+        """Deletes documents not uploaded again for ``retention`` seconds; returns how many."""
+        if not self.retention:
+            return 0
+        cutoff = time.time() - self.retention
+        expired = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime >= cutoff:
+                        continue
+                    if name.endswith(".part"):          # cópia interrompida
+                        os.remove(path)
+                    elif not name.endswith((".json", ".tmp")):
+                        expired.append(name.split(".", 1)[0])
+                except FileNotFoundError:
+                    continue
+        purged = 0
+        for sha256 in expired:
+            with self._lock:
+                if sha256 in self._validations:
+                    continue
+                self._owners.pop(sha256, None)
+            self._delete(sha256)
+            purged += 1
+        if purged:
+            with self._lock:
+                self.stats["purged"] += purged
+            logger.info(f"Purged {purged} uploads older than {self.retention:.0f}s")
+        return purged
+
+    def wait(self, sha256: str, timeout: Optional[float] = None) -> ValidationResult:
+        """Blocks until the validation of ``sha256`` finishes (batch jobs and tests)."""
+        with self._lock:
+            future = self._validations.get(sha256)
+        if future is not None:
+            return future.result(timeout=timeout)
+        result = self.result(sha256)
+        if result is None:
+            raise KeyError(sha256)
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_upload_pipeline() -> UploadPipeline:
+    """Process-wide pipeline (storage directory and validation pool shared by all sessions)."""
+    return UploadPipeline()
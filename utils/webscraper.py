@@ -1,70 +1,292 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+import httpx
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict
-import re
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+
+from utils.crawler import SiteCrawler, shared_crawler
+from utils.html_extract import get_extractor
+from utils.metrics import cache_result, span
+from utils.page_cache import CachedPage, PageCache
+from utils.search_index import BM25Index
+from utils.single_flight import get_flight_group
+
+logger = logging.getLogger(__name__)
+
 
 class ContabilizeiScraper:
-    def __init__(self):
-        self.base_url = "https://www.contabilizei.com.br"
+    def __init__(
+        self,
+        cache_ttl: Optional[float] = None,
+        cache_max_entries: Optional[int] = None,
+        timeout: float = 10.0,
+        base_url: Optional[str] = None,
+    ):
+        self.base_url = base_url or os.getenv("CONTABILIZEI_BASE_URL", "https://www.contabilizei.com.br")
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-    
-    def _fetch_page(self, url: str) -> str:
-        """Fetch the content of a webpage."""
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # cliente assíncrono com pool keep-alive; um por event loop (conexões httpx não cruzam loops)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # downloads simultâneos da mesma URL (várias sessões) viram uma requisição só
+        self.flight = get_flight_group("pages")
+        self.extract = get_extractor()
+        self.crawler: Optional[SiteCrawler] = None
+        self._index: Optional[BM25Index] = None
+        self._index_key: Optional[str] = None
+        self._index_lock = threading.Lock()
+        self.cache = PageCache(
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv("SCRAPER_CACHE_TTL", "300")),
+            max_entries=cache_max_entries if cache_max_entries is not None
+            else int(os.getenv("SCRAPER_CACHE_MAX_ENTRIES", "64")),
+        )
+
+    def _conditional_get(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Tuple[int, Optional[requests.Response]]:
+        """GET ``url`` with If-None-Match/If-Modified-Since.
+
+        Returns (status, response); HTTP errors keep their status (a 404 tells
+        the crawler the page is gone), network errors give (0, None).
+        """
+        conditional_headers = {}
+        if etag:
+            conditional_headers["If-None-Match"] = etag
+        if last_modified:
+            conditional_headers["If-Modified-Since"] = last_modified
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            return response.text
+            with span("scraper.fetch") as fetch_span:
+                response = self.session.get(url, headers=conditional_headers, timeout=self.timeout)
+                fetch_span.attrs["status"] = response.status_code
         except requests.RequestException as e:
-            print(f"Error fetching page: {e}")
-            return ""
+            logger.error(f"Error fetching page: {e}")
+            return 0, None
+        if response.status_code >= 400:
+            logger.error(f"Error fetching page: HTTP {response.status_code} for url: {url}")
+        elif "charset" not in response.headers.get("Content-Type", ""):
+            # requests would fall back to ISO-8859-1; the site is UTF-8
+            response.encoding = "utf-8"
+        return response.status_code, response
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                follow_redirects=True,
+            )
+        return client
+
+    async def _aconditional_get(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Tuple[int, Optional[httpx.Response]]:
+        """Async ``_conditional_get`` over the pooled httpx client."""
+        conditional_headers = {}
+        if etag:
+            conditional_headers["If-None-Match"] = etag
+        if last_modified:
+            conditional_headers["If-Modified-Since"] = last_modified
+        try:
+            with span("scraper.fetch") as fetch_span:
+                response = await self._async_client().get(url, headers=conditional_headers)
+                fetch_span.attrs["status"] = response.status_code
+        except httpx.HTTPError as e:
+            logger.error(f"Error fetching page: {e}")
+            return 0, None
+        if response.status_code >= 400:
+            logger.error(f"Error fetching page: HTTP {response.status_code} for url: {url}")
+        elif "charset" not in response.headers.get("Content-Type", ""):
+            response.encoding = "utf-8"
+        return response.status_code, response
+
+    async def aclose(self) -> None:
+        """Close the async client of the running event loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def _get_page(self, url: str) -> Optional[CachedPage]:
+        """Return the cached page for ``url``, revalidating or downloading it when stale.
+
+        A fresh cache hit skips both the network and the HTML parse. A stale
+        entry is revalidated with If-None-Match/If-Modified-Since, and kept as
+        is on a 304. If the request fails, the stale entry (if any) is served.
+        Concurrent misses for the same URL share a single download.
+        """
+        entry, fresh = self.cache.lookup(url)
+        cache_result("page", fresh)
+        if fresh:
+            return entry
+
+        def fetch() -> Optional[CachedPage]:
+            status, response = self._conditional_get(
+                url,
+                etag=entry.etag if entry is not None else None,
+                last_modified=entry.last_modified if entry is not None else None,
+            )
+            return self._store_response(url, entry, status, response)
+
+        page, _ = self.flight.do((id(self), url), fetch)
+        return page
+
+    async def _aget_page(self, url: str) -> Optional[CachedPage]:
+        """Async ``_get_page``: same cache, fetched with the pooled httpx client."""
+        entry, fresh = self.cache.lookup(url)
+        cache_result("page", fresh)
+        if fresh:
+            return entry
+
+        async def fetch() -> Optional[CachedPage]:
+            status, response = await self._aconditional_get(
+                url,
+                etag=entry.etag if entry is not None else None,
+                last_modified=entry.last_modified if entry is not None else None,
+            )
+            return self._store_response(url, entry, status, response)
+
+        page, _ = await self.flight.ado((id(self), url), fetch)
+        return page
+
+    def _store_response(
+        self,
+        url: str,
+        entry: Optional[CachedPage],
+        status: int,
+        response,
+    ) -> Optional[CachedPage]:
+        """Cache outcome of a conditional GET (requests or httpx response)."""
+        if status == 304 and entry is not None:
+            self.cache.mark_revalidated(entry)
+            return entry
+        if status != 200:
+            return entry
+
+        html = response.text
+        page = CachedPage(
+            url=url,
+            html=html,
+            text=self._extract_text(html),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self.cache.put(page)
+        return page
+
+    def _fetch_page(self, url: str) -> str:
+        """Fetch the content of a webpage."""
+        page = self._get_page(url)
+        return page.html if page is not None else ""
     
     def _extract_text(self, html: str) -> str:
-        """Extract relevant text content from HTML."""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text
-        text = soup.get_text()
-        
-        # Break into lines and remove leading and trailing space
-        lines = (line.strip() for line in text.splitlines())
-        # Break multi-headlines into a line each
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        # Drop blank lines
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return text
-    
-    def _search_keywords(self, text: str, query: str) -> List[str]:
-        """Search for relevant content based on keywords."""
-        query_words = set(word.lower() for word in re.findall(r'\w+', query))
-        sentences = re.split(r'[.!?]+', text)
-        
-        relevant_sentences = []
-        for sentence in sentences:
-            sentence_words = set(word.lower() for word in re.findall(r'\w+', sentence))
-            if query_words.intersection(sentence_words):
-                relevant_sentences.append(sentence.strip())
-        
-        return relevant_sentences
-    
-    def search_content(self, query: str) -> str:
+        """Extract relevant text content from HTML (one block per line)."""
+        with span("scraper.extract"):
+            return self.extract(html)
+
+    def enable_crawler(self, background: bool = True, **crawler_kwargs) -> SiteCrawler:
+        """Attach a SiteCrawler so searches cover the whole site.
+
+        The crawler is shared by every scraper of the process with the same
+        site and snapshot (``shared_crawler``), so creating more scrapers never
+        starts more crawl threads. The last snapshot is loaded right away; when
+        ``background`` is set the site is (re)crawled in a daemon thread and
+        the snapshot kept updated.
+        """
+        if self.crawler is None:
+            self.crawler = shared_crawler(self, **crawler_kwargs)
+            if background:
+                self.crawler.start_background()
+        return self.crawler
+
+    def _get_index(self, main_page: Optional[CachedPage] = None) -> BM25Index:
+        """BM25 index of the current corpus, rebuilt only when the corpus version changes.
+
+        The corpus is the crawled site when available, else the main page
+        (``main_page`` when the caller already fetched it).
+        """
+        pages, version = self.crawler.current() if self.crawler is not None else ({}, "")
+        if pages:
+            key = f"crawl:{version}"
+            texts = lambda: [record.text for record in pages.values()]
+        else:
+            # Fetch the main page (served from the page cache while fresh)
+            if main_page is None:
+                main_page = self._get_page(self.base_url)
+            key = f"page:{main_page.version}" if main_page is not None else "empty"
+            texts = lambda: [main_page.text] if main_page is not None else []
+
+        with self._index_lock:
+            if self._index is None or key != self._index_key:
+                with span("search.index_build"):
+                    self._index = BM25Index.from_texts(texts())
+                self._index_key = key
+                logger.debug(f"Built search index {key} with {len(self._index)} passages")
+            return self._index
+
+    async def _aget_index(self) -> BM25Index:
+        """Async ``_get_index``: the main page (if needed) is fetched without blocking the loop."""
+        if self.crawler is not None and self.crawler.pages:
+            return self._get_index()
+        return self._get_index(await self._aget_page(self.base_url))
+
+    def corpus_version(self) -> str:
+        """Version of the corpus searches currently run against (crawl or page hash)."""
+        self._get_index()
+        return self._index_key or "empty"
+
+    async def acorpus_version(self) -> str:
+        await self._aget_index()
+        return self._index_key or "empty"
+
+    def search_passages(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-``k`` passages for ``query`` as (passage, BM25 score), best first."""
+        index = self._get_index()
+        with span("search.query"):
+            return index.search(query, k)
+
+    async def asearch_passages(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        index = await self._aget_index()
+        with span("search.query"):
+            return index.search(query, k)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters of the page cache."""
+        return self.cache.stats()
+
+    def search_content(self, query: str, k: int = 5) -> str:
         """Search the website for content relevant to the query."""
-        # Fetch the main page
-        main_page = self._fetch_page(self.base_url)
-        main_text = self._extract_text(main_page)
-        
-        # Search for relevant content
-        relevant_content = self._search_keywords(main_text, query)
-        
-        # If no relevant content found, try searching other pages
-        if not relevant_content:
-            # Add logic to search other relevant pages here
-            pass
-        
-        return "\n".join(relevant_content) if relevant_content else "No relevant information found on the website." 
\ No newline at end of file
+        # No request-time fetch once the site is crawled; the index is reused across queries
+        relevant_content = [passage for passage, _ in self.search_passages(query, k)]
+
+        return "\n".join(relevant_content) if relevant_content else "No relevant information found on the website."
+
+
+@lru_cache(maxsize=1)
+def get_shared_scraper() -> ContabilizeiScraper:
+    """Process-wide scraper (page cache, crawler and search index shared by all sessions)."""
+    scraper = ContabilizeiScraper()
+    mode = os.getenv("SITE_CRAWLER_ENABLED", "1")
+    if mode == "1":
+        # carrega o snapshot do site e mantém o corpus atualizado em background
+        scraper.enable_crawler()
+    elif mode == "snapshot":
+        # só o snapshot já gravado, sem rastrear o site (ex.: replay reproduzível no batch.py)
+        scraper.enable_crawler(background=False)
+    return scraper